@@ -1,8 +1,13 @@
+from app.core import metrics
 from app.db.session import SessionLocal
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with SessionLocal() as db:
+        # Check out the connection up front so pool waits are measured on their own.
+        with metrics.stage("db_checkout", metrics.DB_CHECKOUT_SECONDS):
+            await db.connection()
         yield db
-    finally:
-        db.close()
+
+def get_session_factory():
+    """Session factory for work that outlives the request (queued jobs, streamed responses)."""
+    return SessionLocal
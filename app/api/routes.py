@@ -1,37 +1,230 @@
-from fastapi import APIRouter, Depends, UploadFile, File
-from sqlalchemy.orm import Session
-from app.schemas.grading import GradingRequest, AssignmentCreate
-from app.schemas.grading_result import GradingResult as GradingResultSchema
-from app.services import grading_service
+from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core import metrics
+from app.core.config import settings
+from app.schemas.grading import GradingRequest, AssignmentCreate, BatchGradingRequest
+from app.schemas.grading_result import GradingResult as GradingResultSchema, GradeQuery, CriterionCost, AssignmentStats
+from app.schemas.job import GradingJob
+from app.services import grade_listing, gradebook_export, grading_service, job_queue, job_store
 from . import deps
-from typing import List
+from pydantic import TypeAdapter
+from typing import Annotated, Awaitable, Callable, List, Literal
+import asyncio
+import json
 
 router = APIRouter()
 
+_grade_list = TypeAdapter(List[GradingResultSchema])
+
 @router.get("/")
 def read_root():
     return {"message": "FastAPI is connected!"}
 
+@router.get("/metrics")
+def get_metrics():
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
 @router.post("/grade")
-async def grade_assignment_endpoint(request: GradingRequest, db: Session = Depends(deps.get_db)):
-    return await grading_service.grade_assignment(request, db)
+async def grade_assignment_endpoint(
+    request: GradingRequest,
+    job: bool = False,
+    db: AsyncSession = Depends(deps.get_db),
+    session_factory=Depends(deps.get_session_factory),
+):
+    if not job:
+        return await grading_service.grade_assignment(request, db)
+
+    try:
+        if settings.JOB_BACKEND == "database":
+            status = job_store.to_dict(await job_store.enqueue(db, request))
+        else:
+            status = job_queue.grading_jobs.submit(request, session_factory).to_dict()
+    except job_queue.QueueFullError as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(settings.GRADING_JOB_RETRY_AFTER)},
+        )
+    return JSONResponse(status_code=202, content=jsonable_encoder(GradingJob(**status)))
+
+@router.post("/grade/batch")
+async def grade_batch_endpoint(
+    request: BatchGradingRequest,
+    db: AsyncSession = Depends(deps.get_db),
+    session_factory=Depends(deps.get_session_factory),
+):
+    results = await grading_service.grade_batch(request, db, session_factory)
+    return StreamingResponse(results, media_type="application/x-ndjson")
+
+@router.post("/grade/archive")
+async def grade_archive_endpoint(
+    assignment_name: str = Form(...),
+    archive: UploadFile = File(...),
+    student_id: str | None = Form(None),
+    db: AsyncSession = Depends(deps.get_db),
+):
+    return await grading_service.grade_archive(assignment_name, archive, db, student_id)
+
+def _get_job(job_id: str) -> job_queue.Job:
+    grading_job = job_queue.grading_jobs.get(job_id)
+    if grading_job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found.")
+    return grading_job
+
+async def _get_stored_job(db: AsyncSession, job_id: str):
+    grading_job = await job_store.get(db, job_id)
+    if grading_job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found.")
+    return grading_job
+
+def _status_event(status: dict) -> str:
+    return f"event: status\ndata: {json.dumps(jsonable_encoder(GradingJob(**status)))}\n\n"
+
+@router.get("/jobs/{job_id}", response_model=GradingJob)
+async def get_job(job_id: str, db: AsyncSession = Depends(deps.get_db)):
+    if settings.JOB_BACKEND == "database":
+        return job_store.to_dict(await _get_stored_job(db, job_id))
+    return _get_job(job_id).to_dict()
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str, db: AsyncSession = Depends(deps.get_db), session_factory=Depends(deps.get_session_factory)):
+    if settings.JOB_BACKEND == "database":
+        await _get_stored_job(db, job_id)
+
+        async def events():
+            # Workers run in other processes, so poll for changes.
+            last = None
+            async with session_factory() as poll_db:
+                while True:
+                    grading_job = await job_store.get(poll_db, job_id)
+                    await poll_db.commit()
+                    if grading_job.status != last:
+                        last = grading_job.status
+                        yield _status_event(job_store.to_dict(grading_job))
+                    if job_store.done(grading_job):
+                        return
+                    await asyncio.sleep(settings.JOB_POLL_INTERVAL)
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    grading_job = _get_job(job_id)
+
+    async def events():
+        while True:
+            changed = grading_job.changed
+            yield _status_event(grading_job.to_dict())
+            if grading_job.done:
+                return
+            await changed.wait()
+
+    return StreamingResponse(events(), media_type="text/event-stream")
 
 @router.post("/assignments")
-async def create_assignment_endpoint(request: AssignmentCreate, db: Session = Depends(deps.get_db)):
+async def create_assignment_endpoint(request: AssignmentCreate, db: AsyncSession = Depends(deps.get_db)):
     return await grading_service.create_assignment(request, db)
 
 @router.post("/assignments/{assignment_name}/criteria")
 async def upload_criteria(
     assignment_name: str, 
     criteria_file: UploadFile = File(...),
-    db: Session = Depends(deps.get_db)
+    allow_unsafe_patterns: bool = False,
+    db: AsyncSession = Depends(deps.get_db)
+):
+    return await grading_service.save_criteria(assignment_name, criteria_file, db, allow_unsafe_patterns)
+
+@router.post("/assignments/{assignment_name}/baseline")
+async def upload_baseline(
+    assignment_name: str,
+    archive: UploadFile | None = File(None),
+    repo_path: str | None = Form(None),
+    diff_lines: bool = Form(False),
+    db: AsyncSession = Depends(deps.get_db)
 ):
-    return await grading_service.save_criteria(assignment_name, criteria_file, db)
+    return await grading_service.save_baseline(assignment_name, db, archive, repo_path, diff_lines)
+
+@router.delete("/assignments/{assignment_name}/baseline")
+async def delete_baseline(assignment_name: str, db: AsyncSession = Depends(deps.get_db)):
+    return await grading_service.delete_baseline(assignment_name, db)
+
+@router.get("/assignments/{assignment_name}/deductions", response_model=List[CriterionCost])
+async def get_criterion_costs(assignment_name: str, db: AsyncSession = Depends(deps.get_db)):
+    return await grading_service.get_criterion_costs(assignment_name, db)
+
+@router.get("/assignments/{assignment_name}/stats", response_model=AssignmentStats)
+async def get_assignment_stats(assignment_name: str, db: AsyncSession = Depends(deps.get_db)):
+    return await grading_service.get_assignment_stats(assignment_name, db)
+
+async def _grade_listing(
+    request: Request,
+    db: AsyncSession,
+    session_factory,
+    filters: GradeQuery,
+    load: Callable[[], Awaitable[list]],
+    student_name: str | None = None,
+) -> Response:
+    """Answer a grade listing with an ETag: 304 when unchanged, else from the listing cache or ``load``."""
+    assignment_id, etag = await grade_listing.version(db, filters.assignment)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if grade_listing.matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    if filters.stream:
+        return StreamingResponse(
+            grading_service.stream_grades(session_factory, filters, student_name),
+            media_type="application/json",
+            headers=headers,
+        )
+
+    key = (assignment_id, request.url.path, request.url.query)
+    cached = grade_listing.get(key, etag)
+    if cached is not None:
+        body, extra = cached
+        return Response(body, media_type="application/json", headers={**headers, **extra})
+
+    generation = grade_listing.changes(assignment_id)
+    grades = await load()
+    extra = {}
+    if filters.limit is not None and len(grades) == filters.limit:
+        extra["X-Next-Cursor"] = str(grades[-1].id)
+    body = _grade_list.dump_json(grades)
+    grade_listing.put(key, etag, body, extra, generation)
+    return Response(body, media_type="application/json", headers={**headers, **extra})
 
 @router.get("/grades", response_model=List[GradingResultSchema])
-async def get_grades(db: Session = Depends(deps.get_db)):
-    return await grading_service.get_all_grades(db)
+async def get_grades(
+    request: Request,
+    filters: Annotated[GradeQuery, Query()],
+    db: AsyncSession = Depends(deps.get_db),
+    session_factory=Depends(deps.get_session_factory),
+):
+    return await _grade_listing(
+        request, db, session_factory, filters, lambda: grading_service.get_all_grades(db, filters),
+    )
 
 @router.get("/grades/{student_name}", response_model=List[GradingResultSchema])
-async def get_student_grades(student_name: str, db: Session = Depends(deps.get_db)):
-    return await grading_service.get_grades_by_student(student_name, db)
+async def get_student_grades(
+    student_name: str,
+    request: Request,
+    filters: Annotated[GradeQuery, Query()],
+    db: AsyncSession = Depends(deps.get_db),
+    session_factory=Depends(deps.get_session_factory),
+):
+    return await _grade_listing(
+        request, db, session_factory, filters,
+        lambda: grading_service.get_grades_by_student(student_name, db, filters), student_name,
+    )
+
+@router.get("/export/grades")
+async def export_grades(
+    format: Literal["csv", "parquet", "arrow"] = "csv",
+    layout: Literal["long", "pivot"] = "long",
+    assignment: str | None = None,
+    session_factory=Depends(deps.get_session_factory),
+):
+    extension = {"csv": "csv", "parquet": "parquet", "arrow": "arrows"}[format]
+    return StreamingResponse(
+        gradebook_export.export_grades(session_factory, format, layout, assignment),
+        media_type=gradebook_export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="gradebook-{layout}.{extension}"'},
+    )
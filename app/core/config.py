@@ -12,6 +12,53 @@ class Settings(BaseSettings):
     POSTGRES_PORT: int = 5432
 
     DATABASE_URL: str | None = None
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_COMMAND_TIMEOUT: float = 30.0
+
+    RUBRIC_CACHE_SIZE: int = 128
+    FINDINGS_CACHE_SIZE: int = 50_000
+    SYMBOL_INDEX_CACHE_SIZE: int = 4096
+    SCAN_PROCESS_WORKERS: int = 0
+    REGEX_TIME_BUDGET: float = 1.0
+    REGEX_ENGINE: str = "re"
+    GIT_CLONE_TIMEOUT: float = 120.0
+    REPO_CACHE_DIR: str | None = None
+    REPO_CACHE_MAX_BYTES: int = 2 * 1024 ** 3
+    BASELINE_CACHE_SIZE: int = 32
+    MAX_SOURCE_FILE_BYTES: int = 2 * 1024 ** 2
+    MAX_SOURCE_REPO_BYTES: int = 50 * 1024 ** 2
+    SOURCE_MMAP_THRESHOLD: int = 256 * 1024
+    BASELINE_REPO_ROOT: str | None = None
+    MAX_ARCHIVE_BYTES: int = 100 * 1024 ** 2
+    MAX_ARCHIVE_ENTRIES: int = 10_000
+    MAX_ARCHIVE_UNPACKED_BYTES: int = 500 * 1024 ** 2
+
+    GRADING_WORKERS: int = 4
+    GRADING_QUEUE_MAX_DEPTH: int = 100
+    GRADING_JOB_RETRY_AFTER: int = 10
+    GRADING_JOB_HISTORY: int = 1000
+    JOB_BACKEND: str = "memory"
+    JOB_LEASE_SECONDS: float = 60.0
+    JOB_HEARTBEAT_SECONDS: float = 15.0
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_POLL_INTERVAL: float = 1.0
+
+    BATCH_CONCURRENCY: int = 8
+    BATCH_INSERT_CHUNK: int = 50
+
+    GRADES_STREAM_CHUNK: int = 500
+    EXPORT_CHUNK: int = 5000
+    STATS_CACHE_SIZE: int = 256
+    LISTING_CACHE_SIZE: int = 256
+    LISTING_CACHE_MAX_BODY: int = 1024 ** 2
+
+    LLM_CACHE_SIZE: int = 10_000
+    LLM_BATCH_SIZE: int = 8
+    LLM_MAX_CONCURRENCY: int = 4
+    LLM_CHUNK_TOKENS: int = 8000
 
     @property
     def DATABASE_URL_USED(self) -> str:
@@ -19,6 +66,18 @@ class Settings(BaseSettings):
             return self.DATABASE_URL
         return f"postgresql://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_SERVER}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
 
+    @property
+    def ASYNC_DATABASE_URL(self) -> str:
+        """DATABASE_URL_USED with its driver swapped for asyncpg / aiosqlite."""
+        url = self.DATABASE_URL_USED
+        scheme, sep, rest = url.partition("://")
+        dialect = scheme.split("+", 1)[0]
+        if dialect in ("postgresql", "postgres"):
+            return f"postgresql+asyncpg{sep}{rest}"
+        if dialect == "sqlite":
+            return f"sqlite+aiosqlite{sep}{rest}"
+        return url
+
     class Config:
         env_file = ".env"
 
@@ -0,0 +1,71 @@
+"""
+Request body limits for upload endpoints.
+
+Starlette spools a multipart upload to disk while parsing the form, before
+the endpoint runs, so a size check in the endpoint comes after the whole body
+has been received. ``UploadLimitMiddleware`` rejects oversized bodies before
+that: from ``Content-Length`` when the client sends one, otherwise by counting
+the body as it is received. The limit allows ``MULTIPART_OVERHEAD`` bytes on
+top of the file for the boundaries and other form fields; the endpoint still
+checks the exact file size.
+"""
+
+import re
+from typing import Callable
+
+from fastapi import HTTPException
+from starlette.responses import JSONResponse
+
+from app.core.config import settings
+
+MULTIPART_OVERHEAD = 64 * 1024
+
+# Path pattern -> largest accepted file, read on every request so settings changes apply
+UPLOAD_LIMITS: list[tuple[re.Pattern, Callable[[], int]]] = [
+    (re.compile(r"/grade/archive"), lambda: settings.MAX_ARCHIVE_BYTES),
+    (re.compile(r"/assignments/[^/]+/baseline"), lambda: settings.MAX_ARCHIVE_BYTES),
+]
+
+
+def _limit_of(path: str) -> Callable[[], int] | None:
+    for pattern, limit_of in UPLOAD_LIMITS:
+        if pattern.fullmatch(path):
+            return limit_of
+    return None
+
+
+def too_large(limit: int) -> str:
+    return f"Archive exceeds the {limit} byte limit."
+
+
+class UploadLimitMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        limit_of = _limit_of(scope["path"]) if scope["type"] == "http" else None
+        if limit_of is None:
+            await self.app(scope, receive, send)
+            return
+
+        limit = limit_of()
+        max_body = limit + MULTIPART_OVERHEAD
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > max_body:
+            response = JSONResponse({"detail": too_large(limit)}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def receive_limited():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_body:
+                    # Raised inside form parsing; FastAPI passes HTTPExceptions through
+                    raise HTTPException(status_code=413, detail=too_large(limit))
+            return message
+
+        await self.app(scope, receive_limited, send)
@@ -0,0 +1,221 @@
+"""
+Per-stage request timings and Prometheus metrics.
+
+``stage(name)`` times one phase of the work behind a request (clone, scan, DB
+commit, ...). Every stage is recorded in the ``grading_stage_duration_seconds``
+histogram; inside a request handled by ``TimingMiddleware`` it is also added
+to the response's ``Server-Timing`` header and to the request's structured
+log line. Stages with the same name add up, so a request that reads many
+files reports one ``read`` total. ``render()`` produces the Prometheus text
+format served on ``GET /metrics``.
+"""
+
+import bisect
+import contextvars
+import json
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterable, Iterator
+
+from starlette.datastructures import MutableHeaders
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30)
+BYTES_BUCKETS = (1024, 10 * 1024, 100 * 1024, 1024 ** 2, 10 * 1024 ** 2, 50 * 1024 ** 2)
+COUNT_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+TOKEN_BUCKETS = (0, 1000, 5000, 10_000, 50_000, 100_000, 500_000, 1_000_000)
+
+_registry: list["Histogram"] = []
+
+
+def _format(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Histogram:
+    """A Prometheus histogram; safe to observe from any thread."""
+
+    def __init__(self, name: str, documentation: str, buckets: tuple, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(float(b) for b in buckets)
+        self.labelnames = labelnames
+        # label values -> [per-bucket counts (last is +Inf), sum]
+        self._series: dict[tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((key, list(counts), total) for key, (counts, total) in self._series.items())
+        for key, counts, total in series:
+            labels = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key)]
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                bucket_labels = ",".join(labels + [f'le="{_format(bound)}"'])
+                lines.append(f"{self.name}_bucket{{{bucket_labels}}} {cumulative}")
+            suffix = "{" + ",".join(labels) + "}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {_format(total)}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Request latency by route.", LATENCY_BUCKETS, ("method", "route", "status"),
+)
+STAGE_SECONDS = Histogram(
+    "grading_stage_duration_seconds", "Time spent in each stage of grading and rubric uploads.", LATENCY_BUCKETS, ("stage",),
+)
+CLONE_SECONDS = Histogram("git_clone_duration_seconds", "Time to check out a student repository.", LATENCY_BUCKETS)
+SCANNED_BYTES = Histogram("grading_scanned_bytes", "Bytes of Java source read per grade.", BYTES_BUCKETS)
+SCANNED_FILES = Histogram("grading_scanned_files", "Java files read per grade.", COUNT_BUCKETS)
+CRITERIA_EVALUATED = Histogram(
+    "grading_criteria_evaluated", "Criterion evaluations (criteria x files scanned) per grade.", COUNT_BUCKETS,
+)
+LLM_TOKENS_SENT = Histogram(
+    "grading_llm_tokens_sent", "Prompt tokens sent to the model per LLM grade (cache misses only).", TOKEN_BUCKETS,
+)
+DB_CHECKOUT_SECONDS = Histogram(
+    "db_pool_checkout_wait_seconds", "Time to obtain a database connection from the pool.", WAIT_BUCKETS,
+)
+
+# Stage name -> seconds for the current request or benchmark run, set by collect()
+_timings: contextvars.ContextVar[dict[str, float] | None] = contextvars.ContextVar("timings", default=None)
+
+
+def record(name: str, seconds: float, histogram: Histogram | None = None) -> None:
+    STAGE_SECONDS.observe(seconds, stage=name)
+    if histogram is not None:
+        histogram.observe(seconds)
+    timings = _timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+@contextmanager
+def stage(name: str, histogram: Histogram | None = None):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start, histogram)
+
+
+@contextmanager
+def collect():
+    """Collect the stages recorded inside the block into the yielded ``{stage: seconds}`` dict."""
+    timings: dict[str, float] = {}
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+def timed(items: Iterable, name: str) -> Iterator:
+    """Iterate ``items``, recording the time spent producing them as one ``name`` stage.
+
+    Used for lazy pipelines where reading is interleaved with other work.
+    """
+    elapsed = 0.0
+    iterator = iter(items)
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                elapsed += time.perf_counter() - start
+            yield item
+    finally:
+        record(name, elapsed)
+
+
+def server_timing(timings: dict[str, float], total: float) -> str:
+    entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items()]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+
+def _route(scope) -> str:
+    route = scope.get("route")
+    # Route templates, not raw paths, keep label cardinality bounded.
+    return getattr(route, "path", "unmatched")
+
+
+class TimingMiddleware:
+    """Collects stage timings per request; adds ``Server-Timing``, logs them and records latency."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timings(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", server_timing(timings, time.perf_counter() - start))
+            await send(message)
+
+        try:
+            with collect() as timings:
+                await self.app(scope, receive, send_with_timings)
+        finally:
+            elapsed = time.perf_counter() - start
+            route = _route(scope)
+            REQUEST_SECONDS.observe(elapsed, method=scope["method"], route=route, status=status)
+            logger.info(json.dumps({
+                "event": "request",
+                "method": scope["method"],
+                "route": route,
+                "status": status,
+                "duration_ms": round(elapsed * 1000, 1),
+                "stages_ms": {name: round(seconds * 1000, 1) for name, seconds in timings.items()},
+            }))
+
+
+def render() -> str:
+    return "\n".join(line for histogram in _registry for line in histogram.render()) + "\n"
+
+
+def clear() -> None:
+    for histogram in _registry:
+        histogram.clear()
@@ -0,0 +1,54 @@
+"""
+Schema upgrades for databases created by earlier versions.
+
+``Base.metadata.create_all`` creates missing tables but never alters existing
+ones. ``upgrade`` adds the columns and indexes that existing tables gained
+since and is run at every startup right after ``create_all``; it only adds
+what is missing, so running it again is a no-op.
+"""
+
+import logging
+
+from sqlalchemy import Connection, inspect, text
+from sqlalchemy.schema import CreateColumn
+
+from app.db.models import Base
+
+logger = logging.getLogger(__name__)
+
+# Columns added to tables that already existed in deployed databases
+ADDED_COLUMNS = {
+    "assignments": ["results_version"],
+    "grading_results": ["repo_url", "commit_sha", "criteria_hash", "created_at", "partial"],
+}
+
+
+def _add_column(conn: Connection, table_name: str, column) -> None:
+    if conn.dialect.name == "sqlite" and column.server_default is not None and column.name == "created_at":
+        # SQLite cannot add a column with a non-constant default; later rows get
+        # their timestamp from the model's client-side default instead.
+        conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column.name} DATETIME"))
+        conn.execute(text(f"UPDATE {table_name} SET {column.name} = CURRENT_TIMESTAMP"))
+        return
+    ddl = CreateColumn(column).compile(dialect=conn.dialect)
+    conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {ddl}"))
+
+
+def upgrade(conn: Connection) -> list[str]:
+    """Add missing columns and indexes; returns the ``table.column`` names added."""
+    inspector = inspect(conn)
+    added = []
+    for table_name, column_names in ADDED_COLUMNS.items():
+        if not inspector.has_table(table_name):
+            continue
+        table = Base.metadata.tables[table_name]
+        existing = {column["name"] for column in inspector.get_columns(table_name)}
+        for name in column_names:
+            if name not in existing:
+                _add_column(conn, table_name, table.c[name])
+                added.append(f"{table_name}.{name}")
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+    if added:
+        logger.info("Added columns %s", ", ".join(added))
+    return added
@@ -1,4 +1,6 @@
-from sqlalchemy import Column, Integer, String, Float, Text, ForeignKey
+from datetime import datetime, timezone
+
+from sqlalchemy import Column, Integer, String, Float, Text, Boolean, DateTime, ForeignKey, Index, UniqueConstraint, false, func
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 
@@ -9,9 +11,12 @@ class Assignment(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, unique=True, index=True)
+    # Bumped in the transaction that saves results; the grade listings' ETag
+    results_version = Column(Integer, default=0, nullable=False, server_default="0")
 
     criteria = relationship("Criteria", back_populates="assignment", uselist=False)
     grading_results = relationship("GradingResult", back_populates="assignment")
+    baseline = relationship("Baseline", back_populates="assignment", uselist=False)
 
 class Criteria(Base):
     __tablename__ = "criteria"
@@ -30,5 +35,84 @@ class GradingResult(Base):
     student_id = Column(String, index=True)
     grade = Column(Float)
     feedback = Column(Text)
+    repo_url = Column(String)
+    commit_sha = Column(String(40))
+    criteria_hash = Column(String(64))
+    # Set by the client too: columns added by migrations.upgrade on SQLite have no server default
+    created_at = Column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), server_default=func.now(), index=True,
+    )
+    # Some criteria ran out of their time budget; never reused for regrades
+    partial = Column(Boolean, default=False, nullable=False, server_default=false())
 
     assignment = relationship("Assignment", back_populates="grading_results")
+    findings = relationship("GradingFinding", back_populates="result", order_by="GradingFinding.id")
+
+    __table_args__ = (
+        Index("ix_grading_results_submission", "assignment_id", "repo_url", "commit_sha", "criteria_hash"),
+        Index("ix_grading_results_assignment_id_id", "assignment_id", "id"),
+    )
+
+class GradingFinding(Base):
+    __tablename__ = "grading_findings"
+
+    id = Column(Integer, primary_key=True)
+    result_id = Column(Integer, ForeignKey("grading_results.id", ondelete="CASCADE"), nullable=False, index=True)
+    criterion_index = Column(Integer)
+    criterion = Column(String, index=True)
+    file = Column(String)
+    # NULL when the criterion ran out of its time budget on this file
+    line = Column(Integer)
+    deduction = Column(Float)
+
+    result = relationship("GradingResult", back_populates="findings")
+
+class Baseline(Base):
+    __tablename__ = "baselines"
+
+    id = Column(Integer, primary_key=True)
+    assignment_id = Column(Integer, ForeignKey("assignments.id"), unique=True, nullable=False)
+    source = Column(String)
+    digest = Column(String(64))
+    diff_lines = Column(Boolean, default=False, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    assignment = relationship("Assignment", back_populates="baseline")
+    files = relationship("BaselineFile", back_populates="baseline", cascade="all, delete-orphan")
+
+class BaselineFile(Base):
+    __tablename__ = "baseline_files"
+
+    id = Column(Integer, primary_key=True)
+    baseline_id = Column(Integer, ForeignKey("baselines.id", ondelete="CASCADE"), nullable=False)
+    path = Column(String, nullable=False)
+    content_hash = Column(String(64), nullable=False)
+    content = Column(Text)
+
+    baseline = relationship("Baseline", back_populates="files")
+
+    __table_args__ = (
+        UniqueConstraint("baseline_id", "path"),
+    )
+
+class GradingJob(Base):
+    """A queued ``POST /grade?job=true`` request, claimed by workers under a lease."""
+    __tablename__ = "grading_jobs"
+
+    id = Column(String(32), primary_key=True)
+    assignment_name = Column(String, nullable=False)
+    # GradingRequest as JSON; the token is removed once the job has finished
+    request = Column(Text, nullable=False)
+    status = Column(String(16), nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    lease_owner = Column(String)
+    lease_expires_at = Column(DateTime(timezone=True))
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    started_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
+    result = Column(Text)
+    error = Column(Text)
+
+    __table_args__ = (
+        Index("ix_grading_jobs_status_created_at", "status", "created_at"),
+    )
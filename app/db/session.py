@@ -1,9 +1,27 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from app.core.config import settings
 
 if settings.DATABASE_URL_USED.startswith("postgresql"):
-    import psycopg2
+    import asyncpg
 
-engine = create_engine(str(settings.DATABASE_URL_USED), pool_pre_ping=True)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def _engine_options(url: str) -> dict:
+    if url.startswith("sqlite"):
+        return {}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "connect_args": {"command_timeout": settings.DB_COMMAND_TIMEOUT},
+    }
+
+
+engine = create_async_engine(
+    settings.ASYNC_DATABASE_URL,
+    pool_pre_ping=True,
+    **_engine_options(settings.ASYNC_DATABASE_URL),
+)
+# expire_on_commit=False: attributes of committed objects stay readable without
+# an implicit (and, under asyncio, forbidden) lazy reload.
+SessionLocal = async_sessionmaker(engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
@@ -1,15 +1,34 @@
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api import routes
+from app.core import metrics
+from app.core.limits import UploadLimitMiddleware
 from app.core.config import settings
-from app.db.session import engine
+from app.db.session import engine, SessionLocal
 from app.db.models import Base
+from app.db import migrations
+from app.services import job_queue, rubric_cache, scan_pool
 
-# This will create the tables
-Base.metadata.create_all(bind=engine)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # This will create the tables
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(migrations.upgrade)
+
+    async with SessionLocal() as db:
+        await rubric_cache.warm_up(db)
+    await job_queue.grading_jobs.start()
+    yield
+    await job_queue.grading_jobs.stop()
+    scan_pool.shutdown()
+    await engine.dispose()
+
+
+app = FastAPI(lifespan=lifespan)
 
 ENV = os.getenv("ENV", "development")
 
@@ -21,4 +40,7 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(UploadLimitMiddleware)
+app.add_middleware(metrics.TimingMiddleware)
+
 app.include_router(routes.router)
@@ -4,6 +4,17 @@ class GradingRequest(BaseModel):
     assignment_name: str
     repo_link: HttpUrl
     token: str
+    force: bool = False
 
 class AssignmentCreate(BaseModel):
     assignment_name: str
+
+class BatchSubmission(BaseModel):
+    repo_link: HttpUrl
+    token: str
+    student_id: str | None = None
+
+class BatchGradingRequest(BaseModel):
+    assignment_name: str
+    submissions: list[BatchSubmission]
+    force: bool = False
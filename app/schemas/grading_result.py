@@ -1,10 +1,45 @@
-from pydantic import BaseModel
+from datetime import datetime
+from pydantic import BaseModel, Field
 
 class GradingResult(BaseModel):
+    id: int | None = None
     assignment_name: str
     student_id: str
     grade: float
-    feedback: str
+    feedback: str | None
+    created_at: datetime | None = None
 
     class Config:
         from_attributes = True
+
+class GradeQuery(BaseModel):
+    """Filters and keyset cursor shared by the grade listing endpoints."""
+    assignment: str | None = None
+    since: datetime | None = None
+    until: datetime | None = None
+    after_id: int | None = None
+    limit: int | None = Field(None, ge=1, le=1000)
+    stream: bool = False
+    include_feedback: bool = True
+
+class CriterionCost(BaseModel):
+    criterion: str
+    occurrences: int
+    submissions: int
+    points: float
+
+class HistogramBucket(BaseModel):
+    lower: float
+    upper: float
+    count: int
+
+class AssignmentStats(BaseModel):
+    assignment_name: str
+    count: int
+    mean: float | None = None
+    median: float | None = None
+    min: float | None = None
+    max: float | None = None
+    percentiles: dict[str, float] = {}
+    histogram: list[HistogramBucket]
+    deductions: list[CriterionCost]
@@ -0,0 +1,13 @@
+from datetime import datetime
+from typing import Any
+from pydantic import BaseModel
+
+class GradingJob(BaseModel):
+    job_id: str
+    status: str
+    assignment_name: str
+    created_at: datetime
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+    result: dict[str, Any] | None = None
+    error: dict[str, Any] | None = None
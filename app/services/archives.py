@@ -0,0 +1,151 @@
+"""
+Read Java sources straight out of zip and tar archives.
+
+Entries are never extracted to disk, so paths like ``../../etc`` or symlinks
+inside an archive cannot escape anywhere. Only regular files below the
+assignment folder (at the archive root or inside one wrapping directory, as in
+GitHub's "Download ZIP") are read. Entry counts and sizes are checked
+against ``ArchiveLimits`` before the entries are inflated, so a small
+compressed upload cannot expand into gigabytes.
+"""
+
+import io
+import logging
+import tarfile
+import zipfile
+import zlib
+from dataclasses import dataclass
+from pathlib import PurePosixPath
+from typing import BinaryIO, Iterator
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ArchiveError(Exception):
+    pass
+
+
+class ArchiveTooLarge(ArchiveError):
+    pass
+
+
+@dataclass(frozen=True)
+class ArchiveLimits:
+    max_entries: int
+    max_unpacked_bytes: int
+    max_file_bytes: int
+    max_source_bytes: int
+
+    @classmethod
+    def from_settings(cls) -> "ArchiveLimits":
+        return cls(
+            max_entries=settings.MAX_ARCHIVE_ENTRIES,
+            max_unpacked_bytes=settings.MAX_ARCHIVE_UNPACKED_BYTES,
+            max_file_bytes=settings.MAX_SOURCE_FILE_BYTES,
+            max_source_bytes=settings.MAX_SOURCE_REPO_BYTES,
+        )
+
+
+def _relative_path(name: str, assignment_name: str) -> str | None:
+    """``<assignment>/...`` part of an entry name, or None if the entry is outside the assignment."""
+    parts = PurePosixPath(name.replace("\\", "/")).parts
+    if not parts or parts[0] == "/" or ".." in parts:
+        return None
+    for i in range(min(2, len(parts) - 1)):
+        if parts[i] == assignment_name:
+            return "/".join(parts[i:])
+    return None
+
+
+def decode(data: bytes) -> str:
+    """Decode like ``open(path, "r", encoding="utf-8", errors="ignore")`` so hashes match checkouts."""
+    return io.TextIOWrapper(io.BytesIO(data), encoding="utf-8", errors="ignore").read()
+
+
+class _Budget:
+    """Running totals checked against ``ArchiveLimits`` as entries are listed and read."""
+
+    def __init__(self, limits: ArchiveLimits | None):
+        self.limits = limits
+        self.entries = 0
+        self.unpacked = 0
+        self.source = 0
+
+    def entry(self, size: int) -> None:
+        if self.limits is None:
+            return
+        self.entries += 1
+        self.unpacked += size
+        if self.entries > self.limits.max_entries:
+            raise ArchiveTooLarge(f"Archive has more than {self.limits.max_entries} entries.")
+        if self.unpacked > self.limits.max_unpacked_bytes:
+            raise ArchiveTooLarge(f"Archive unpacks to more than {self.limits.max_unpacked_bytes} bytes.")
+
+    def source_file(self, path: str, size: int) -> bool:
+        """Whether a Java file of ``size`` bytes should be read."""
+        if self.limits is None:
+            return True
+        if size > self.limits.max_file_bytes:
+            logger.warning("Skipping %s: %d bytes is over the %d byte file limit", path, size, self.limits.max_file_bytes)
+            return False
+        self.source += size
+        if self.source > self.limits.max_source_bytes:
+            raise ArchiveTooLarge(f"Java sources exceed the {self.limits.max_source_bytes} byte limit.")
+        return True
+
+
+def java_sources(
+    fileobj: BinaryIO, filename: str, assignment_name: str, limits: ArchiveLimits | None = None,
+) -> Iterator[tuple[str, str]]:
+    """Yield ``(relative_path, content)`` for each ``.java`` file of the assignment in a zip or tar archive.
+
+    With ``limits``, an archive with too many entries or too many unpacked
+    bytes raises ``ArchiveTooLarge`` (zip bombs), and Java files over the
+    per-file limit are skipped like they are in a checkout. Corrupt archives
+    raise ``ArchiveError``.
+    """
+    budget = _Budget(limits)
+    fileobj.seek(0)
+    try:
+        if zipfile.is_zipfile(fileobj):
+            fileobj.seek(0)
+            yield from _zip_sources(fileobj, assignment_name, budget)
+        else:
+            fileobj.seek(0)
+            yield from _tar_sources(fileobj, filename, assignment_name, budget)
+    except (zipfile.BadZipFile, tarfile.TarError, zlib.error, EOFError) as e:
+        raise ArchiveError(f"'{filename}' is corrupt: {e}")
+
+
+def _zip_sources(fileobj: BinaryIO, assignment_name: str, budget: _Budget) -> Iterator[tuple[str, str]]:
+    with zipfile.ZipFile(fileobj) as archive:
+        entries = archive.infolist()
+        for info in entries:
+            # The central directory is checked before anything is inflated;
+            # zipfile never reads more than an entry's declared size.
+            budget.entry(info.file_size)
+        for info in entries:
+            path = _relative_path(info.filename, assignment_name)
+            if info.is_dir() or path is None or not path.endswith(".java"):
+                continue
+            if budget.source_file(path, info.file_size):
+                yield path, decode(archive.read(info))
+
+
+def _tar_sources(fileobj: BinaryIO, filename: str, assignment_name: str, budget: _Budget) -> Iterator[tuple[str, str]]:
+    try:
+        archive = tarfile.open(fileobj=fileobj, mode="r:*")
+    except tarfile.ReadError:
+        raise ArchiveError(f"'{filename}' is not a zip or tar archive.")
+    with archive:
+        # Members are read as the stream is decompressed, so the limits apply
+        # before anything past them is inflated.
+        for member in archive:
+            budget.entry(member.size)
+            path = _relative_path(member.name, assignment_name)
+            if not member.isfile() or path is None or not path.endswith(".java"):
+                continue
+            if budget.source_file(path, member.size):
+                yield path, decode(archive.extractfile(member).read())
@@ -0,0 +1,153 @@
+"""
+Starter-code baselines.
+
+An assignment can register the template repository it was handed out from.
+Template files are hashed once when the baseline is saved; at grade time files
+identical to a template file are skipped, and with ``diff_lines`` findings on
+lines copied unchanged from the template file at the same path are dropped.
+"""
+
+import hashlib
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+from typing import Iterable
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.db import models
+from app.services.findings_cache import content_hash
+
+
+@dataclass(frozen=True)
+class BaselineIndex:
+    digest: str
+    diff_lines: bool
+    hashes: frozenset
+    # path -> template lines, only loaded for diff_lines baselines
+    lines: dict
+
+
+# (assignment id, baseline digest) -> BaselineIndex
+_indexes = LRUCache(settings.BASELINE_CACHE_SIZE)
+
+
+def _digest(files: list[tuple[str, str]], diff_lines: bool) -> str:
+    sha = hashlib.sha256(b"lines" if diff_lines else b"files")
+    for path, file_hash in sorted(files):
+        sha.update(f"\0{path}\0{file_hash}".encode("utf-8"))
+    return sha.hexdigest()
+
+
+def grading_digest(rubric_digest: str, index: BaselineIndex | None) -> str:
+    """Hash stored with results: the rubric's, combined with the baseline's when there is one."""
+    if index is None:
+        return rubric_digest
+    return hashlib.sha256(f"{rubric_digest}:{index.digest}".encode("ascii")).hexdigest()
+
+
+def new_lines(template_lines: list[str], content: str) -> set[int]:
+    """Line numbers of ``content`` that are not an unchanged copy of a template line.
+
+    The common prefix and suffix are matched directly and lines that do not
+    occur in the template at all are new without diffing; only the remaining
+    shared lines go through ``SequenceMatcher``, with its popular-line
+    heuristic on so that repeated lines (``}``, blank lines) keep it close to
+    linear. A line the heuristic fails to match is counted as new, which keeps
+    its findings.
+    """
+    lines = content.splitlines()
+    start = 0
+    limit = min(len(template_lines), len(lines))
+    while start < limit and template_lines[start] == lines[start]:
+        start += 1
+    end = 0
+    while end < limit - start and template_lines[-1 - end] == lines[-1 - end]:
+        end += 1
+
+    template_middle = template_lines[start:len(template_lines) - end]
+    known = set(template_middle)
+    changed = set()
+    # 0-based indices into lines of the middle lines that also occur in the template
+    shared = []
+    for j in range(start, len(lines) - end):
+        if lines[j] in known:
+            shared.append(j)
+        else:
+            changed.add(j + 1)
+    if shared:
+        present = {lines[j] for j in shared}
+        template_shared = [line for line in template_middle if line in present]
+        matcher = SequenceMatcher(None, template_shared, [lines[j] for j in shared])
+        for tag, _, _, j1, j2 in matcher.get_opcodes():
+            if tag in ("replace", "insert"):
+                changed.update(shared[k] + 1 for k in range(j1, j2))
+    return changed
+
+
+async def save(
+    db: AsyncSession, assignment_id: int, sources: Iterable[tuple[str, str]], source: str, diff_lines: bool,
+) -> tuple[models.Baseline, int]:
+    """Replace the assignment's baseline with ``(relative_path, content)`` sources. Returns it with its file count."""
+    rows = [
+        {"path": path, "content_hash": content_hash(content), "content": content}
+        for path, content in sources
+    ]
+    await remove(db, assignment_id)
+    baseline = models.Baseline(
+        assignment_id=assignment_id,
+        source=source,
+        digest=_digest([(row["path"], row["content_hash"]) for row in rows], diff_lines),
+        diff_lines=diff_lines,
+    )
+    db.add(baseline)
+    await db.flush()
+    if rows:
+        await db.execute(insert(models.BaselineFile), [{**row, "baseline_id": baseline.id} for row in rows])
+    await db.commit()
+    return baseline, len(rows)
+
+
+async def remove(db: AsyncSession, assignment_id: int) -> bool:
+    """Delete the assignment's baseline without committing. Returns whether there was one."""
+    baseline_id = (await db.execute(
+        select(models.Baseline.id).where(models.Baseline.assignment_id == assignment_id)
+    )).scalar()
+    if baseline_id is None:
+        return False
+    await db.execute(delete(models.BaselineFile).where(models.BaselineFile.baseline_id == baseline_id))
+    await db.execute(delete(models.Baseline).where(models.Baseline.id == baseline_id))
+    return True
+
+
+async def load(db: AsyncSession, assignment_id: int) -> BaselineIndex | None:
+    row = (await db.execute(
+        select(models.Baseline.id, models.Baseline.digest, models.Baseline.diff_lines)
+        .where(models.Baseline.assignment_id == assignment_id)
+    )).first()
+    if row is None:
+        return None
+
+    key = (assignment_id, row.digest)
+    index = _indexes.get(key)
+    if index is not None:
+        return index
+
+    columns = [models.BaselineFile.path, models.BaselineFile.content_hash]
+    if row.diff_lines:
+        columns.append(models.BaselineFile.content)
+    files = (await db.execute(select(*columns).where(models.BaselineFile.baseline_id == row.id))).all()
+    index = BaselineIndex(
+        digest=row.digest,
+        diff_lines=row.diff_lines,
+        hashes=frozenset(file.content_hash for file in files),
+        lines={file.path: file.content.splitlines() for file in files} if row.diff_lines else {},
+    )
+    _indexes.put(key, index)
+    return index
+
+
+def clear() -> None:
+    _indexes.clear()
@@ -0,0 +1,60 @@
+"""
+Content-addressed cache of per-file scan findings.
+
+Starter code is byte-identical across a roster, so findings are keyed by the
+hash of a file's content plus the rubric hash rather than by student or path.
+Each distinct file is scanned once per rubric no matter how many students
+submit it or how often they are regraded.
+"""
+
+import hashlib
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.services.scanner import CompiledRubric
+
+# (content hash, rubric hash) -> tuple of (criterion index, line number)
+_findings = LRUCache(settings.FINDINGS_CACHE_SIZE)
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8", errors="surrogatepass")).hexdigest()
+
+
+def key(rubric: CompiledRubric, content: str) -> tuple[str, str] | None:
+    """Cache key for ``content`` under ``rubric``, or None if the rubric cannot be cached."""
+    if rubric.digest is None:
+        return None
+    return content_hash(content), rubric.digest
+
+
+def get(cache_key: tuple[str, str] | None) -> tuple[tuple[int, int], ...] | None:
+    return None if cache_key is None else _findings.get(cache_key)
+
+
+def put(cache_key: tuple[str, str] | None, hits: tuple[tuple[int, int], ...]) -> None:
+    if cache_key is not None:
+        _findings.put(cache_key, hits)
+
+
+def scan(rubric: CompiledRubric, content: str) -> tuple[tuple[tuple[int, int], ...], bool]:
+    """Return ``(findings, cached)`` for ``content``, scanning it only on a cache miss.
+
+    Raises ``ScanTimeout`` (and caches nothing) if a criterion ran out of its time budget.
+    """
+    cache_key = key(rubric, content)
+    hits = get(cache_key)
+    if hits is not None:
+        return hits, True
+
+    hits = tuple(rubric.scan(content, settings.REGEX_TIME_BUDGET))
+    put(cache_key, hits)
+    return hits, False
+
+
+def stats() -> dict:
+    return _findings.stats()
+
+
+def clear() -> None:
+    _findings.clear()
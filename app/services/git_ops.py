@@ -0,0 +1,145 @@
+import asyncio
+import base64
+import logging
+import os
+import re
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+_CREDENTIALS = re.compile(r"(://)[^/@\s]+@")
+
+
+class GitError(Exception):
+    def __init__(self, args: tuple, returncode: int, stderr: str):
+        self.command = args
+        self.returncode = returncode
+        self.stderr = redact(stderr)
+        super().__init__(f"git {args[0] if args else ''} exited with {returncode}: {self.stderr}")
+
+
+@dataclass
+class CloneStats:
+    seconds: float
+    bytes_transferred: int
+    commit_sha: str
+
+
+def redact(text: str) -> str:
+    """Strip credentials embedded in URLs (``https://oauth2:<token>@host``)."""
+    return _CREDENTIALS.sub(r"\1***@", text)
+
+
+def auth_env(token: str | None) -> dict[str, str]:
+    """Environment for ``run_git`` that authenticates over HTTPS.
+
+    The header is passed as ``GIT_CONFIG_*`` variables rather than ``-c`` or a
+    URL, so it never appears in the process's arguments (``ps``,
+    ``/proc/<pid>/cmdline``), which any local user can read, nor in the
+    clone's config.
+    """
+    if not token:
+        return {}
+    credentials = base64.b64encode(f"oauth2:{token}".encode("utf-8")).decode("ascii")
+    return {
+        "GIT_CONFIG_COUNT": "1",
+        "GIT_CONFIG_KEY_0": "http.extraHeader",
+        "GIT_CONFIG_VALUE_0": f"Authorization: Basic {credentials}",
+    }
+
+
+async def run_git(
+    *args: str, cwd: str | None = None, timeout: float | None = None, env: dict[str, str] | None = None,
+) -> str:
+    """Run a git command without blocking the event loop.
+
+    ``env`` is added to the inherited environment. The child process is killed
+    if the timeout expires or the awaiting task is cancelled, so an abandoned
+    request never leaves a clone running.
+    """
+    env = dict(os.environ, GIT_TERMINAL_PROMPT="0", **(env or {}))
+    process = await asyncio.create_subprocess_exec(
+        "git", *args,
+        cwd=cwd,
+        env=env,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+    except (asyncio.TimeoutError, asyncio.CancelledError):
+        if process.returncode is None:
+            process.kill()
+        await process.wait()
+        raise
+
+    if process.returncode != 0:
+        raise GitError(args, process.returncode, stderr.decode("utf-8", errors="replace"))
+    return stdout.decode("utf-8", errors="replace")
+
+
+async def packed_bytes(git_dir: str) -> int:
+    output = await run_git("--git-dir", git_dir, "count-objects", "-v")
+    counts = dict(line.split(": ", 1) for line in output.splitlines() if ": " in line)
+    return (int(counts.get("size", 0)) + int(counts.get("size-pack", 0))) * 1024
+
+
+async def sparse_clone(url: str, dest: str, subdir: str, timeout: float | None = None, token: str | None = None) -> CloneStats:
+    """Shallow, blob-filtered clone of ``url`` that only checks out ``subdir``.
+
+    ``token`` authenticates the clone and the blob fetches of the checkout; it
+    is passed as an HTTP header and never stored in the clone's config.
+    """
+    auth = auth_env(token)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    deadline = None if timeout is None else start + timeout
+
+    def remaining() -> float | None:
+        return None if deadline is None else max(deadline - loop.time(), 0)
+
+    await run_git(
+        "clone", "--depth", "1", "--filter=blob:none", "--no-checkout", "--sparse", "--quiet",
+        url, dest,
+        timeout=remaining(), env=auth,
+    )
+    await run_git("sparse-checkout", "set", "--", subdir, cwd=dest, timeout=remaining(), env=auth)
+    await run_git("checkout", "--quiet", cwd=dest, timeout=remaining(), env=auth)
+    commit_sha = (await run_git("rev-parse", "HEAD", cwd=dest)).strip()
+
+    stats = CloneStats(
+        seconds=loop.time() - start,
+        bytes_transferred=await packed_bytes(os.path.join(dest, ".git")),
+        commit_sha=commit_sha,
+    )
+    logger.info(
+        "Cloned %s (%s) in %.3fs, %d bytes transferred",
+        redact(url), subdir, stats.seconds, stats.bytes_transferred,
+    )
+    return stats
+
+
+async def ls_remote_head(url: str, token: str | None = None, timeout: float | None = None) -> str | None:
+    """Commit SHA the remote HEAD points at, without fetching any objects."""
+    output = await run_git("ls-remote", url, "HEAD", timeout=timeout, env=auth_env(token))
+    for line in output.splitlines():
+        sha, _, ref = line.partition("\t")
+        if ref == "HEAD":
+            return sha
+    return None
+
+
+async def changed_paths(
+    repo_dir: str, old: str, new: str, subdir: str, token: str | None = None, timeout: float | None = None,
+) -> set[str]:
+    """Paths under ``subdir`` added, modified or deleted between two commits.
+
+    Only trees are compared, so no file contents are downloaded. Objects missing
+    from a shallow or blob-filtered clone are fetched from the remote on demand.
+    """
+    output = await run_git(
+        "diff", "--name-only", "--no-renames", "-z", old, new, "--", subdir,
+        cwd=repo_dir, timeout=timeout, env=auth_env(token),
+    )
+    return {path for path in output.split("\0") if path}
@@ -0,0 +1,83 @@
+"""
+Conditional GET support and a response cache for the grade listings.
+
+Every transaction that saves results also increments the assignment's
+``results_version``, so the version (summed over all assignments for the
+unfiltered listing) changes exactly when a listing can have changed, whatever
+order parallel workers commit in and whichever process they run in. It is the
+listing's ETag, which every API process computes alike, and an
+``If-None-Match`` that matches it is answered without running the listing
+query.
+
+Serialized listings are cached per URL under their ETag. Saving results in
+this process also bumps a per-assignment change counter and drops the affected
+entries; a listing that was computed while such a write happened is not
+cached.
+"""
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.db import models
+
+# (assignment id or None, path, query string) -> (etag, body, headers)
+_responses = LRUCache(settings.LISTING_CACHE_SIZE)
+# assignment id -> results saved by this process
+_changes: dict[int, int] = {}
+
+
+async def version(db: AsyncSession, assignment_name: str | None) -> tuple[int | None, str]:
+    """``(assignment id, etag)`` of the grades listed for ``assignment_name``, or for all assignments."""
+    if assignment_name is None:
+        total = await db.scalar(select(func.sum(models.Assignment.results_version)))
+        return None, f'"{total or 0}"'
+
+    row = (await db.execute(
+        select(models.Assignment.id, models.Assignment.results_version).where(models.Assignment.name == assignment_name)
+    )).first()
+    if row is None:
+        return None, '"0"'
+    return row.id, f'"{row.id}-{row.results_version}"'
+
+
+def matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in tags or etag in tags
+
+
+def changes(assignment_id: int | None) -> int:
+    """Change counter guarding a cache entry; listings over all assignments watch every write."""
+    if assignment_id is None:
+        return sum(_changes.values())
+    return _changes.get(assignment_id, 0)
+
+
+def get(key: tuple, etag: str) -> tuple[bytes, dict] | None:
+    cached = _responses.get(key)
+    if cached is None or cached[0] != etag:
+        return None
+    return cached[1], cached[2]
+
+
+def put(key: tuple, etag: str, body: bytes, headers: dict, generation: int) -> None:
+    """Cache a listing unless it is too large or a write to its assignment happened since ``generation``."""
+    if len(body) <= settings.LISTING_CACHE_MAX_BODY and changes(key[0]) == generation:
+        _responses.put(key, (etag, body, headers))
+
+
+def invalidate(assignment_id: int) -> None:
+    _changes[assignment_id] = _changes.get(assignment_id, 0) + 1
+    _responses.discard_where(lambda key: key[0] is None or key[0] == assignment_id)
+
+
+def stats() -> dict:
+    return _responses.stats()
+
+
+def clear() -> None:
+    _responses.clear()
+    _changes.clear()
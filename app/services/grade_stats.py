@@ -0,0 +1,118 @@
+"""
+Per-assignment grade statistics.
+
+Grades are read as a single sorted column (no ORM objects) and summarised in
+one pass; the deduction breakdown is a SQL aggregate over the findings rows.
+Results are cached per assignment and dropped whenever a new result for that
+assignment is committed. Cached entries also remember the assignment's latest
+result id, which is checked with one indexed lookup, so results committed by
+other processes (``python -m app.worker``) are picked up as well.
+"""
+
+import math
+from bisect import bisect_left
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.db import models
+from app.schemas.grading_result import AssignmentStats, CriterionCost, HistogramBucket
+
+PERCENTILES = (10, 25, 75, 90)
+HISTOGRAM_WIDTH = 10
+
+# assignment id -> (latest result id, AssignmentStats)
+_stats = LRUCache(settings.STATS_CACHE_SIZE)
+# assignment id -> number of invalidations, so a computation that raced an insert is not cached
+_generations: dict[int, int] = {}
+
+
+def percentile(ordered: list[float], pct: float) -> float:
+    """Linearly interpolated percentile of an already sorted list."""
+    position = (len(ordered) - 1) * pct / 100
+    lower = math.floor(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def histogram(ordered: list[float]) -> list[HistogramBucket]:
+    """Counts per 10-point bucket from 0 to 100; grades outside the range fall into the end buckets."""
+    edges = list(range(HISTOGRAM_WIDTH, 100, HISTOGRAM_WIDTH))
+    positions = [0, *(bisect_left(ordered, edge) for edge in edges), len(ordered)]
+    return [
+        HistogramBucket(lower=lower, upper=lower + HISTOGRAM_WIDTH, count=positions[i + 1] - positions[i])
+        for i, lower in enumerate(range(0, 100, HISTOGRAM_WIDTH))
+    ]
+
+
+async def criterion_costs(db: AsyncSession, assignment_id: int) -> list[CriterionCost]:
+    points = func.sum(models.GradingFinding.deduction)
+    rows = await db.execute(
+        select(
+            models.GradingFinding.criterion,
+            func.count().label("occurrences"),
+            func.count(func.distinct(models.GradingFinding.result_id)).label("submissions"),
+            points.label("points"),
+        )
+        .join(models.GradingResult, models.GradingFinding.result_id == models.GradingResult.id)
+        .where(models.GradingResult.assignment_id == assignment_id, models.GradingFinding.line.is_not(None))
+        .group_by(models.GradingFinding.criterion)
+        .order_by(points.desc())
+    )
+    return [CriterionCost(**row._mapping) for row in rows]
+
+
+async def _latest_result_id(db: AsyncSession, assignment_id: int) -> int | None:
+    return await db.scalar(
+        select(func.max(models.GradingResult.id)).where(models.GradingResult.assignment_id == assignment_id)
+    )
+
+
+async def assignment_stats(db: AsyncSession, assignment: models.Assignment) -> AssignmentStats:
+    latest = await _latest_result_id(db, assignment.id)
+    cached = _stats.get(assignment.id)
+    if cached is not None and cached[0] == latest:
+        return cached[1]
+
+    generation = _generations.get(assignment.id, 0)
+    grades = list((await db.execute(
+        select(models.GradingResult.grade)
+        .where(models.GradingResult.assignment_id == assignment.id)
+        .order_by(models.GradingResult.grade)
+    )).scalars())
+
+    summary = {}
+    if grades:
+        summary = {
+            "mean": math.fsum(grades) / len(grades),
+            "median": percentile(grades, 50),
+            "min": grades[0],
+            "max": grades[-1],
+            "percentiles": {f"p{pct}": percentile(grades, pct) for pct in PERCENTILES},
+        }
+    stats = AssignmentStats(
+        assignment_name=assignment.name,
+        count=len(grades),
+        histogram=histogram(grades),
+        deductions=await criterion_costs(db, assignment.id),
+        **summary,
+    )
+    if _generations.get(assignment.id, 0) == generation:
+        _stats.put(assignment.id, (latest, stats))
+    return stats
+
+
+def invalidate(assignment_id: int) -> None:
+    _generations[assignment_id] = _generations.get(assignment_id, 0) + 1
+    _stats.pop(assignment_id)
+
+
+def stats() -> dict:
+    return _stats.stats()
+
+
+def clear() -> None:
+    _stats.clear()
+    _generations.clear()
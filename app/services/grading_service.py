@@ -1,172 +1,688 @@
 from fastapi import UploadFile, HTTPException
-from sqlalchemy.orm import Session, joinedload
-from app.schemas.grading import GradingRequest, AssignmentCreate
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from app.schemas.grading import GradingRequest, AssignmentCreate, BatchGradingRequest, BatchSubmission
 from app.db import models
-from app.schemas.grading_result import GradingResult as GradingResultSchema
+from app.schemas.grading_result import GradingResult as GradingResultSchema, GradeQuery, CriterionCost, AssignmentStats
+from app.core import limits, metrics
+from app.core.config import settings
+from app.services import archives, baseline, findings_cache, git_ops, grade_listing, grade_stats, repo_cache, rubric_cache, scan_pool, sources
+from app.services.scanner import CompiledRubric, check_patterns
+from contextlib import AsyncExitStack, asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, Callable, Iterable, Iterator
+import asyncio
+import json
+import logging
 import tempfile
-import subprocess
 import os
 import docx
 
 import docx
 
-async def create_assignment(request: AssignmentCreate, db: Session):
-    db_assignment = db.query(models.Assignment).filter(models.Assignment.name == request.assignment_name).first()
+logger = logging.getLogger(__name__)
+
+async def _get_assignment(db: AsyncSession, assignment_name: str, *options):
+    result = await db.execute(
+        select(models.Assignment).where(models.Assignment.name == assignment_name).options(*options)
+    )
+    return result.scalars().first()
+
+async def create_assignment(request: AssignmentCreate, db: AsyncSession):
+    db_assignment = await _get_assignment(db, request.assignment_name)
     if db_assignment:
         raise HTTPException(status_code=400, detail="Assignment already exists")
     new_assignment = models.Assignment(name=request.assignment_name)
     db.add(new_assignment)
-    db.commit()
-    db.refresh(new_assignment)
+    await db.commit()
+    await db.refresh(new_assignment)
     return new_assignment
 
-async def save_criteria(assignment_name: str, criteria_file: UploadFile, db: Session):
-    assignment = db.query(models.Assignment).filter(models.Assignment.name == assignment_name).first()
+def _check_patterns(criteria_text: str, allow_unsafe_patterns: bool) -> list[str]:
+    """Reject invalid regexes and, unless allowed, ones prone to catastrophic backtracking. Returns the risky ones."""
+    try:
+        grading_criteria = json.loads(criteria_text)
+    except json.JSONDecodeError:
+        return []
+    if not isinstance(grading_criteria, list):
+        return []
+
+    invalid, risky = check_patterns(grading_criteria, settings.REGEX_ENGINE)
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Invalid patterns: {'; '.join(invalid)}")
+    if risky and not allow_unsafe_patterns:
+        raise HTTPException(
+            status_code=400,
+            detail=(
+                f"Patterns prone to catastrophic backtracking: {', '.join(risky)}. "
+                "Rewrite them without nested quantifiers, or pass allow_unsafe_patterns=true "
+                "to keep them under the per-criterion time budget."
+            ),
+        )
+    return risky
+
+async def save_criteria(assignment_name: str, criteria_file: UploadFile, db: AsyncSession, allow_unsafe_patterns: bool = False):
+    assignment = await _get_assignment(db, assignment_name)
     if not assignment:
         assignment = models.Assignment(name=assignment_name)
         db.add(assignment)
-        db.commit()
-        db.refresh(assignment)
+        await db.commit()
+        await db.refresh(assignment)
 
     file_extension = criteria_file.filename.split('.')[-1]
     if file_extension not in ['txt', 'docx', 'json']:
         raise HTTPException(status_code=400, detail="Invalid file type. Only .txt, .docx, and .json files are allowed.")
 
-    if file_extension == 'docx':
-        try:
-            doc = docx.Document(criteria_file.file)
-            criteria_text = "\n".join([para.text for para in doc.paragraphs])
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Error processing .docx file: {e}")
-    else:
-        criteria_text_bytes = await criteria_file.read()
-        criteria_text = criteria_text_bytes.decode("utf-8")
+    with metrics.stage("parse"):
+        if file_extension == 'docx':
+            try:
+                doc = docx.Document(criteria_file.file)
+                criteria_text = "\n".join([para.text for para in doc.paragraphs])
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"Error processing .docx file: {e}")
+        else:
+            criteria_text_bytes = await criteria_file.read()
+            criteria_text = criteria_text_bytes.decode("utf-8")
 
-    criteria = db.query(models.Criteria).filter(models.Criteria.assignment_id == assignment.id).first()
-    if criteria:
-        criteria.text = criteria_text
-    else:
-        criteria = models.Criteria(assignment_id=assignment.id, text=criteria_text)
-        db.add(criteria)
-    
-    db.commit()
-    return {"message": f"Criteria for {assignment_name} saved."}
+    with metrics.stage("check_patterns"):
+        risky = _check_patterns(criteria_text, allow_unsafe_patterns)
 
-async def grade_assignment(request: GradingRequest, db: Session) -> dict:
-    repo_url = str(request.repo_link)
-    authenticated_url = repo_url.replace("https://", f"https://oauth2:{request.token}@")
+    with metrics.stage("db_commit"):
+        result = await db.execute(select(models.Criteria).where(models.Criteria.assignment_id == assignment.id))
+        criteria = result.scalars().first()
+        if criteria:
+            criteria.text = criteria_text
+        else:
+            criteria = models.Criteria(assignment_id=assignment.id, text=criteria_text)
+            db.add(criteria)
 
-    assignment = db.query(models.Assignment).filter(models.Assignment.name == request.assignment_name).first()
-    if not assignment or not assignment.criteria:
-        raise HTTPException(status_code=404, detail=f"Grading criteria for '{request.assignment_name}' not found.")
+        await db.commit()
+    with metrics.stage("compile"):
+        rubric_cache.replace(assignment_name, criteria_text)
+    response = {"message": f"Criteria for {assignment_name} saved."}
+    if risky:
+        response["flagged_patterns"] = risky
+    return response
+
+async def _template_sources(repo_path: str, assignment_name: str) -> list[tuple[str, str]]:
+    """Java sources of the assignment at HEAD of a local template repository."""
+    if settings.BASELINE_REPO_ROOT is None:
+        raise HTTPException(status_code=400, detail="Local template repositories are disabled; upload an archive instead.")
+    root = Path(settings.BASELINE_REPO_ROOT).resolve()
+    path = Path(repo_path).resolve()
+    if not path.is_relative_to(root):
+        raise HTTPException(status_code=400, detail=f"Template repository must be inside {root}.")
 
     with tempfile.TemporaryDirectory() as temp_dir:
         try:
-            subprocess.run(
-                ["git", "clone", authenticated_url, temp_dir],
-                check=True,
-                capture_output=True,
-                text=True
+            await git_ops.sparse_clone(path.as_uri(), temp_dir, assignment_name, timeout=settings.GIT_CLONE_TIMEOUT)
+        except git_ops.GitError as e:
+            raise HTTPException(status_code=400, detail=f"Failed to clone template repository: {e.stderr}")
+        reader = sources.SourceReader(assignment_name)
+        template_files = []
+        for source in sources.java_files(temp_dir, assignment_name):
+            content = reader.read(source)
+            if content is not None:
+                template_files.append((source.relative_path, content))
+        return template_files
+
+async def save_baseline(
+    assignment_name: str, db: AsyncSession, archive: UploadFile | None = None, repo_path: str | None = None, diff_lines: bool = False,
+):
+    assignment = await _get_assignment(db, assignment_name)
+    if not assignment:
+        raise HTTPException(status_code=404, detail=f"Assignment '{assignment_name}' not found.")
+    if (archive is None) == (repo_path is None):
+        raise HTTPException(status_code=400, detail="Provide either a template archive or a repo_path.")
+
+    if archive is not None:
+        # Spooled by Starlette already; UploadLimitMiddleware bounded it while it was received
+        if archive.size is not None and archive.size > settings.MAX_ARCHIVE_BYTES:
+            raise HTTPException(status_code=413, detail=limits.too_large(settings.MAX_ARCHIVE_BYTES))
+        source = archive.filename
+        archive_limits = archives.ArchiveLimits.from_settings()
+        try:
+            template_files = await asyncio.to_thread(
+                list, archives.java_sources(archive.file, archive.filename, assignment_name, archive_limits)
+            )
+        except archives.ArchiveTooLarge as e:
+            raise HTTPException(status_code=413, detail=f"Template archive too large: {e}")
+        except archives.ArchiveError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid template archive: {e}")
+    else:
+        source = repo_path
+        template_files = await _template_sources(repo_path, assignment_name)
+    if not template_files:
+        raise HTTPException(status_code=400, detail=f"No Java files found in '{assignment_name}' in the template.")
+
+    _, files = await baseline.save(db, assignment.id, template_files, source, diff_lines)
+    return {"message": f"Baseline for {assignment_name} saved.", "files": files, "diff_lines": diff_lines}
+
+async def delete_baseline(assignment_name: str, db: AsyncSession):
+    assignment = await _get_assignment(db, assignment_name)
+    if not assignment or not await baseline.remove(db, assignment.id):
+        raise HTTPException(status_code=404, detail=f"No baseline for '{assignment_name}'.")
+    await db.commit()
+    return {"message": f"Baseline for {assignment_name} removed."}
+
+@asynccontextmanager
+async def _checkout_repository(repo_url: str, token: str, assignment_name: str):
+    """Yield ``(path, commit_sha)`` of a local checkout containing ``assignment_name``."""
+    try:
+        async with AsyncExitStack() as stack:
+            with metrics.stage("clone", metrics.CLONE_SECONDS):
+                cache = repo_cache.get_cache()
+                if cache is not None:
+                    checkout = await stack.enter_async_context(cache.checkout(repo_url, assignment_name, token=token))
+                    path, commit_sha = checkout.path, checkout.commit_sha
+                else:
+                    path = stack.enter_context(tempfile.TemporaryDirectory())
+                    stats = await git_ops.sparse_clone(
+                        repo_url,
+                        path,
+                        assignment_name,
+                        timeout=settings.GIT_CLONE_TIMEOUT,
+                        token=token,
+                    )
+                    commit_sha = stats.commit_sha
+            yield path, commit_sha
+    except git_ops.GitError as e:
+        raise HTTPException(status_code=400, detail=f"Failed to clone repository: {e.stderr}")
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Timed out cloning repository.")
+
+async def _load_assignment(db: AsyncSession, assignment_name: str):
+    with metrics.stage("load"):
+        assignment = await _get_assignment(db, assignment_name, selectinload(models.Assignment.criteria))
+        if not assignment or not assignment.criteria:
+            raise HTTPException(status_code=404, detail=f"Grading criteria for '{assignment_name}' not found.")
+
+        rubric = rubric_cache.get_rubric(assignment.name, assignment.criteria.text)
+        return assignment, rubric, await baseline.load(db, assignment.id)
+
+async def _remote_head(repo_url: str, token: str) -> str | None:
+    try:
+        with metrics.stage("ls_remote"):
+            return await git_ops.ls_remote_head(repo_url, token=token, timeout=settings.GIT_CLONE_TIMEOUT)
+    except (git_ops.GitError, asyncio.TimeoutError):
+        # Let the clone report the problem.
+        return None
+
+async def _previous_result(db: AsyncSession, assignment_id: int, repo_url: str, commit_sha: str, criteria_hash: str):
+    """Latest stored result for this commit, graded with the same rubric."""
+    result = await db.execute(
+        select(models.GradingResult)
+        .where(
+            models.GradingResult.assignment_id == assignment_id,
+            models.GradingResult.repo_url == repo_url,
+            models.GradingResult.commit_sha == commit_sha,
+            models.GradingResult.criteria_hash == criteria_hash,
+            models.GradingResult.partial.is_(False),
+        )
+        .order_by(models.GradingResult.id.desc())
+        .limit(1)
+    )
+    return result.scalars().first()
+
+async def _last_graded(db: AsyncSession, assignment_id: int, repo_url: str, criteria_hash: str):
+    """Latest result for this repository with stored findings, graded with the same rubric."""
+    result = await db.execute(
+        select(models.GradingResult)
+        .where(
+            models.GradingResult.assignment_id == assignment_id,
+            models.GradingResult.repo_url == repo_url,
+            models.GradingResult.criteria_hash == criteria_hash,
+            models.GradingResult.commit_sha.is_not(None),
+            models.GradingResult.partial.is_(False),
+            # Results from before findings were stored as rows cannot be reused.
+            models.GradingResult.feedback.is_(None),
+        )
+        .order_by(models.GradingResult.id.desc())
+        .limit(1)
+        .options(selectinload(models.GradingResult.findings))
+    )
+    return result.scalars().first()
+
+async def _changed_since(previous, repo_dir: str, commit_sha: str, assignment_name: str, token: str) -> set[str] | None:
+    """Files changed since ``previous`` was graded, or None when everything has to be rescanned."""
+    if previous is None:
+        return None
+    if previous.commit_sha == commit_sha:
+        return set()
+    try:
+        with metrics.stage("diff"):
+            return await git_ops.changed_paths(
+                repo_dir, previous.commit_sha, commit_sha, assignment_name,
+                token=token, timeout=settings.GIT_CLONE_TIMEOUT,
             )
-        except subprocess.CalledProcessError as e:
-            raise HTTPException(status_code=400, detail=f"Failed to clone repository: {e.stderr}")
+    except (git_ops.GitError, asyncio.TimeoutError) as e:
+        # e.g. the previous commit was force-pushed away
+        logger.info("Rescanning all files: cannot diff against %s: %s", previous.commit_sha, e)
+        return None
+
+async def _grade_repository(
+    repo_url: str, token: str, assignment_name: str, rubric: CompiledRubric, previous=None, template=None,
+):
+    """Check out the student's repository and scan it. Returns ``(scan, commit_sha)``.
 
-        assignment_path = os.path.join(temp_dir, request.assignment_name)
+    With a ``previous`` result for the same rubric, only files changed since its
+    commit are read and scanned; the findings of the others are carried over.
+    Files identical to a ``template`` (baseline) file are not scanned at all.
+    """
+    async with _checkout_repository(repo_url, token, assignment_name) as (temp_dir, commit_sha):
+        assignment_path = os.path.join(temp_dir, assignment_name)
 
         if not os.path.isdir(assignment_path):
-            raise HTTPException(status_code=404, detail=f"Assignment folder '{request.assignment_name}' not found in the repository.")
-
-        source_files = []
-        for root, _, files in os.walk(assignment_path):
-            for file in files:
-                if file.endswith(".java"):
-                    file_path = os.path.join(root, file)
-                    with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-                        content = f.read()
-                    source_files.append({"path": file_path, "content": content})
-        
-        if not source_files:
-            raise HTTPException(status_code=404, detail=f"No Java files found in '{request.assignment_name}'.")
-
-        grading_result = await _grade_with_gemini(source_files, assignment.criteria.text)
-
-        # Save the grading result
-        student_id = "student_placeholder" # You would get this from the request or auth
-        new_grading_result = models.GradingResult(
-            assignment_id=assignment.id,
-            student_id=student_id,
-            grade=grading_result["grade"],
-            feedback=grading_result["feedback"]
+            raise HTTPException(status_code=404, detail=f"Assignment folder '{assignment_name}' not found in the repository.")
+
+        changed = await _changed_since(previous, temp_dir, commit_sha, assignment_name, token)
+        reused_hits = {}
+        if changed is not None:
+            for finding in previous.findings:
+                if finding.line is None:
+                    continue
+                reused_hits.setdefault(finding.file, []).append((finding.criterion_index, finding.line))
+
+        scan = await _grade_with_gemini(_source_files(temp_dir, assignment_name, changed, reused_hits, template), rubric)
+        if not scan["files"]:
+            raise HTTPException(status_code=404, detail=f"No Java files found in '{assignment_name}'.")
+
+        return scan, commit_sha
+
+def _source_files(checkout_root: str, assignment_name: str, changed, reused_hits: dict, template) -> Iterator[dict]:
+    """Lazily read the checkout's Java files, one at a time, for ``_grade_with_gemini``."""
+    reader = sources.SourceReader(assignment_name)
+    for source in sources.java_files(checkout_root, assignment_name):
+        if changed is not None and source.relative_path not in changed:
+            yield {"path": source.relative_path, "hits": reused_hits.get(source.relative_path, [])}
+            continue
+        content = reader.read(source)
+        if content is None:
+            # Over the per-file size limit
+            yield {"path": source.relative_path, "hits": []}
+            continue
+        yield _source_file(source.relative_path, content, template)
+
+def _source_file(path: str, content: str, template) -> dict:
+    if template is not None:
+        if findings_cache.content_hash(content) in template.hashes:
+            # Unmodified starter code
+            return {"path": path, "hits": []}
+        if template.diff_lines and path in template.lines:
+            return {"path": path, "content": content, "template_lines": template.lines[path]}
+    return {"path": path, "content": content}
+
+def _new_result(assignment_id: int, student_id: str, repo_url: str, commit_sha: str, criteria_hash: str, scan: dict):
+    # Feedback is rendered from the findings rows when a client asks for it.
+    return models.GradingResult(
+        assignment_id=assignment_id,
+        student_id=student_id,
+        grade=scan["grade"],
+        feedback=None,
+        partial=scan["partial"],
+        repo_url=repo_url,
+        commit_sha=commit_sha,
+        criteria_hash=criteria_hash,
+    )
+
+async def _save_results(db: AsyncSession, graded: list[tuple[models.GradingResult, list[dict]]]) -> None:
+    """Insert results and all of their findings with one bulk insert, then commit."""
+    with metrics.stage("db_commit"):
+        db.add_all(result for result, _ in graded)
+        await db.flush()
+        rows = [{**finding, "result_id": result.id} for result, findings in graded for finding in findings]
+        if rows:
+            await db.execute(insert(models.GradingFinding), rows)
+        # In id order, so concurrent savers lock the rows in the same order
+        for assignment_id in sorted({result.assignment_id for result, _ in graded}):
+            await db.execute(
+                update(models.Assignment)
+                .where(models.Assignment.id == assignment_id)
+                .values(results_version=models.Assignment.results_version + 1)
+            )
+        await db.commit()
+    for assignment_id in {result.assignment_id for result, _ in graded}:
+        grade_stats.invalidate(assignment_id)
+        grade_listing.invalidate(assignment_id)
+
+def _format_points(deduction) -> str:
+    return str(int(deduction)) if float(deduction).is_integer() else str(deduction)
+
+def render_feedback(findings) -> str:
+    """Feedback text for findings given as dicts or ``GradingFinding`` rows."""
+    lines = []
+    for finding in findings:
+        if not isinstance(finding, dict):
+            finding = {column: getattr(finding, column) for column in ("criterion", "file", "line", "deduction")}
+        if finding["line"] is None:
+            lines.append(f"- Not fully checked: {finding['criterion']} in {finding['file']} (time budget exceeded)")
+            continue
+        lines.append(
+            f"- {_format_points(finding['deduction'])} points: {finding['criterion']} in {finding['file']} on line {finding['line']}"
         )
-        db.add(new_grading_result)
-        db.commit()
+    return "\n".join(lines)
 
-        return {
-            "message": "Assignment analysis complete.",
-            "assignment_name": request.assignment_name,
-            "grading_result": grading_result
-        }
+def _grading_result(scan: dict) -> dict:
+    return {"grade": scan["grade"], "feedback": render_feedback(scan["findings"]), "partial": scan["partial"]}
 
-import re
-import json
+async def _feedback_by_result(db: AsyncSession, result_ids: list[int]) -> dict[int, str]:
+    """Render feedback for many results with a single findings query."""
+    if not result_ids:
+        return {}
+    rows = await db.execute(
+        select(models.GradingFinding)
+        .where(models.GradingFinding.result_id.in_(result_ids))
+        .order_by(models.GradingFinding.result_id, models.GradingFinding.id)
+    )
+    findings = {result_id: [] for result_id in result_ids}
+    for finding in rows.scalars():
+        findings[finding.result_id].append(finding)
+    return {result_id: render_feedback(items) for result_id, items in findings.items()}
 
-async def _grade_with_gemini(source_files: list, criteria: str) -> dict:
+async def _stored_grading_result(db: AsyncSession, result: models.GradingResult) -> dict:
+    feedback = result.feedback
+    if feedback is None:
+        feedback = (await _feedback_by_result(db, [result.id]))[result.id]
+    return {"grade": result.grade, "feedback": feedback, "partial": result.partial}
+
+async def grade_assignment(request: GradingRequest, db: AsyncSession) -> dict:
+    repo_url = str(request.repo_link)
+    assignment, rubric, template = await _load_assignment(db, request.assignment_name)
+    criteria_hash = baseline.grading_digest(rubric.digest, template)
+
+    if not request.force:
+        head_sha = await _remote_head(repo_url, request.token)
+        with metrics.stage("lookup"):
+            previous = head_sha and await _previous_result(db, assignment.id, repo_url, head_sha, criteria_hash)
+        if previous:
+            return {
+                "message": "Assignment analysis complete.",
+                "assignment_name": request.assignment_name,
+                "grading_result": await _stored_grading_result(db, previous),
+                "commit_sha": previous.commit_sha,
+                "cached": True,
+            }
+
+    # A forced regrade rescans everything instead of building on the last result.
+    with metrics.stage("lookup"):
+        previous = None if request.force else await _last_graded(db, assignment.id, repo_url, criteria_hash)
+    scan, commit_sha = await _grade_repository(repo_url, request.token, request.assignment_name, rubric, previous, template)
+
+    # Save the grading result
+    student_id = "student_placeholder" # You would get this from the request or auth
+    result = _new_result(assignment.id, student_id, repo_url, commit_sha, criteria_hash, scan)
+    await _save_results(db, [(result, scan["findings"])])
+
+    return {
+        "message": "Assignment analysis complete.",
+        "assignment_name": request.assignment_name,
+        "grading_result": _grading_result(scan),
+        "commit_sha": commit_sha,
+        "cached": False,
+    }
+
+def _archive_files(fileobj, filename: str, assignment_name: str, template) -> list[dict]:
+    """Read the archive's Java entries for ``_grade_with_gemini``; blocking, run it in a thread."""
+    archive_limits = archives.ArchiveLimits.from_settings()
     try:
-        grading_criteria = json.loads(criteria)
-    except json.JSONDecodeError:
-        raise HTTPException(status_code=400, detail="Invalid criteria format. Criteria must be a valid JSON.")
+        return [
+            _source_file(path, content, template)
+            for path, content in archives.java_sources(fileobj, filename, assignment_name, archive_limits)
+        ]
+    except archives.ArchiveTooLarge as e:
+        raise HTTPException(status_code=413, detail=f"Archive too large: {e}")
+    except archives.ArchiveError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid archive: {e}")
+
+async def grade_archive(assignment_name: str, archive: UploadFile, db: AsyncSession, student_id: str | None = None) -> dict:
+    """Grade a zip or tar upload of a submission without touching git."""
+    # Starlette has already spooled the upload; UploadLimitMiddleware bounded it while it was received
+    if archive.size is not None and archive.size > settings.MAX_ARCHIVE_BYTES:
+        raise HTTPException(status_code=413, detail=limits.too_large(settings.MAX_ARCHIVE_BYTES))
+    assignment, rubric, template = await _load_assignment(db, assignment_name)
+    criteria_hash = baseline.grading_digest(rubric.digest, template)
+
+    with metrics.stage("read"):
+        source_files = await asyncio.to_thread(_archive_files, archive.file, archive.filename, assignment_name, template)
+    scan = await _grade_with_gemini(source_files, rubric)
+    if not scan["files"]:
+        raise HTTPException(status_code=404, detail=f"No Java files found in '{assignment_name}' in the archive.")
+
+    result = _new_result(assignment.id, student_id or "student_placeholder", None, None, criteria_hash, scan)
+    await _save_results(db, [(result, scan["findings"])])
+
+    return {
+        "message": "Assignment analysis complete.",
+        "assignment_name": assignment_name,
+        "grading_result": _grading_result(scan),
+        "commit_sha": None,
+        "cached": False,
+    }
+
+async def grade_batch(request: BatchGradingRequest, db: AsyncSession, session_factory: Callable[[], AsyncSession]) -> AsyncIterator[str]:
+    """Validate a roster grade up front, then return a stream of NDJSON lines, one per submission."""
+    assignment, rubric, template = await _load_assignment(db, request.assignment_name)
+    return _stream_batch(request, assignment.id, rubric, template, session_factory)
+
+async def _stream_batch(
+    request: BatchGradingRequest, assignment_id: int, rubric: CompiledRubric, template, session_factory: Callable[[], AsyncSession],
+):
+    criteria_hash = baseline.grading_digest(rubric.digest, template)
+    semaphore = asyncio.Semaphore(settings.BATCH_CONCURRENCY)
+    db = session_factory()
+    pending = []
+
+    async def flush():
+        if pending:
+            await _save_results(db, pending)
+            pending.clear()
+
+    # One query for every stored result of this roster under the current rubric.
+    repo_urls = {str(submission.repo_link) for submission in request.submissions}
+    previous_results = {}
+    if not request.force:
+        rows = await db.execute(
+            select(models.GradingResult)
+            .where(
+                models.GradingResult.assignment_id == assignment_id,
+                models.GradingResult.criteria_hash == criteria_hash,
+                models.GradingResult.repo_url.in_(repo_urls),
+                models.GradingResult.partial.is_(False),
+            )
+            .order_by(models.GradingResult.id)
+        )
+        for row in rows.scalars():
+            previous_results[(row.repo_url, row.commit_sha)] = row
+
+    async def grade_one(index: int, submission: BatchSubmission):
+        repo_url = str(submission.repo_link)
+        student_id = submission.student_id or "student_placeholder"
+        line = {"index": index, "student_id": student_id, "repo_link": repo_url}
+        async with semaphore:
+            try:
+                if not request.force:
+                    head_sha = await _remote_head(repo_url, submission.token)
+                    previous = previous_results.get((repo_url, head_sha))
+                    if previous is not None:
+                        return {**line, "status": "cached", "previous": previous, "commit_sha": head_sha}, None
 
+                scan, commit_sha = await _grade_repository(
+                    repo_url, submission.token, request.assignment_name, rubric, template=template,
+                )
+            except HTTPException as e:
+                return {**line, "status": "error", "error": {"status_code": e.status_code, "detail": e.detail}}, None
+            except Exception as e:
+                logger.exception("Batch grading of %s failed", git_ops.redact(repo_url))
+                return {**line, "status": "error", "error": {"status_code": 500, "detail": str(e)}}, None
+
+        result = _new_result(assignment_id, student_id, repo_url, commit_sha, criteria_hash, scan)
+        return {**line, "status": "graded", "grading_result": _grading_result(scan), "commit_sha": commit_sha}, (result, scan["findings"])
+
+    tasks = [asyncio.create_task(grade_one(i, submission)) for i, submission in enumerate(request.submissions)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            line, result = await next_done
+            if "previous" in line:
+                # The session is only used from this generator, never from the grading tasks.
+                line["grading_result"] = await _stored_grading_result(db, line.pop("previous"))
+            if result is not None:
+                pending.append(result)
+                if len(pending) >= settings.BATCH_INSERT_CHUNK:
+                    await flush()
+            yield json.dumps(line) + "\n"
+        await flush()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await db.close()
+
+async def _grade_with_gemini(source_files: Iterable[dict], rubric: CompiledRubric) -> dict:
+    """Scan the files and return ``{"grade", "findings", "files"}``, findings in feedback order.
+
+    Files are read one at a time and scanned in-process or, with
+    ``SCAN_PROCESS_WORKERS``, in the scan pool; results are merged in file order.
+
+    Files given with ``hits`` instead of ``content`` are unchanged since the last
+    grade (or copies of starter code) and are not scanned again. With
+    ``template_lines``, only hits on lines that differ from the template count.
+    Criteria that exceed ``REGEX_TIME_BUDGET`` on a file keep their hits so far
+    and are recorded as a finding without a line, marking the scan ``partial``.
+
+    The ``scan`` stage includes the ``read`` stage, the time spent listing and
+    reading files.
+    """
+    with metrics.stage("scan"):
+        return await _scan_files(source_files, rubric)
+
+async def _scan_files(source_files: Iterable[dict], rubric: CompiledRubric) -> dict:
     grade = 100
-    feedback = ""
+    findings = []
+    cache_hits = 0
+    reused = 0
+    scanned = 0
+    scanned_bytes = 0
+    partial = False
 
-    for file in source_files:
+    async for file, hits, cached, timed_out in scan_pool.scan_files(rubric, metrics.timed(source_files, "read")):
+        scanned += 1
         file_path = file["path"]
-        content = file["content"]
-        lines = content.splitlines()
-
-        for criterion in grading_criteria:
-            pattern = criterion.get("pattern")
-            deduction = criterion.get("deduction")
-            message = criterion.get("message")
+        if "hits" in file:
+            reused += 1
+        else:
+            cache_hits += cached
+            scanned_bytes += len(file["content"])
+            if "template_lines" in file:
+                changed_lines = await asyncio.to_thread(baseline.new_lines, file["template_lines"], file["content"])
+                hits = [hit for hit in hits if hit[1] in changed_lines]
 
-            if not all([pattern, deduction, message]):
-                continue
+        for index, line_number in hits:
+            criterion = rubric.criteria[index]
+            grade -= criterion.deduction
+            findings.append({
+                "criterion_index": index,
+                "criterion": criterion.message,
+                "file": file_path,
+                "line": line_number,
+                "deduction": criterion.deduction,
+            })
+        for index in timed_out:
+            # Partial result: the criterion stopped early on this file
+            findings.append({
+                "criterion_index": index,
+                "criterion": rubric.criteria[index].message,
+                "file": file_path,
+                "line": None,
+                "deduction": 0,
+            })
+        partial = partial or bool(timed_out)
 
-            for i, line in enumerate(lines, 1):
-                if re.search(pattern, line):
-                    grade -= deduction
-                    feedback += f"- {deduction} points: {message} in {file_path} on line {i}\n"
+    logger.info(
+        "Scanned %d files (%d unchanged since the last grade): %d findings cache hits, overall hit rate %.1f%%",
+        scanned, reused, cache_hits, findings_cache.stats()["hit_rate"] * 100,
+    )
+    metrics.SCANNED_FILES.observe(scanned - reused)
+    metrics.SCANNED_BYTES.observe(scanned_bytes)
+    metrics.CRITERIA_EVALUATED.observe((scanned - reused - cache_hits) * len(rubric.criteria))
 
     return {
         "grade": grade,
-        "feedback": feedback.strip()
+        "findings": findings,
+        "files": scanned,
+        "partial": partial,
     }
 
-async def get_all_grades(db: Session):
-    results = db.query(models.GradingResult).options(joinedload(models.GradingResult.assignment)).all()
-    # We need to manually construct the response to include the assignment name
-    response = []
-    for result in results:
-        response.append(
-            GradingResultSchema(
-                assignment_name=result.assignment.name,
-                student_id=result.student_id,
-                grade=result.grade,
-                feedback=result.feedback,
-            )
+def _grades_statement(filters: GradeQuery, student_name: str | None = None):
+    statement = (
+        select(
+            models.GradingResult.id,
+            models.Assignment.name.label("assignment_name"),
+            models.GradingResult.student_id,
+            models.GradingResult.grade,
+            models.GradingResult.feedback,
+            models.GradingResult.created_at,
         )
-    return response
+        .join(models.Assignment, models.GradingResult.assignment_id == models.Assignment.id)
+        .order_by(models.GradingResult.id)
+    )
+    if student_name is not None:
+        statement = statement.where(models.GradingResult.student_id == student_name)
+    if filters.assignment is not None:
+        statement = statement.where(models.Assignment.name == filters.assignment)
+    if filters.since is not None:
+        statement = statement.where(models.GradingResult.created_at >= filters.since)
+    if filters.until is not None:
+        statement = statement.where(models.GradingResult.created_at < filters.until)
+    if filters.after_id is not None:
+        statement = statement.where(models.GradingResult.id > filters.after_id)
+    if filters.limit is not None:
+        statement = statement.limit(filters.limit)
+    return statement
 
-async def get_grades_by_student(student_name: str, db: Session):
-    results = db.query(models.GradingResult).filter(models.GradingResult.student_id == student_name).options(joinedload(models.GradingResult.assignment)).all()
-    response = []
-    for result in results:
-        response.append(
-            GradingResultSchema(
-                assignment_name=result.assignment.name,
-                student_id=result.student_id,
-                grade=result.grade,
-                feedback=result.feedback,
-            )
-        )
-    return response
+async def _grade_schemas(db: AsyncSession, rows, include_feedback: bool) -> list[GradingResultSchema]:
+    grades = [GradingResultSchema(**row._mapping) for row in rows]
+    if not include_feedback:
+        for grade in grades:
+            grade.feedback = None
+        return grades
+
+    rendered = await _feedback_by_result(db, [grade.id for grade in grades if grade.feedback is None])
+    for grade in grades:
+        if grade.feedback is None:
+            grade.feedback = rendered[grade.id]
+    return grades
+
+async def get_all_grades(db: AsyncSession, filters: GradeQuery = GradeQuery()):
+    rows = await db.execute(_grades_statement(filters))
+    return await _grade_schemas(db, rows, filters.include_feedback)
+
+async def get_grades_by_student(student_name: str, db: AsyncSession, filters: GradeQuery = GradeQuery()):
+    rows = await db.execute(_grades_statement(filters, student_name))
+    return await _grade_schemas(db, rows, filters.include_feedback)
+
+async def stream_grades(session_factory: Callable[[], AsyncSession], filters: GradeQuery, student_name: str | None = None) -> AsyncIterator[str]:
+    """Write the matching grades as a JSON array, reading rows through a server-side cursor."""
+    statement = _grades_statement(filters, student_name).execution_options(yield_per=settings.GRADES_STREAM_CHUNK)
+    async with session_factory() as db, session_factory() as findings_db:
+        rows = await db.stream(statement)
+        yield "["
+        first = True
+        async for partition in rows.partitions():
+            grades = await _grade_schemas(findings_db, partition, filters.include_feedback)
+            chunk = ",".join(grade.model_dump_json() for grade in grades)
+            yield chunk if first else "," + chunk
+            first = False
+        yield "]"
+
+async def get_criterion_costs(assignment_name: str, db: AsyncSession) -> list[CriterionCost]:
+    """Points lost per criterion across every graded submission of an assignment."""
+    assignment = await _get_assignment(db, assignment_name)
+    if not assignment:
+        raise HTTPException(status_code=404, detail=f"Assignment '{assignment_name}' not found.")
+    return await grade_stats.criterion_costs(db, assignment.id)
+
+async def get_assignment_stats(assignment_name: str, db: AsyncSession) -> AssignmentStats:
+    assignment = await _get_assignment(db, assignment_name)
+    if not assignment:
+        raise HTTPException(status_code=404, detail=f"Assignment '{assignment_name}' not found.")
+    return await grade_stats.assignment_stats(db, assignment)
@@ -0,0 +1,428 @@
+"""
+Lightweight Java symbol index for structural rubric criteria.
+
+One pass tokenizes a file (comments, string, char and text-block literals are
+skipped) and a second pass over the tokens records the declared types
+(classes, interfaces, enums, records) with their ``extends``/``implements``
+edges, and their methods, constructors and fields with modifiers and line
+numbers. This is not a full Java parser: method bodies are skipped, so local
+and anonymous classes are not indexed.
+
+Indexes are cached by content hash, so a file shared across a roster (or
+rescanned under a new rubric) is only indexed once per process.
+"""
+
+import hashlib
+import re
+from dataclasses import dataclass, field
+from typing import Iterator
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+
+TYPE_KINDS = {"class", "interface", "enum", "record"}
+MEMBER_KINDS = {"method", "constructor", "field"}
+MODIFIERS = {
+    "public", "protected", "private", "static", "final", "abstract", "synchronized",
+    "native", "transient", "volatile", "strictfp", "default", "sealed", "non-sealed",
+}
+
+_TOKEN = re.compile(
+    r'''
+    (?P<space>\s+)
+    | (?P<comment>//[^\n]*|/\*.*?(?:\*/|\Z))
+    | (?P<text>"""(?:\\.|[^\\])*?(?:"""|\Z))
+    | (?P<literal>"(?:\\.|[^"\\\n])*"?|'(?:\\.|[^'\\\n])*'?)
+    | (?P<word>non-sealed\b|[A-Za-z_$][\w$]*)
+    | (?P<number>\d[\w.]*)
+    | (?P<symbol>.)
+    ''',
+    re.VERBOSE | re.DOTALL,
+)
+
+# Line breaks as counted by str.splitlines, so lines agree with the regex scan
+_LINE_BREAK = re.compile(r"\r\n|[\n\r\v\f\x1c-\x1e\x85\u2028\u2029]")
+
+# content hash -> JavaIndex
+_indexes = LRUCache(settings.SYMBOL_INDEX_CACHE_SIZE)
+
+
+@dataclass(frozen=True)
+class Symbol:
+    kind: str
+    name: str
+    line: int
+    modifiers: frozenset[str]
+    # Enclosing type, None for top-level types
+    owner: str | None = None
+    # Field type or method return type
+    type: str | None = None
+    extends: tuple[str, ...] = ()
+    implements: tuple[str, ...] = ()
+
+
+@dataclass
+class JavaIndex:
+    symbols: list[Symbol] = field(default_factory=list)
+    by_kind: dict[str, list[Symbol]] = field(default_factory=dict)
+
+    def add(self, symbol: Symbol) -> None:
+        self.symbols.append(symbol)
+        self.by_kind.setdefault(symbol.kind, []).append(symbol)
+
+
+def tokenize(content: str) -> Iterator[tuple[str, int]]:
+    """Yield ``(token, line)`` for the words and symbols of ``content``; literals become ``"``."""
+    line = 1
+    for match in _TOKEN.finditer(content):
+        kind = match.lastgroup
+        if kind in ("word", "number", "symbol"):
+            yield match.group(), line
+            continue
+        if kind != "space" and kind != "comment":
+            yield '"', line
+        line += len(_LINE_BREAK.findall(match.group()))
+
+
+class _Parser:
+    def __init__(self, tokens: list[tuple[str, int]]):
+        self.tokens = tokens
+        self.pos = 0
+        self.index = JavaIndex()
+
+    def peek(self, offset: int = 0) -> str | None:
+        pos = self.pos + offset
+        return self.tokens[pos][0] if pos < len(self.tokens) else None
+
+    def skip_balanced(self, opening: str, closing: str) -> None:
+        """Skip from an opening bracket at ``pos`` past its matching closing bracket."""
+        depth = 0
+        while self.pos < len(self.tokens):
+            token = self.tokens[self.pos][0]
+            self.pos += 1
+            if token == opening:
+                depth += 1
+            elif token == closing:
+                depth -= 1
+                if depth == 0:
+                    return
+
+    def skip_annotation(self) -> None:
+        self.pos += 2  # "@" and the first part of the name
+        while self.peek() == "." and _is_word(self.peek(1) or ""):
+            self.pos += 2
+        if self.peek() == "(":
+            self.skip_balanced("(", ")")
+
+    def modifiers(self) -> set[str]:
+        found = set()
+        while True:
+            token = self.peek()
+            if token == "@" and self.peek(1) != "interface":
+                self.skip_annotation()
+            elif token in MODIFIERS:
+                found.add(token)
+                self.pos += 1
+            else:
+                return found
+
+    def type_names(self) -> list[str]:
+        """Comma-separated type names, generic arguments and qualifiers dropped."""
+        names = []
+        while self.peek() is not None and self.peek() not in ("{", ";", "implements", "extends", "permits"):
+            token = self.peek()
+            if token == "<":
+                self.skip_balanced("<", ">")
+                continue
+            if _is_word(token) and self.peek(1) != ".":
+                names.append(token)
+            self.pos += 1
+        return names
+
+    def parse(self) -> JavaIndex:
+        while self.pos < len(self.tokens):
+            # Loops past stray closing braces at the top level
+            self.body(owner=None, kind=None)
+        return self.index
+
+    def body(self, owner: str | None, kind: str | None) -> None:
+        """Parse declarations until the closing brace of the current body (or the end of the file)."""
+        if kind == "enum":
+            self.enum_constants()
+        while self.pos < len(self.tokens):
+            token = self.peek()
+            if token == "}":
+                self.pos += 1
+                return
+            if token in (";", ")"):
+                self.pos += 1
+                continue
+            if token == "{":
+                # Initializer block
+                self.skip_balanced("{", "}")
+                continue
+            self.declaration(owner)
+
+    def enum_constants(self) -> None:
+        while self.pos < len(self.tokens) and self.peek() not in (";", "}"):
+            if self.peek() == "(":
+                self.skip_balanced("(", ")")
+            elif self.peek() == "{":
+                self.skip_balanced("{", "}")
+            else:
+                self.pos += 1
+        if self.peek() == ";":
+            self.pos += 1
+
+    def declaration(self, owner: str | None) -> None:
+        start = self.pos
+        modifiers = self.modifiers()
+        line = self.tokens[self.pos][1] if self.pos < len(self.tokens) else 0
+        token = self.peek()
+
+        if token == "@" and self.peek(1) == "interface":
+            self.pos += 1
+            token = "interface"
+        if token in TYPE_KINDS and _is_word(self.peek(1) or ""):
+            self.type_declaration(token, owner, modifiers, line)
+            return
+        if owner is None:
+            # Package and import statements, or anything unexpected at top level
+            self.skip_statement()
+            return
+        self.member(owner, modifiers)
+        if self.pos == start:
+            self.pos += 1
+
+    def type_declaration(self, kind: str, owner: str | None, modifiers: set[str], line: int) -> None:
+        self.pos += 1
+        name = self.peek()
+        self.pos += 1
+        extends, implements = [], []
+        while self.pos < len(self.tokens) and self.peek() != "{":
+            token = self.peek()
+            if token == "<":
+                self.skip_balanced("<", ">")
+            elif token == "(":
+                # Record components
+                self.skip_balanced("(", ")")
+            elif token == "extends":
+                self.pos += 1
+                extends = self.type_names()
+            elif token == "implements":
+                self.pos += 1
+                implements = self.type_names()
+            elif token == "permits":
+                self.pos += 1
+                self.type_names()
+            else:
+                self.pos += 1
+        self.index.add(Symbol(
+            kind=kind,
+            name=name,
+            line=line,
+            modifiers=frozenset(modifiers),
+            owner=owner,
+            extends=tuple(extends),
+            implements=tuple(implements),
+        ))
+        self.pos += 1  # "{"
+        self.body(owner=name, kind=kind)
+
+    def member(self, owner: str, modifiers: set[str]) -> None:
+        """A method, constructor or field declaration directly inside a type body."""
+        type_tokens: list[str] = []
+        while self.pos < len(self.tokens):
+            token, line = self.tokens[self.pos]
+            if token == "<":
+                if type_tokens:
+                    type_tokens.append(_angle_text(self))
+                else:
+                    # Type parameters of a generic method
+                    self.skip_balanced("<", ">")
+                continue
+            if token == "(" and type_tokens and _is_word(type_tokens[-1]):
+                name = type_tokens.pop()
+                kind = "constructor" if not type_tokens and name == owner else "method"
+                self.index.add(Symbol(
+                    kind=kind, name=name, line=line, modifiers=frozenset(modifiers),
+                    owner=owner, type="".join(type_tokens) or None,
+                ))
+                self.skip_balanced("(", ")")
+                self.skip_method_rest()
+                return
+            if token in ("=", ";", ","):
+                # C-style arrays: "int values[];"
+                dims = ""
+                while len(type_tokens) > 2 and type_tokens[-2:] == ["[", "]"]:
+                    del type_tokens[-2:]
+                    dims += "[]"
+                if len(type_tokens) >= 2 and _is_word(type_tokens[-1]):
+                    self.fields(owner, modifiers, "".join(type_tokens[:-1]), type_tokens[-1], line, dims)
+                else:
+                    self.skip_statement()
+                return
+            if token in ("{", "}"):
+                return
+            type_tokens.append(token)
+            self.pos += 1
+
+    def fields(self, owner: str, modifiers: set[str], base_type: str, name: str, line: int, dims: str = "") -> None:
+        """Record ``name`` and any further declarators up to the terminating semicolon."""
+        while True:
+            self.index.add(Symbol(
+                kind="field", name=name, line=line, modifiers=frozenset(modifiers), owner=owner, type=base_type + dims,
+            ))
+            # Skip the initializer
+            while self.pos < len(self.tokens) and self.peek() not in (",", ";", "}"):
+                token = self.peek()
+                if token in ("(", "{", "["):
+                    self.skip_balanced(token, {"(": ")", "{": "}", "[": "]"}[token])
+                elif token == "new":
+                    # The instantiated type, so commas in "new HashMap<K, V>()" don't start a declarator
+                    self.pos += 1
+                    while self.peek() is not None and (self.peek() == "." or _is_word(self.peek())):
+                        self.pos += 1
+                    if self.peek() == "<":
+                        self.skip_balanced("<", ">")
+                else:
+                    self.pos += 1
+            if self.peek() != ",":
+                if self.peek() == ";":
+                    self.pos += 1
+                return
+            self.pos += 1
+            if self.pos >= len(self.tokens) or not _is_word(self.peek()):
+                return
+            name, line = self.tokens[self.pos]
+            self.pos += 1
+            dims = ""
+            while self.peek() == "[" and self.peek(1) == "]":
+                self.pos += 2
+                dims += "[]"
+
+    def skip_method_rest(self) -> None:
+        """Skip ``throws`` clauses and the body (or ``;`` / default value) after a parameter list."""
+        while self.pos < len(self.tokens):
+            token = self.peek()
+            if token == "{":
+                self.skip_balanced("{", "}")
+                return
+            if token == ";":
+                self.pos += 1
+                return
+            if token == "}":
+                return
+            self.pos += 1
+
+    def skip_statement(self) -> None:
+        while self.pos < len(self.tokens):
+            token = self.peek()
+            if token == ";":
+                self.pos += 1
+                return
+            if token in ("{", "}"):
+                return
+            if token == "(":
+                self.skip_balanced("(", ")")
+            else:
+                self.pos += 1
+
+
+def _is_word(token: str) -> bool:
+    return token[:1].isalpha() or token[:1] in ("_", "$")
+
+
+def _angle_text(parser: _Parser) -> str:
+    start = parser.pos
+    parser.skip_balanced("<", ">")
+    return "".join(token for token, _ in parser.tokens[start:parser.pos])
+
+
+def build_index(content: str) -> JavaIndex:
+    return _Parser(list(tokenize(content))).parse()
+
+
+def get_index(content: str) -> JavaIndex:
+    """Index of ``content``, built once per distinct file content."""
+    key = hashlib.sha256(content.encode("utf-8", errors="surrogatepass")).hexdigest()
+    index = _indexes.get(key)
+    if index is None:
+        index = build_index(content)
+        _indexes.put(key, index)
+    return index
+
+
+def stats() -> dict:
+    return _indexes.stats()
+
+
+def clear() -> None:
+    _indexes.clear()
+
+
+@dataclass(frozen=True)
+class StructureQuery:
+    """A ``structure`` criterion: matches declarations of one kind, filtered by name, owner, edges and modifiers.
+
+    Names are regular expressions that must match the whole name.
+    """
+
+    kind: str
+    name: re.Pattern | None = None
+    owner: re.Pattern | None = None
+    type: re.Pattern | None = None
+    extends: re.Pattern | None = None
+    implements: re.Pattern | None = None
+    modifiers: frozenset[str] = frozenset()
+    not_modifiers: frozenset[str] = frozenset()
+
+    @classmethod
+    def parse(cls, spec) -> "StructureQuery":
+        """Build a query from its rubric JSON; raises ``ValueError`` if it is malformed."""
+        if not isinstance(spec, dict):
+            raise ValueError("structure must be an object")
+        unknown = set(spec) - {"kind", "name", "class", "type", "extends", "implements", "modifiers", "not_modifiers"}
+        if unknown:
+            raise ValueError(f"unknown keys {sorted(unknown)}")
+        kind = spec.get("kind")
+        if kind not in TYPE_KINDS | MEMBER_KINDS:
+            raise ValueError(f"kind must be one of {sorted(TYPE_KINDS | MEMBER_KINDS)}")
+
+        patterns = {}
+        for key, attribute in (("name", "name"), ("class", "owner"), ("type", "type"),
+                               ("extends", "extends"), ("implements", "implements")):
+            value = spec.get(key)
+            if value is None:
+                continue
+            if not isinstance(value, str):
+                raise ValueError(f"{key} must be a string")
+            try:
+                patterns[attribute] = re.compile(value)
+            except re.error as e:
+                raise ValueError(f"{key}: {e}")
+
+        sets = {}
+        for key in ("modifiers", "not_modifiers"):
+            value = spec.get(key, [])
+            if not isinstance(value, list) or not set(value) <= MODIFIERS:
+                raise ValueError(f"{key} must be a list of Java modifiers")
+            sets[key] = frozenset(value)
+        return cls(kind=kind, **patterns, **sets)
+
+    def matches(self, symbol: Symbol) -> bool:
+        if self.name is not None and not self.name.fullmatch(symbol.name):
+            return False
+        if self.owner is not None and not (symbol.owner and self.owner.fullmatch(symbol.owner)):
+            return False
+        if self.type is not None and not (symbol.type and self.type.fullmatch(symbol.type)):
+            return False
+        if self.extends is not None and not any(self.extends.fullmatch(name) for name in symbol.extends):
+            return False
+        if self.implements is not None and not any(self.implements.fullmatch(name) for name in symbol.implements):
+            return False
+        return self.modifiers <= symbol.modifiers and not (self.not_modifiers & symbol.modifiers)
+
+    def lines(self, index: JavaIndex) -> list[int]:
+        """Sorted, distinct declaration lines of the matching symbols."""
+        return sorted({symbol.line for symbol in index.by_kind.get(self.kind, ()) if self.matches(symbol)})
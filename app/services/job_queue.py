@@ -0,0 +1,146 @@
+"""
+In-process grading job queue.
+
+``POST /grade?job=true`` enqueues the request and returns immediately; a fixed
+pool of asyncio workers runs ``grading_service.grade_assignment`` for queued
+jobs, which also bounds how many clones run at once. The queue has a maximum
+depth so that overload turns into an explicit 429 instead of unbounded memory.
+"""
+
+import asyncio
+import logging
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from enum import Enum
+from typing import Callable
+
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.schemas.grading import GradingRequest
+
+logger = logging.getLogger(__name__)
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, request: GradingRequest, session_factory: Callable[[], AsyncSession]):
+        self.id = uuid.uuid4().hex
+        self.request = request
+        self.session_factory = session_factory
+        self.status = JobStatus.QUEUED
+        self.created_at = datetime.now(timezone.utc)
+        self.started_at: datetime | None = None
+        self.finished_at: datetime | None = None
+        self.result: dict | None = None
+        self.error: dict | None = None
+        self.changed = asyncio.Event()
+
+    @property
+    def done(self) -> bool:
+        return self.status in (JobStatus.SUCCEEDED, JobStatus.FAILED)
+
+    def _set_status(self, status: JobStatus) -> None:
+        self.status = status
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "assignment_name": self.request.assignment_name,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class GradingJobQueue:
+    def __init__(self, workers: int, max_depth: int, history: int = 1000):
+        self.workers = workers
+        self.max_depth = max_depth
+        self.history = history
+        self._queue: asyncio.Queue | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue(maxsize=self.max_depth)
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def submit(self, request: GradingRequest, session_factory: Callable[[], AsyncSession]) -> Job:
+        if self._queue is None:
+            raise RuntimeError("Grading job queue has not been started")
+        job = Job(request, session_factory)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise QueueFullError(f"Grading queue is full ({self.max_depth} jobs waiting)")
+        self._jobs[job.id] = job
+        self._prune()
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        return self._jobs.get(job_id)
+
+    def _prune(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[:max(len(self._jobs) - self.history, 0)]:
+            del self._jobs[job_id]
+
+    async def _worker(self, number: int) -> None:
+        # Imported here to avoid a cycle: grading_service is the job payload.
+        from app.services import grading_service
+
+        while True:
+            job = await self._queue.get()
+            job.started_at = datetime.now(timezone.utc)
+            job._set_status(JobStatus.RUNNING)
+            db = job.session_factory()
+            try:
+                job.result = await grading_service.grade_assignment(job.request, db)
+                status = JobStatus.SUCCEEDED
+            except HTTPException as e:
+                job.error = {"status_code": e.status_code, "detail": e.detail}
+                status = JobStatus.FAILED
+            except Exception as e:
+                logger.exception("Grading job %s failed", job.id)
+                job.error = {"status_code": 500, "detail": str(e)}
+                status = JobStatus.FAILED
+            finally:
+                await db.close()
+                self._queue.task_done()
+            job.finished_at = datetime.now(timezone.utc)
+            job._set_status(status)
+
+
+grading_jobs = GradingJobQueue(
+    workers=settings.GRADING_WORKERS,
+    max_depth=settings.GRADING_QUEUE_MAX_DEPTH,
+    history=settings.GRADING_JOB_HISTORY,
+)
@@ -0,0 +1,191 @@
+"""
+Durable grading job queue in the ``grading_jobs`` table.
+
+With ``JOB_BACKEND=database``, ``POST /grade?job=true`` inserts a row and
+``python -m app.worker`` processes, on any node that can reach the database,
+claim jobs under a lease of ``JOB_LEASE_SECONDS``. Workers renew the lease
+with heartbeats while they grade. A job whose lease runs out (its worker
+crashed or lost the database) is claimed again by another worker, until it
+has been attempted ``JOB_MAX_ATTEMPTS`` times.
+
+Claims use ``SELECT ... FOR UPDATE SKIP LOCKED`` on PostgreSQL so workers do
+not wait on each other's row locks. Every state change is also a conditional
+``UPDATE`` that checks the expected status and lease owner, which keeps
+SQLite (where the locking clause is ignored) and lost leases safe.
+"""
+
+import json
+import logging
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db import models
+from app.schemas.grading import GradingRequest
+from app.services.job_queue import JobStatus, QueueFullError
+
+logger = logging.getLogger(__name__)
+
+# Claims lost to another worker before giving up until the next poll
+CLAIM_RETRIES = 5
+
+Job = models.GradingJob
+
+
+@dataclass(frozen=True)
+class ClaimedJob:
+    id: str
+    request: GradingRequest
+    attempts: int
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _lease_expired(now: datetime):
+    return and_(Job.status == JobStatus.RUNNING, Job.lease_expires_at < now)
+
+
+def _owned_by(job: ClaimedJob, worker_id: str):
+    return and_(Job.id == job.id, Job.status == JobStatus.RUNNING, Job.lease_owner == worker_id)
+
+
+def _redacted(request: GradingRequest) -> str:
+    """The stored request without its access token, once nothing needs to clone any more."""
+    return request.model_copy(update={"token": ""}).model_dump_json()
+
+
+async def enqueue(db: AsyncSession, request: GradingRequest) -> models.GradingJob:
+    waiting = await db.scalar(select(func.count()).select_from(Job).where(Job.status == JobStatus.QUEUED))
+    if waiting >= settings.GRADING_QUEUE_MAX_DEPTH:
+        raise QueueFullError(f"Grading queue is full ({waiting} jobs waiting)")
+
+    job = Job(
+        id=uuid.uuid4().hex,
+        assignment_name=request.assignment_name,
+        request=request.model_dump_json(),
+        status=JobStatus.QUEUED,
+        attempts=0,
+        created_at=_now(),
+    )
+    db.add(job)
+    await db.commit()
+    return job
+
+
+async def get(db: AsyncSession, job_id: str) -> models.GradingJob | None:
+    # populate_existing: pollers reuse their session and must see other processes' updates
+    return await db.get(Job, job_id, populate_existing=True)
+
+
+def to_dict(job: models.GradingJob) -> dict:
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "assignment_name": job.assignment_name,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "result": json.loads(job.result) if job.result else None,
+        "error": json.loads(job.error) if job.error else None,
+    }
+
+
+def done(job: models.GradingJob) -> bool:
+    return job.status in (JobStatus.SUCCEEDED, JobStatus.FAILED)
+
+
+async def fail_expired(db: AsyncSession) -> int:
+    """Fail jobs whose lease ran out on their last attempt. Returns how many."""
+    now = _now()
+    error = {"status_code": 500, "detail": f"Grading did not finish after {settings.JOB_MAX_ATTEMPTS} attempts."}
+    result = await db.execute(
+        update(Job)
+        .where(_lease_expired(now), Job.attempts >= settings.JOB_MAX_ATTEMPTS)
+        .values(status=JobStatus.FAILED, finished_at=now, lease_owner=None, error=json.dumps(error))
+    )
+    await db.commit()
+    return result.rowcount
+
+
+async def claim(db: AsyncSession, worker_id: str) -> ClaimedJob | None:
+    """Lease the oldest queued (or abandoned) job to ``worker_id``, or return None."""
+    for _ in range(CLAIM_RETRIES):
+        now = _now()
+        claimable = or_(
+            Job.status == JobStatus.QUEUED,
+            and_(_lease_expired(now), Job.attempts < settings.JOB_MAX_ATTEMPTS),
+        )
+        row = (await db.execute(
+            select(Job.id, Job.request, Job.attempts)
+            .where(claimable)
+            .order_by(Job.created_at)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )).first()
+        if row is None:
+            await db.commit()
+            return None
+
+        claimed = await db.execute(
+            update(Job)
+            .where(Job.id == row.id, claimable)
+            .values(
+                status=JobStatus.RUNNING,
+                attempts=Job.attempts + 1,
+                lease_owner=worker_id,
+                lease_expires_at=now + timedelta(seconds=settings.JOB_LEASE_SECONDS),
+                started_at=now,
+            )
+        )
+        await db.commit()
+        if claimed.rowcount == 1:
+            if row.attempts:
+                logger.info("Worker %s retrying job %s (attempt %d)", worker_id, row.id, row.attempts + 1)
+            return ClaimedJob(row.id, GradingRequest.model_validate_json(row.request), row.attempts + 1)
+        # Another worker claimed it between the select and the update (SQLite)
+    return None
+
+
+async def heartbeat(db: AsyncSession, job: ClaimedJob, worker_id: str) -> bool:
+    """Extend the lease; False when the job is no longer leased to this worker."""
+    result = await db.execute(
+        update(Job)
+        .where(_owned_by(job, worker_id))
+        .values(lease_expires_at=_now() + timedelta(seconds=settings.JOB_LEASE_SECONDS))
+    )
+    await db.commit()
+    return result.rowcount == 1
+
+
+async def complete(db: AsyncSession, job: ClaimedJob, worker_id: str, result: dict) -> bool:
+    outcome = await db.execute(
+        update(Job)
+        .where(_owned_by(job, worker_id))
+        .values(
+            status=JobStatus.SUCCEEDED,
+            finished_at=_now(),
+            lease_owner=None,
+            result=json.dumps(result),
+            error=None,
+            request=_redacted(job.request),
+        )
+    )
+    await db.commit()
+    return outcome.rowcount == 1
+
+
+async def fail(db: AsyncSession, job: ClaimedJob, worker_id: str, error: dict, retry: bool = False) -> bool:
+    """Record a failed attempt; with ``retry`` the job is queued again unless it is out of attempts."""
+    if retry and job.attempts < settings.JOB_MAX_ATTEMPTS:
+        values = {"status": JobStatus.QUEUED, "lease_owner": None, "lease_expires_at": None}
+    else:
+        values = {"status": JobStatus.FAILED, "finished_at": _now(), "lease_owner": None, "request": _redacted(job.request)}
+    outcome = await db.execute(update(Job).where(_owned_by(job, worker_id)).values(error=json.dumps(error), **values))
+    await db.commit()
+    return outcome.rowcount == 1
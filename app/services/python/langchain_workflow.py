@@ -1,153 +1,299 @@
 """
 LangChain Workflow
 
-Template for implementing LangChain-based workflows including:
-- LLM chains
-- Memory management
-- Tool integration
-- Prompt templates
+LLM-based rubric grading that stays affordable at roster scale:
+- Source files are packed into chunks that fit ``max_chunk_tokens`` together
+  with the rubric; files too large for one chunk are split between lines.
+- Responses are cached by prompt (template, rubric and model) plus the hash of
+  the chunk's source, so starter code shared across a roster and files that
+  did not change between regrades are only sent once.
+- Cache misses are sent ``batch_size`` prompts per model call, with at most
+  ``max_concurrency`` calls in flight.
+
+The model is pluggable: anything with ``generate(prompts)`` and
+``count_tokens(text)`` (see ``ModelBackend``). ``LangChainBackend`` wraps a
+LangChain chat model or LLM; ``FakeBackend`` answers deterministically and
+offline, for tests and local development.
 """
 
-from typing import Dict, Any, List, Optional
+import asyncio
+import hashlib
+import json
+from typing import Any, Callable, Dict, List, Protocol
+
+from app.core import metrics
+from app.core.cache import LRUCache
+from app.core.config import settings
 from .workflow_manager import BaseWorkflow
-import logging
 
-# LangChain imports (commented out until dependencies are added)
-# from langchain.llms import OpenAI
-# from langchain.chains import LLMChain
-# from langchain.prompts import PromptTemplate
-# from langchain.memory import ConversationBufferMemory
-# from langchain.tools import Tool
-# from langchain.agents import initialize_agent, AgentType
+PROMPT_TEMPLATE = """You are grading a Java assignment against a rubric.
+
+Rubric:
+{rubric}
+
+The source files follow, each line prefixed with its line number. Reply with only
+this JSON, listing every rubric violation in these lines:
+{{"findings": [{{"file": "<path>", "line": <line number or null>, "criterion": "<rubric message>", "deduction": <points>}}]}}
+
+{sources}"""
+
+# (prompt hash, chunk hash) -> findings parsed from the model's response
+_responses = LRUCache(settings.LLM_CACHE_SIZE)
+
+
+class ModelBackend(Protocol):
+    # Part of the cache key, so responses from different models are kept apart
+    name: str
+
+    async def generate(self, prompts: List[str]) -> List[str]:
+        """One completion per prompt, in order"""
+
+    def count_tokens(self, text: str) -> int:
+        ...
+
+
+def approximate_tokens(text: str) -> int:
+    """About four characters per token, close enough for budgeting source code"""
+    return (len(text) + 3) // 4
+
+
+class FakeBackend:
+    """Offline backend answering each prompt with ``respond(prompt)``; by default, no findings"""
+
+    name = "fake"
+
+    def __init__(self, respond: Callable[[str], str] | None = None):
+        self.respond = respond or (lambda prompt: '{"findings": []}')
+        # Prompts of every generate() call, for tests
+        self.batches: List[List[str]] = []
+
+    async def generate(self, prompts: List[str]) -> List[str]:
+        self.batches.append(list(prompts))
+        return [self.respond(prompt) for prompt in prompts]
+
+    def count_tokens(self, text: str) -> int:
+        return approximate_tokens(text)
+
+
+class LangChainBackend:
+    """A LangChain chat model or LLM; each batch is one ``abatch`` call"""
+
+    def __init__(self, llm):
+        self.llm = llm
+        self.name = getattr(llm, "model_name", None) or getattr(llm, "model", None) or type(llm).__name__
+
+    async def generate(self, prompts: List[str]) -> List[str]:
+        outputs = await self.llm.abatch(prompts)
+        # Chat models return messages, LLMs return strings
+        return [getattr(output, "content", output) for output in outputs]
+
+    def count_tokens(self, text: str) -> int:
+        try:
+            return self.llm.get_num_tokens(text)
+        except Exception:
+            # No tokenizer installed for this model
+            return approximate_tokens(text)
+
+
+def _hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8", errors="surrogatepass")).hexdigest()
+
+
+def chunk_sources(source_files: List[Dict[str, str]], budget: int, count_tokens: Callable[[str], int]) -> List[str]:
+    """Pack ``{"path", "content"}`` files into line-numbered chunks of at most ``budget`` tokens.
+
+    Files are kept whole when they fit; larger ones are split between lines,
+    each part repeating the file header. A single line over the budget still
+    gets a chunk of its own.
+    """
+    chunks: List[str] = []
+    sections: List[str] = []
+    used = 0
+
+    def flush():
+        nonlocal sections, used
+        if sections:
+            chunks.append("\n\n".join(sections))
+        sections, used = [], 0
+
+    for file in source_files:
+        header = f"// File: {file['path']}"
+        lines = [f"{n}: {line}" for n, line in enumerate(file["content"].splitlines(), 1)]
+        section = "\n".join([header, *lines])
+        tokens = count_tokens(section)
+        if tokens <= budget:
+            if used + tokens > budget:
+                flush()
+            sections.append(section)
+            used += tokens
+            continue
+
+        flush()
+        part, part_tokens = [header], count_tokens(header)
+        for line in lines:
+            line_tokens = count_tokens(line) + 1
+            if part_tokens + line_tokens > budget and len(part) > 1:
+                chunks.append("\n".join(part))
+                part, part_tokens = [header], count_tokens(header)
+            part.append(line)
+            part_tokens += line_tokens
+        sections, used = ["\n".join(part)], part_tokens
+    flush()
+    return chunks
+
+
+def parse_findings(response: str) -> tuple:
+    """Findings from a model response; raises ``ValueError`` if it is not the requested JSON"""
+    text = response.strip()
+    if text.startswith("```"):
+        # Models like to wrap JSON in a code fence
+        text = text.strip("`").removeprefix("json")
+    data = json.loads(text)
+    items = data.get("findings") if isinstance(data, dict) else None
+    if not isinstance(items, list):
+        raise ValueError("Model response has no findings list")
+
+    findings = []
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        line = item.get("line")
+        try:
+            deduction = float(item.get("deduction") or 0)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid deduction in model response: {item.get('deduction')!r}")
+        findings.append({
+            "file": str(item.get("file", "")),
+            "line": line if isinstance(line, int) else None,
+            "criterion": str(item.get("criterion", "")),
+            "deduction": deduction,
+        })
+    return tuple(findings)
 
 
 class LangChainWorkflow(BaseWorkflow):
-    """LangChain-based workflow implementation"""
-    
+    """Grades source files against a rubric with an LLM
+
+    Config keys: ``backend`` (a ``ModelBackend`` or ``"fake"``) or ``llm`` (a
+    LangChain model), and optionally ``max_concurrency``, ``batch_size`` and
+    ``max_chunk_tokens`` (defaults from the ``LLM_*`` settings).
+    """
+
     def __init__(self, config: Dict[str, Any]):
         super().__init__(config)
-        self.llm = None
-        self.memory = None
-        self.tools = []
-        self.chains = {}
-        self._initialize_components()
-    
-    def _initialize_components(self):
-        """Initialize LangChain components based on config"""
-        try:
-            # Initialize LLM
-            # self.llm = OpenAI(
-            #     temperature=self.config.get("temperature", 0.7),
-            #     api_key=self.config.get("openai_api_key")
-            # )
-            
-            # Initialize memory
-            # self.memory = ConversationBufferMemory(
-            #     memory_key="chat_history",
-            #     return_messages=True
-            # )
-            
-            # Initialize tools
-            self._setup_tools()
-            
-            # Initialize chains
-            self._setup_chains()
-            
-            self.logger.info("LangChain components initialized successfully")
-            
-        except Exception as e:
-            self.logger.error(f"Failed to initialize LangChain components: {e}")
-            raise
-    
-    def _setup_tools(self):
-        """Setup LangChain tools"""
-        # Example tool setup
-        # search_tool = Tool(
-        #     name="Search",
-        #     func=self._search_function,
-        #     description="Useful for searching information"
-        # )
-        # self.tools.append(search_tool)
-        pass
-    
-    def _setup_chains(self):
-        """Setup LangChain chains"""
-        # Example chain setup
-        # prompt_template = PromptTemplate(
-        #     input_variables=["question"],
-        #     template="Answer the following question: {question}"
-        # )
-        # 
-        # self.chains["qa"] = LLMChain(
-        #     llm=self.llm,
-        #     prompt=prompt_template,
-        #     memory=self.memory
-        # )
-        pass
-    
-    def _search_function(self, query: str) -> str:
-        """Example search function for tools"""
-        # Implement actual search logic
-        return f"Search results for: {query}"
-    
+        self.backend = self._initialize_backend()
+        self.batch_size = max(1, config.get("batch_size", settings.LLM_BATCH_SIZE))
+        self.max_chunk_tokens = config.get("max_chunk_tokens", settings.LLM_CHUNK_TOKENS)
+        self._semaphore = asyncio.Semaphore(max(1, config.get("max_concurrency", settings.LLM_MAX_CONCURRENCY)))
+
+    def _initialize_backend(self) -> ModelBackend:
+        backend = self.config.get("backend")
+        if backend == "fake":
+            return FakeBackend()
+        if backend is not None:
+            return backend
+        if self.config.get("llm") is not None:
+            return LangChainBackend(self.config["llm"])
+        raise ValueError("LangChainWorkflow needs a backend or a LangChain llm in its config")
+
     def validate_input(self, input_data: Dict[str, Any]) -> bool:
         """Validate input data for LangChain workflow"""
-        required_fields = ["question", "context"]
-        
+        required_fields = ["rubric", "source_files"]
+
         for field in required_fields:
             if field not in input_data:
                 self.logger.error(f"Missing required field: {field}")
                 return False
-        
-        if not isinstance(input_data["question"], str):
-            self.logger.error("Question must be a string")
+
+        if not isinstance(input_data["rubric"], (str, list)):
+            self.logger.error("Rubric must be text or a list of criteria")
+            return False
+
+        files = input_data["source_files"]
+        if not isinstance(files, list) or not all(
+            isinstance(f, dict) and isinstance(f.get("path"), str) and isinstance(f.get("content"), str) for f in files
+        ):
+            self.logger.error("Source files must be a list of {path, content} objects")
             return False
-        
+
         return True
-    
+
     async def execute(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Execute LangChain workflow"""
+        """Grade ``source_files`` against ``rubric``
+
+        Returns ``grade``, ``findings`` (in file order) and ``stats`` with the
+        cache hit rate and the prompt tokens sent for this grade.
+        """
         try:
-            question = input_data["question"]
-            context = input_data.get("context", "")
-            
-            # Example execution
-            # result = await self.chains["qa"].arun(
-            #     question=question,
-            #     context=context
-            # )
-            
-            # For now, return a placeholder response
-            result = f"LangChain processed: {question}"
-            
-            return {
-                "result": result,
-                "workflow_type": "langchain",
-                "status": "success"
-            }
-            
+            with metrics.stage("llm"):
+                return await self._grade(input_data["rubric"], input_data["source_files"])
         except Exception as e:
             self.logger.error(f"Error executing LangChain workflow: {e}")
             return {
                 "error": str(e),
-                "workflow_type": "langchain", 
+                "workflow_type": "langchain",
                 "status": "error"
             }
-    
-    def add_tool(self, tool_name: str, tool_func, description: str):
-        """Add a custom tool to the workflow"""
-        # tool = Tool(
-        #     name=tool_name,
-        #     func=tool_func,
-        #     description=description
-        # )
-        # self.tools.append(tool)
-        self.logger.info(f"Added tool: {tool_name}")
-    
-    def get_memory_contents(self) -> Dict[str, Any]:
-        """Get current memory contents"""
-        if self.memory:
-            return {
-                "chat_history": self.memory.chat_memory.messages
-            }
-        return {"chat_history": []} 
\ No newline at end of file
+
+    async def _grade(self, rubric, source_files: List[Dict[str, str]]) -> Dict[str, Any]:
+        rubric_text = rubric if isinstance(rubric, str) else json.dumps(rubric, sort_keys=True)
+        budget = self.max_chunk_tokens - self.backend.count_tokens(PROMPT_TEMPLATE.format(rubric=rubric_text, sources=""))
+        if budget <= 0:
+            raise ValueError(f"The rubric alone exceeds max_chunk_tokens ({self.max_chunk_tokens})")
+
+        chunks = chunk_sources(source_files, budget, self.backend.count_tokens)
+        prompt_hash = _hash("\0".join([self.backend.name, PROMPT_TEMPLATE, rubric_text]))
+        results: List[tuple | None] = [None] * len(chunks)
+        misses = []
+        for i, chunk in enumerate(chunks):
+            key = (prompt_hash, _hash(chunk))
+            results[i] = _responses.get(key)
+            if results[i] is None:
+                misses.append((i, key, PROMPT_TEMPLATE.format(rubric=rubric_text, sources=chunk)))
+
+        batches = [misses[i:i + self.batch_size] for i in range(0, len(misses), self.batch_size)]
+        tasks = [asyncio.ensure_future(self._send(batch, results)) for batch in batches]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        findings = [dict(finding) for chunk_findings in results for finding in chunk_findings]
+        cache_hits = len(chunks) - len(misses)
+        tokens_sent = sum(self.backend.count_tokens(prompt) for _, _, prompt in misses)
+        metrics.LLM_TOKENS_SENT.observe(tokens_sent)
+        self.logger.info(
+            "LLM graded %d chunks: %d cached, %d tokens sent in %d model calls",
+            len(chunks), cache_hits, tokens_sent, len(batches),
+        )
+        return {
+            "grade": 100 - sum(finding["deduction"] for finding in findings),
+            "findings": findings,
+            "stats": {
+                "chunks": len(chunks),
+                "cache_hits": cache_hits,
+                "cache_hit_rate": cache_hits / len(chunks) if chunks else 0.0,
+                "requests": len(batches),
+                "tokens_sent": tokens_sent,
+            },
+            "workflow_type": "langchain",
+            "status": "success"
+        }
+
+    async def _send(self, batch: list, results: list) -> None:
+        async with self._semaphore:
+            responses = await self.backend.generate([prompt for _, _, prompt in batch])
+        if len(responses) != len(batch):
+            raise ValueError(f"Model returned {len(responses)} responses for {len(batch)} prompts")
+        for (i, key, _), response in zip(batch, responses):
+            results[i] = parse_findings(response)
+            _responses.put(key, results[i])
+
+
+def stats() -> dict:
+    return _responses.stats()
+
+
+def clear() -> None:
+    _responses.clear()
@@ -0,0 +1,31 @@
+"""
+Workflow Manager
+
+Base class shared by the grading workflows in this package.
+"""
+
+import logging
+from abc import ABC, abstractmethod
+from typing import Any, Dict
+
+
+class BaseWorkflow(ABC):
+    """A configurable, asynchronous unit of grading work"""
+
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+        self.logger = logging.getLogger(f"{__name__}.{type(self).__name__}")
+
+    @abstractmethod
+    def validate_input(self, input_data: Dict[str, Any]) -> bool:
+        """Return whether ``input_data`` can be passed to ``execute``"""
+
+    @abstractmethod
+    async def execute(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Run the workflow; errors are reported in the result's ``status``"""
+
+    async def run(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Validate, then execute"""
+        if not self.validate_input(input_data):
+            return {"error": "Invalid input", "status": "error"}
+        return await self.execute(input_data)
@@ -0,0 +1,191 @@
+"""
+On-disk mirror cache of student repositories.
+
+Each repository URL gets a blob-filtered bare mirror under ``REPO_CACHE_DIR``.
+The first grade clones it; later grades only ``git fetch`` the new commits and
+check out a throwaway worktree limited to the assignment folder. Mirrors are
+guarded by ``flock`` so concurrent grades (in this process or another worker
+sharing the volume) never fetch into the same mirror at once, and the cache is
+kept under ``REPO_CACHE_MAX_BYTES`` by evicting the least recently used mirrors.
+"""
+
+import asyncio
+import fcntl
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator
+
+from app.core.config import settings
+from app.services import git_ops
+
+logger = logging.getLogger(__name__)
+
+HEAD_REF = "refs/grader/HEAD"
+
+
+@dataclass
+class Checkout:
+    path: str
+    commit_sha: str
+    fetched: bool
+    seconds: float
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except FileNotFoundError:
+                pass
+    return total
+
+
+class _FileLock:
+    def __init__(self, path: str):
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+
+    async def acquire(self, mode: int) -> None:
+        await asyncio.to_thread(fcntl.flock, self._fd, mode)
+
+    def try_acquire(self, mode: int) -> bool:
+        try:
+            fcntl.flock(self._fd, mode | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        return True
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+class RepoMirrorCache:
+    def __init__(self, root: str, max_bytes: int, timeout: float | None = None):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        os.makedirs(root, exist_ok=True)
+
+    def _key(self, url: str) -> str:
+        return hashlib.sha256(git_ops.redact(url).encode("utf-8")).hexdigest()[:32]
+
+    def _mirror_path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.git")
+
+    def _lock_path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.lock")
+
+    @asynccontextmanager
+    async def checkout(self, url: str, subdir: str, token: str | None = None) -> AsyncIterator[Checkout]:
+        """Yield a sparse worktree of ``url`` at its remote HEAD containing only ``subdir``."""
+        key = self._key(url)
+        mirror = self._mirror_path(key)
+        auth = git_ops.auth_env(token)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        deadline = None if self.timeout is None else start + self.timeout
+
+        def remaining() -> float | None:
+            return None if deadline is None else max(deadline - loop.time(), 0)
+
+        scratch = tempfile.mkdtemp(prefix="grade-")
+        worktree = os.path.join(scratch, "repo")
+        lock = _FileLock(self._lock_path(key))
+        try:
+            await lock.acquire(fcntl.LOCK_EX)
+            fetched = os.path.isdir(mirror)
+            if fetched:
+                await git_ops.run_git(
+                    "--git-dir", mirror, "fetch", "--quiet", "--prune", "--filter=blob:none", "origin",
+                    "+refs/heads/*:refs/heads/*", f"+HEAD:{HEAD_REF}",
+                    timeout=remaining(), env=auth,
+                )
+                await git_ops.run_git("--git-dir", mirror, "worktree", "prune", timeout=remaining())
+            else:
+                partial = mirror + ".partial"
+                shutil.rmtree(partial, ignore_errors=True)
+                await git_ops.run_git(
+                    "clone", "--quiet", "--bare", "--filter=blob:none", url, partial,
+                    timeout=remaining(), env=auth,
+                )
+                await git_ops.run_git(
+                    "--git-dir", partial, "update-ref", HEAD_REF, "HEAD",
+                    timeout=remaining(),
+                )
+                os.rename(partial, mirror)
+            os.utime(self._lock_path(key))
+
+            await git_ops.run_git(
+                "--git-dir", mirror, "worktree", "add", "--quiet", "--detach", "--no-checkout", worktree, HEAD_REF,
+                timeout=remaining(),
+            )
+            await git_ops.run_git("sparse-checkout", "set", "--", subdir, cwd=worktree, timeout=remaining())
+            await git_ops.run_git("checkout", "--quiet", cwd=worktree, timeout=remaining(), env=auth)
+            commit_sha = (await git_ops.run_git("rev-parse", "HEAD", cwd=worktree)).strip()
+
+            # Other grades may check out their own worktrees while this one is read.
+            await lock.acquire(fcntl.LOCK_SH)
+            result = Checkout(path=worktree, commit_sha=commit_sha, fetched=fetched, seconds=loop.time() - start)
+            logger.info(
+                "%s %s (%s) in %.3fs",
+                "Fetched" if fetched else "Mirrored", git_ops.redact(url), subdir, result.seconds,
+            )
+            yield result
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+            lock.close()
+        await asyncio.to_thread(self.evict)
+
+    def evict(self) -> list[str]:
+        """Remove least recently used mirrors until the cache fits its byte budget."""
+        entries = []
+        for name in os.listdir(self.root):
+            if not name.endswith(".git"):
+                continue
+            key = name[:-len(".git")]
+            lock_path = self._lock_path(key)
+            last_used = os.path.getmtime(lock_path) if os.path.exists(lock_path) else 0
+            entries.append((last_used, key, _dir_size(self._mirror_path(key))))
+
+        total = sum(size for _, _, size in entries)
+        evicted = []
+        for _, key, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            lock = _FileLock(self._lock_path(key))
+            try:
+                if not lock.try_acquire(fcntl.LOCK_EX):
+                    continue
+                shutil.rmtree(self._mirror_path(key), ignore_errors=True)
+            finally:
+                lock.close()
+            total -= size
+            evicted.append(key)
+        if evicted:
+            logger.info("Evicted %d repository mirrors, cache now %d bytes", len(evicted), total)
+        return evicted
+
+    def size(self) -> int:
+        return sum(
+            _dir_size(os.path.join(self.root, name))
+            for name in os.listdir(self.root)
+            if name.endswith(".git")
+        )
+
+
+_cache: RepoMirrorCache | None = None
+
+
+def get_cache() -> RepoMirrorCache | None:
+    global _cache
+    if settings.REPO_CACHE_DIR is None:
+        return None
+    if _cache is None:
+        _cache = RepoMirrorCache(settings.REPO_CACHE_DIR, settings.REPO_CACHE_MAX_BYTES, settings.GIT_CLONE_TIMEOUT)
+    return _cache
@@ -0,0 +1,79 @@
+import hashlib
+import json
+import logging
+import re
+
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.db import models
+from app.services.scanner import CompiledRubric
+
+logger = logging.getLogger(__name__)
+
+# (assignment name, criteria hash) -> CompiledRubric
+_rubrics = LRUCache(settings.RUBRIC_CACHE_SIZE)
+
+
+def criteria_hash(criteria_text: str) -> str:
+    return hashlib.sha256(criteria_text.encode("utf-8")).hexdigest()
+
+
+def get_rubric(assignment_name: str, criteria_text: str) -> CompiledRubric:
+    digest = criteria_hash(criteria_text)
+    key = (assignment_name, digest)
+    rubric = _rubrics.get(key)
+    if rubric is not None:
+        return rubric
+
+    try:
+        grading_criteria = json.loads(criteria_text)
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Invalid criteria format. Criteria must be a valid JSON.")
+
+    rubric = CompiledRubric(grading_criteria, digest=digest, engine=settings.REGEX_ENGINE)
+    _rubrics.put(key, rubric)
+    return rubric
+
+
+def invalidate(assignment_name: str) -> None:
+    _rubrics.discard_where(lambda key: key[0] == assignment_name)
+
+
+def replace(assignment_name: str, criteria_text: str) -> None:
+    """Drop cached rubrics for an assignment and compile the new criteria if they are JSON."""
+    invalidate(assignment_name)
+    try:
+        get_rubric(assignment_name, criteria_text)
+    except (HTTPException, re.error, AttributeError, TypeError, ValueError):
+        # Not a gradable JSON rubric (e.g. a .txt or .docx upload); grading will report it.
+        pass
+
+
+async def warm_up(db: AsyncSession) -> int:
+    rows = (await db.execute(
+        select(models.Assignment.name, models.Criteria.text)
+        .join(models.Criteria, models.Criteria.assignment_id == models.Assignment.id)
+    )).all()
+    warmed = 0
+    for assignment_name, criteria_text in rows:
+        if criteria_text is None:
+            continue
+        try:
+            get_rubric(assignment_name, criteria_text)
+            warmed += 1
+        except (HTTPException, re.error, AttributeError, TypeError, ValueError):
+            logger.warning("Skipping rubric warm-up for '%s': criteria are not a valid JSON rubric", assignment_name)
+    logger.info("Warmed rubric cache with %d of %d assignments", warmed, len(rows))
+    return warmed
+
+
+def stats() -> dict:
+    return _rubrics.stats()
+
+
+def clear() -> None:
+    _rubrics.clear()
@@ -0,0 +1,138 @@
+"""
+Process pool for the CPU-bound scanning stage.
+
+With ``SCAN_PROCESS_WORKERS`` > 0, files that miss the findings cache are
+scanned in worker processes so a large submission neither blocks the event
+loop nor is limited to one core. Tasks only carry the rubric digest and the
+file text; each worker compiles a rubric the first time it sees its digest
+and keeps it, and the parent resends the rubric only when a worker reports it
+missing. Results are yielded in submission order, so grades and feedback are
+identical to scanning in-process. A ``ScanTimeout`` raised in a worker is
+pickled back to the parent like any other result.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import AsyncIterator, Iterable
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.services import findings_cache
+from app.services.scanner import CompiledRubric, ScanTimeout
+
+logger = logging.getLogger(__name__)
+
+_executor: ProcessPoolExecutor | None = None
+
+# Worker side: rubric digest -> CompiledRubric
+_worker_rubrics = LRUCache(settings.RUBRIC_CACHE_SIZE)
+
+
+class RubricMissing(Exception):
+    pass
+
+
+def _scan(digest: str, content: str, rubric: CompiledRubric | None = None) -> tuple[tuple[int, int], ...]:
+    """Runs in a worker process."""
+    if rubric is None:
+        rubric = _worker_rubrics.get(digest)
+        if rubric is None:
+            raise RubricMissing(digest)
+    else:
+        _worker_rubrics.put(digest, rubric)
+    return tuple(rubric.scan(content, settings.REGEX_TIME_BUDGET))
+
+
+def _get_executor() -> ProcessPoolExecutor | None:
+    global _executor
+    if settings.SCAN_PROCESS_WORKERS <= 0:
+        return None
+    if _executor is None:
+        # spawn: forking a process that runs an event loop and DB threads is unsafe
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.SCAN_PROCESS_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+def shutdown() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def _scan_in_pool(executor: ProcessPoolExecutor, rubric: CompiledRubric, content: str):
+    global _executor
+    loop = asyncio.get_running_loop()
+    try:
+        try:
+            return await loop.run_in_executor(executor, _scan, rubric.digest, content)
+        except RubricMissing:
+            return await loop.run_in_executor(executor, _scan, rubric.digest, content, rubric)
+    except BrokenProcessPool:
+        logger.exception("Scan worker died, scanning in-process")
+        if _executor is executor:
+            _executor = None
+        return tuple(rubric.scan(content, settings.REGEX_TIME_BUDGET))
+
+
+async def _result(rubric: CompiledRubric, file: dict, task) -> tuple[dict, tuple, bool, list[int]]:
+    if isinstance(task, tuple):
+        return file, *task, []
+    try:
+        hits = await task
+    except ScanTimeout as e:
+        return file, tuple(e.hits), False, e.timed_out
+    findings_cache.put(findings_cache.key(rubric, file["content"]), hits)
+    return file, hits, False, []
+
+
+def _scan_inline(rubric: CompiledRubric, file: dict) -> tuple[dict, tuple, bool, list[int]]:
+    if "hits" in file:
+        return file, file["hits"], False, []
+    try:
+        return file, *findings_cache.scan(rubric, file["content"]), []
+    except ScanTimeout as e:
+        return file, tuple(e.hits), False, e.timed_out
+
+
+async def scan_files(rubric: CompiledRubric, files: Iterable[dict]) -> AsyncIterator[tuple[dict, tuple, bool, list[int]]]:
+    """Yield ``(file, hits, cached, timed_out)`` for each file in order.
+
+    ``timed_out`` lists the criteria that ran out of their time budget on the
+    file. Files that already carry ``hits`` pass through. At most two files per
+    worker are in flight, so memory stays bounded for large submissions.
+    """
+    executor = _get_executor()
+    if executor is None or rubric.digest is None:
+        for file in files:
+            yield _scan_inline(rubric, file)
+        return
+
+    window = settings.SCAN_PROCESS_WORKERS * 2
+    pending = deque()
+    try:
+        for file in files:
+            if "hits" in file:
+                task = (file["hits"], False)
+            else:
+                hits = findings_cache.get(findings_cache.key(rubric, file["content"]))
+                if hits is not None:
+                    task = (hits, True)
+                else:
+                    task = asyncio.ensure_future(_scan_in_pool(executor, rubric, file["content"]))
+            pending.append((file, task))
+            while len(pending) > window or (pending and isinstance(pending[0][1], tuple)):
+                yield await _result(rubric, *pending.popleft())
+        while pending:
+            yield await _result(rubric, *pending.popleft())
+    finally:
+        for _, task in pending:
+            if not isinstance(task, tuple):
+                task.cancel()
@@ -0,0 +1,440 @@
+"""
+Rubric scanning engine.
+
+All criteria of a rubric are compiled once into a single alternation that is
+run over the full text of a file. Each match only nominates a candidate line
+(found through a line-offset index); the individual patterns are then checked
+against that line, so the findings are exactly the ones the old
+"criterion x line" loop with ``re.search`` produced.
+
+Rubric patterns are TA-written and run on student-controlled text, so a scan
+can be given a CPU budget per criterion, measured on the scanning thread.
+``re`` checks for signals while it backtracks, which lets a ``SIGPROF`` timer
+interrupt a runaway match on the main thread; a criterion that runs out of
+budget keeps the hits found so far and is reported in ``ScanTimeout``. With ``engine="re2"`` and google-re2 installed, patterns
+that RE2 supports are matched in linear time instead.
+
+Criteria with a ``structure`` query instead of a ``pattern`` match Java
+declarations (see ``java_index``); they are answered from a symbol index that
+is built once per file content rather than by rescanning the text.
+"""
+
+import logging
+import re
+import signal
+import threading
+import time
+from bisect import bisect_right
+from contextlib import contextmanager
+from dataclasses import dataclass
+from itertools import accumulate
+from re import _parser
+
+from app.services.java_index import StructureQuery, get_index
+
+try:
+    import re2
+except ImportError:  # optional, pip install google-re2
+    re2 = None
+
+logger = logging.getLogger(__name__)
+
+# Constructs that can make a pattern behave differently on the joined file
+# text than on a single line (string anchors, lookarounds, backreferences and
+# constructs that refuse to backtrack). Patterns using them are scanned line
+# by line instead of being folded into the combined matcher.
+_UNSAFE_OPCODES = {
+    _parser.ASSERT,
+    _parser.ASSERT_NOT,
+    _parser.GROUPREF,
+    _parser.GROUPREF_EXISTS,
+    _parser.ATOMIC_GROUP,
+    _parser.POSSESSIVE_REPEAT,
+}
+_UNSAFE_ANCHORS = {_parser.AT_BEGINNING_STRING, _parser.AT_END_STRING}
+_REPEATS = {_parser.MAX_REPEAT, _parser.MIN_REPEAT}
+
+
+@dataclass(frozen=True)
+class Criterion:
+    pattern: re.Pattern
+    deduction: float
+    message: str
+    # Same pattern compiled for a linear-time engine, when one is available
+    linear: object | None = None
+
+    @property
+    def search(self):
+        return (self.linear or self.pattern).search
+
+
+@dataclass(frozen=True)
+class StructuralCriterion:
+    query: StructureQuery
+    deduction: float
+    message: str
+
+
+class ScanTimeout(Exception):
+    """Some criteria ran out of their time budget; ``hits`` holds everything found anyway."""
+
+    def __init__(self, hits: list[tuple[int, int]], timed_out: list[int]):
+        super().__init__(hits, timed_out)
+        self.hits = hits
+        self.timed_out = timed_out
+
+
+class _BudgetExceeded(Exception):
+    pass
+
+
+def _walk(parsed):
+    for op, av in parsed:
+        yield op, av
+        if isinstance(av, _parser.SubPattern):
+            yield from _walk(av)
+        elif isinstance(av, (list, tuple)):
+            for item in av:
+                if isinstance(item, _parser.SubPattern):
+                    yield from _walk(item)
+                elif isinstance(item, list):
+                    for sub in item:
+                        if isinstance(sub, _parser.SubPattern):
+                            yield from _walk(sub)
+
+
+# Characters used to test whether two single-character matchers overlap
+_SAMPLE = frozenset(map(chr, range(0x180)))
+_CATEGORIES = {
+    category: frozenset(filter(re.compile(regex).fullmatch, _SAMPLE))
+    for category, regex in [
+        (_parser.CATEGORY_DIGIT, r"\d"), (_parser.CATEGORY_NOT_DIGIT, r"\D"),
+        (_parser.CATEGORY_SPACE, r"\s"), (_parser.CATEGORY_NOT_SPACE, r"\S"),
+        (_parser.CATEGORY_WORD, r"\w"), (_parser.CATEGORY_NOT_WORD, r"\W"),
+    ]
+}
+_ZERO_WIDTH = {_parser.AT, _parser.ASSERT, _parser.ASSERT_NOT}
+
+
+def _set_member(op, av) -> frozenset:
+    if op == _parser.LITERAL:
+        return frozenset(chr(av))
+    if op == _parser.RANGE:
+        return frozenset(map(chr, range(av[0], min(av[1], 0x17F) + 1))) | {chr(av[0])}
+    return _CATEGORIES.get(av, _SAMPLE)
+
+
+def _chars(op, av) -> frozenset | None:
+    """Sample characters a single-character matcher accepts, or None for other nodes."""
+    if op == _parser.LITERAL:
+        return frozenset(chr(av))
+    if op == _parser.NOT_LITERAL:
+        return _SAMPLE - {chr(av)}
+    if op == _parser.ANY:
+        return _SAMPLE - {"\n"}
+    if op == _parser.IN:
+        members = frozenset().union(*(_set_member(*item) for item in av if item[0] != _parser.NEGATE))
+        return _SAMPLE - members if av and av[0][0] == _parser.NEGATE else members
+    return None
+
+
+def _first(parsed) -> tuple[frozenset, bool]:
+    """Characters a sequence can start with, and whether it can match the empty string."""
+    first = frozenset()
+    for op, av in parsed:
+        chars = _chars(op, av)
+        if chars is not None:
+            return first | chars, False
+        if op in _ZERO_WIDTH:
+            continue
+        if op == _parser.SUBPATTERN:
+            chars, nullable = _first(av[3])
+        elif op == _parser.ATOMIC_GROUP:
+            chars, nullable = _first(av)
+        elif op == _parser.BRANCH:
+            alternatives = [_first(branch) for branch in av[1]]
+            chars = frozenset().union(*(chars for chars, _ in alternatives))
+            nullable = any(nullable for _, nullable in alternatives)
+        elif op in _REPEATS or op == _parser.POSSESSIVE_REPEAT:
+            chars, nullable = _first(av[2])
+            nullable = nullable or av[0] == 0
+        else:
+            # Backreferences, conditionals: anything
+            return first | _SAMPLE, False
+        first |= chars
+        if not nullable:
+            return first, False
+    return first, True
+
+
+def _ambiguous(body) -> bool:
+    """Whether two alternatives inside a repeat body can match the same text.
+
+    The parser factors common prefixes out of alternations (``a|aa`` becomes
+    ``a(?:|a)``) and turns alternations of single characters into a class
+    (``\\w|\\d`` becomes ``[\\w\\d]``), so both shapes are checked: branches
+    that can start with the same character, where an empty branch starts with
+    whatever starts the next iteration, and classes with overlapping members.
+    """
+    body_first, _ = _first(body)
+    for op, av in _walk(body):
+        if op == _parser.BRANCH:
+            seen = frozenset()
+            for branch in av[1]:
+                chars, nullable = _first(branch)
+                if nullable:
+                    chars |= body_first
+                if seen & chars:
+                    return True
+                seen |= chars
+        elif op == _parser.IN:
+            seen = frozenset()
+            for item in av:
+                if item[0] == _parser.NEGATE:
+                    continue
+                chars = _set_member(*item)
+                if seen & chars:
+                    return True
+                seen |= chars
+    return False
+
+
+def backtracking_risk(pattern: str) -> bool:
+    """Whether an unbounded repeat is ambiguous, as in ``(a+)+``, ``(\\w+\\s?)*`` or ``(a|aa)+``.
+
+    Nested quantifiers, and alternatives that can match the same text, are the
+    usual causes of exponential backtracking on a line that almost matches.
+    Possessive repeats never backtrack and are ignored.
+    """
+    for op, av in _walk(_parser.parse(pattern)):
+        if op in _REPEATS and av[1] == _parser.MAXREPEAT:
+            if any(inner in _REPEATS and inner_av[0] != inner_av[1] for inner, inner_av in _walk(av[2])):
+                return True
+            if _ambiguous(av[2]):
+                return True
+    return False
+
+
+def _compile_linear(pattern: str):
+    try:
+        return re2.compile(pattern)
+    except Exception:
+        # Not supported by RE2 (backreferences, lookarounds, ...)
+        return None
+
+
+def _unchecked() -> None:
+    pass
+
+
+@contextmanager
+def _time_budget(seconds: float | None):
+    """Raise ``_BudgetExceeded`` once the calling thread has used ``seconds`` of CPU in the block.
+
+    Yields a ``check`` function for the block to call between lines. On the
+    main thread (the event loop under uvicorn and scan pool workers) a
+    ``SIGPROF`` timer also interrupts a single runaway match. That timer
+    counts the CPU of the whole process, so when it fires the handler compares
+    the thread's own CPU time (``time.thread_time``) with the deadline and
+    re-arms it if other threads used the time. Signals can only be handled on
+    the main thread, so elsewhere the budget is only checked between lines.
+    """
+    if not seconds:
+        yield _unchecked
+        return
+
+    deadline = time.thread_time() + seconds
+
+    def check():
+        if time.thread_time() > deadline:
+            raise _BudgetExceeded()
+
+    if threading.current_thread() is not threading.main_thread():
+        yield check
+        return
+
+    armed = True
+
+    def expire(signum, frame):
+        if not armed:
+            return
+        remaining = deadline - time.thread_time()
+        if remaining > 0:
+            signal.setitimer(signal.ITIMER_PROF, max(remaining, 0.001))
+            return
+        raise _BudgetExceeded()
+
+    previous = signal.signal(signal.SIGPROF, expire)
+    signal.setitimer(signal.ITIMER_PROF, seconds)
+    try:
+        # The timer covers the main thread; skip the per-line system calls
+        yield _unchecked
+    finally:
+        armed = False
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        signal.signal(signal.SIGPROF, previous)
+
+
+def _is_combinable(compiled: re.Pattern) -> bool:
+    if compiled.flags & ~re.UNICODE or compiled.groupindex:
+        return False
+    if backtracking_risk(compiled.pattern):
+        return False
+    for op, av in _walk(_parser.parse(compiled.pattern)):
+        if op in _UNSAFE_OPCODES:
+            return False
+        if op == _parser.AT and av in _UNSAFE_ANCHORS:
+            return False
+    return True
+
+
+def line_starts(lines: list[str]) -> list[int]:
+    """Offsets of each line inside ``"\\n".join(lines)``."""
+    if not lines:
+        return []
+    return [0, *accumulate(len(line) + 1 for line in lines[:-1])]
+
+
+class CompiledRubric:
+    """A rubric whose patterns are compiled once and scanned in a single pass."""
+
+    def __init__(self, grading_criteria: list, digest: str | None = None, engine: str = "re"):
+        self.digest = digest
+        self.engine = engine
+        self._grading_criteria = grading_criteria
+        if engine == "re2" and re2 is None:
+            logger.warning("REGEX_ENGINE is re2 but google-re2 is not installed; using re")
+
+        self.criteria: list[Criterion | StructuralCriterion] = []
+        self._structural_indices = []
+        for criterion in grading_criteria:
+            pattern = criterion.get("pattern")
+            structure = criterion.get("structure")
+            deduction = criterion.get("deduction")
+            message = criterion.get("message")
+
+            if structure is not None and deduction and message:
+                self._structural_indices.append(len(self.criteria))
+                self.criteria.append(StructuralCriterion(StructureQuery.parse(structure), deduction, message))
+                continue
+            if not all([pattern, deduction, message]):
+                continue
+
+            linear = _compile_linear(pattern) if engine == "re2" and re2 is not None else None
+            self.criteria.append(Criterion(re.compile(pattern), deduction, message, linear))
+
+        self._combined_indices = []
+        self._line_indices = []
+        for index, criterion in enumerate(self.criteria):
+            if isinstance(criterion, StructuralCriterion):
+                continue
+            if criterion.linear is None and _is_combinable(criterion.pattern):
+                self._combined_indices.append(index)
+            else:
+                self._line_indices.append(index)
+
+        self._combined = None
+        if self._combined_indices:
+            # A bare top-level "|" keeps the union of the patterns while letting
+            # the regex compiler build a first-character filter for it.
+            self._combined = re.compile(
+                "|".join(self.criteria[i].pattern.pattern for i in self._combined_indices),
+                re.MULTILINE,
+            )
+
+    def __reduce__(self):
+        # Ship the criteria, not the compiled patterns; the receiver compiles them once.
+        return CompiledRubric, (self._grading_criteria, self.digest, self.engine)
+
+    def _scan_combined(self, lines: list[str], hits: list[list[int]], check=_unchecked) -> None:
+        text = "\n".join(lines)
+        starts = line_starts(lines)
+        last_line = len(lines) - 1
+        pos = 0
+        while True:
+            match = self._combined.search(text, pos)
+            if match is None:
+                break
+            check()
+            line_index = bisect_right(starts, match.start()) - 1
+            line = lines[line_index]
+            for i in self._combined_indices:
+                if self.criteria[i].pattern.search(line):
+                    hits[i].append(line_index + 1)
+            if line_index == last_line:
+                break
+            pos = starts[line_index + 1]
+
+    def scan(self, content: str, budget: float | None = None) -> list[tuple[int, int]]:
+        """Return ``(criterion_index, line_number)`` hits ordered by criterion, then line.
+
+        With a ``budget`` (CPU seconds per criterion), criteria that exceed it
+        stop early and ``ScanTimeout`` is raised once every criterion has run.
+        """
+        lines = content.splitlines()
+        hits = [[] for _ in self.criteria]
+        line_indices = self._line_indices
+
+        if self._combined is not None and lines:
+            try:
+                with _time_budget(budget) as check:
+                    self._scan_combined(lines, hits, check)
+            except _BudgetExceeded:
+                # Find out which criterion is slow by giving each its own budget.
+                for i in self._combined_indices:
+                    hits[i] = []
+                line_indices = self._combined_indices + line_indices
+
+        timed_out = []
+        for i in line_indices:
+            search = self.criteria[i].search
+            try:
+                with _time_budget(budget) as check:
+                    for n, line in enumerate(lines, 1):
+                        check()
+                        if search(line):
+                            hits[i].append(n)
+            except _BudgetExceeded:
+                timed_out.append(i)
+
+        if self._structural_indices:
+            index = get_index(content)
+            for i in self._structural_indices:
+                hits[i] = self.criteria[i].query.lines(index)
+
+        results = [
+            (index, line_number)
+            for index, line_numbers in enumerate(hits)
+            for line_number in line_numbers
+        ]
+        if timed_out:
+            raise ScanTimeout(results, sorted(timed_out))
+        return results
+
+
+def check_patterns(grading_criteria: list, engine: str = "re") -> tuple[list[str], list[str]]:
+    """Return ``(invalid, risky)`` pattern messages for a JSON rubric.
+
+    Risky patterns are those prone to catastrophic backtracking that the
+    configured engine cannot run in linear time. Malformed ``structure``
+    queries are reported as invalid.
+    """
+    invalid, risky = [], []
+    for criterion in grading_criteria:
+        if isinstance(criterion, dict) and "structure" in criterion:
+            try:
+                StructureQuery.parse(criterion["structure"])
+            except ValueError as e:
+                invalid.append(f"structure {criterion['structure']!r}: {e}")
+            continue
+        pattern = criterion.get("pattern") if isinstance(criterion, dict) else None
+        if not isinstance(pattern, str) or not pattern:
+            continue
+        try:
+            re.compile(pattern)
+        except re.error as e:
+            invalid.append(f"{pattern!r}: {e}")
+            continue
+        if backtracking_risk(pattern) and not (engine == "re2" and re2 is not None and _compile_linear(pattern)):
+            risky.append(pattern)
+    return invalid, risky
@@ -0,0 +1,85 @@
+"""
+Bounded-memory reading of a checkout's Java sources.
+
+Files are discovered lazily with ``os.scandir`` in the same order ``os.walk``
+would produce and read one at a time, so at most one file's text is alive
+while a repository is scanned. Files over ``MAX_SOURCE_FILE_BYTES`` are
+skipped, a repository over ``MAX_SOURCE_REPO_BYTES`` is rejected, and files
+of ``SOURCE_MMAP_THRESHOLD`` bytes or more are decoded straight from a memory
+map instead of being copied into a bytes object first.
+"""
+
+import codecs
+import logging
+import mmap
+import os
+from dataclasses import dataclass
+from typing import Iterator
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class SourceFile:
+    path: str
+    relative_path: str
+    size: int
+
+
+def java_files(checkout_root: str, assignment_name: str) -> Iterator[SourceFile]:
+    """Yield the assignment's regular ``.java`` files; symlinks are not followed."""
+    stack = [os.path.join(checkout_root, assignment_name)]
+    while stack:
+        subdirs = []
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif entry.name.endswith(".java") and entry.is_file(follow_symlinks=False):
+                    yield SourceFile(
+                        path=entry.path,
+                        relative_path=os.path.relpath(entry.path, checkout_root),
+                        size=entry.stat(follow_symlinks=False).st_size,
+                    )
+        # Visit subdirectories in listing order, depth first, like os.walk.
+        stack.extend(reversed(subdirs))
+
+
+def read_text(path: str, size: int) -> str:
+    """Read a file like ``open(path, encoding="utf-8", errors="ignore").read()``."""
+    if size < settings.SOURCE_MMAP_THRESHOLD:
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            return f.read()
+
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        text = codecs.decode(buffer, "utf-8", "ignore")
+    # Universal newlines, as text mode does
+    return text.replace("\r\n", "\n").replace("\r", "\n")
+
+
+class SourceReader:
+    """Reads files of one repository, enforcing the per-file and per-repository byte caps."""
+
+    def __init__(self, assignment_name: str):
+        self.assignment_name = assignment_name
+        self.bytes_read = 0
+
+    def read(self, source: SourceFile) -> str | None:
+        """Text of ``source``, or None when the file is over the per-file cap."""
+        if source.size > settings.MAX_SOURCE_FILE_BYTES:
+            logger.warning(
+                "Skipping %s: %d bytes is over the %d byte file limit",
+                source.relative_path, source.size, settings.MAX_SOURCE_FILE_BYTES,
+            )
+            return None
+        self.bytes_read += source.size
+        if self.bytes_read > settings.MAX_SOURCE_REPO_BYTES:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Java sources in '{self.assignment_name}' exceed the {settings.MAX_SOURCE_REPO_BYTES} byte limit.",
+            )
+        return read_text(source.path, source.size)
@@ -0,0 +1,137 @@
+"""
+Grading worker for the database job queue (``JOB_BACKEND=database``).
+
+    python -m app.worker [--concurrency 4]
+
+Each process runs ``--concurrency`` loops that claim jobs from the
+``grading_jobs`` table and grade them with ``grading_service.grade_assignment``,
+exactly as ``POST /grade`` would. Add processes, on any node that can reach
+the database, to grade more repositories at once. SIGTERM stops claiming new
+jobs and lets the running ones finish; a worker that dies mid-job leaves its
+lease to expire, after which another worker picks the job up again.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import socket
+import uuid
+from typing import Callable
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db import migrations
+from app.db.models import Base
+from app.db.session import SessionLocal, engine
+from app.services import grading_service, job_store, rubric_cache, scan_pool
+
+logger = logging.getLogger(__name__)
+
+
+class Worker:
+    def __init__(self, session_factory: Callable[[], AsyncSession], worker_id: str | None = None):
+        self.session_factory = session_factory
+        self.id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+    async def run(self, stop: asyncio.Event) -> None:
+        while not stop.is_set():
+            try:
+                claimed = await self.run_once()
+            except Exception:
+                logger.exception("Worker %s could not claim a job", self.id)
+                claimed = False
+            if not claimed:
+                try:
+                    await asyncio.wait_for(stop.wait(), settings.JOB_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def run_once(self) -> bool:
+        """Claim and grade one job. Returns False when there was nothing to claim."""
+        async with self.session_factory() as db:
+            await job_store.fail_expired(db)
+            job = await job_store.claim(db, self.id)
+        if job is None:
+            return False
+        await self._process(job)
+        return True
+
+    async def _process(self, job: job_store.ClaimedJob) -> None:
+        grading = asyncio.ensure_future(self._grade(job))
+        leased = asyncio.ensure_future(self._keep_leased(job))
+        try:
+            await asyncio.wait({grading, leased}, return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            # The lease expires and the job is retried elsewhere.
+            grading.cancel()
+            leased.cancel()
+            raise
+        leased.cancel()
+        if not grading.done():
+            # Lost the lease: another worker owns the job now.
+            grading.cancel()
+            await asyncio.gather(grading, return_exceptions=True)
+            logger.warning("Worker %s lost the lease on job %s", self.id, job.id)
+            return
+
+        async with self.session_factory() as db:
+            try:
+                result = grading.result()
+            except HTTPException as e:
+                await job_store.fail(db, job, self.id, {"status_code": e.status_code, "detail": e.detail})
+            except Exception as e:
+                logger.exception("Grading job %s failed", job.id)
+                await job_store.fail(db, job, self.id, {"status_code": 500, "detail": str(e)}, retry=True)
+            else:
+                if not await job_store.complete(db, job, self.id, jsonable_encoder(result)):
+                    logger.warning("Worker %s finished job %s after its lease expired", self.id, job.id)
+
+    async def _grade(self, job: job_store.ClaimedJob) -> dict:
+        async with self.session_factory() as db:
+            return await grading_service.grade_assignment(job.request, db)
+
+    async def _keep_leased(self, job: job_store.ClaimedJob) -> None:
+        """Heartbeat until the lease is lost."""
+        while True:
+            await asyncio.sleep(settings.JOB_HEARTBEAT_SECONDS)
+            try:
+                async with self.session_factory() as db:
+                    if not await job_store.heartbeat(db, job, self.id):
+                        return
+            except Exception:
+                # Keep grading; the lease only lapses if the database stays unreachable.
+                logger.exception("Heartbeat for job %s failed", job.id)
+
+
+async def main(concurrency: int) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(migrations.upgrade)
+    async with SessionLocal() as db:
+        await rubric_cache.warm_up(db)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+
+    workers = [Worker(SessionLocal) for _ in range(concurrency)]
+    logger.info("Starting %d grading workers", len(workers))
+    try:
+        await asyncio.gather(*(worker.run(stop) for worker in workers))
+    finally:
+        scan_pool.shutdown()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=settings.GRADING_WORKERS)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    asyncio.run(main(args.concurrency))
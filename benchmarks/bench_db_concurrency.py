@@ -0,0 +1,117 @@
+"""
+Latency of GET /grades while several grades run concurrently.
+
+Grades are real end-to-end runs (git clone of local repositories, scan,
+insert) against a throwaway SQLite database, driven in the same event loop as
+the GET /grades requests, so anything that blocks the loop shows up in the
+read latency.
+
+    python -m benchmarks.bench_db_concurrency [--graders 8] [--rows 2000]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+WORKDIR = tempfile.mkdtemp(prefix="bench-db-")
+os.environ["DATABASE_URL"] = f"sqlite:///{WORKDIR}/bench.db"
+
+import httpx  # noqa: E402
+
+from app.db import models  # noqa: E402
+from app.db.session import SessionLocal  # noqa: E402
+from app.main import app  # noqa: E402
+from app.schemas.grading import GradingRequest  # noqa: E402
+from app.services import grading_service  # noqa: E402
+
+ASSIGNMENT = "Assignment1"
+CRITERIA = '[{"pattern": "System\\\\.out", "deduction": 1, "message": "Debug print"}]'
+
+
+def make_repo(path: str, files: int) -> str:
+    os.makedirs(os.path.join(path, ASSIGNMENT))
+    for i in range(files):
+        with open(os.path.join(path, ASSIGNMENT, f"Class{i}.java"), "w") as f:
+            f.write(f"public class Class{i} {{\n" + "    void run() { System.out.println(); }\n" * 200 + "}\n")
+    git = ["git", "-c", "user.email=bench@example.com", "-c", "user.name=bench"]
+    subprocess.run([*git, "init", "-q"], cwd=path, check=True)
+    subprocess.run([*git, "add", "."], cwd=path, check=True)
+    subprocess.run([*git, "commit", "-q", "-m", "init"], cwd=path, check=True)
+    return f"file://{path}"
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+
+async def seed(rows: int) -> None:
+    async with SessionLocal() as db:
+        assignment = models.Assignment(name=ASSIGNMENT)
+        db.add(assignment)
+        await db.flush()
+        db.add(models.Criteria(assignment_id=assignment.id, text=CRITERIA))
+        db.add_all(
+            models.GradingResult(assignment_id=assignment.id, student_id=f"s{i}", grade=90, feedback="- 10 points")
+            for i in range(rows)
+        )
+        await db.commit()
+
+
+async def measure_reads(client: httpx.AsyncClient, stop: asyncio.Event, samples: list[float]) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        response = await client.get("/grades")
+        response.raise_for_status()
+        samples.append((time.perf_counter() - start) * 1000)
+
+
+async def run_graders(urls: list[str], rounds: int) -> float:
+    async def grade(url: str) -> None:
+        for _ in range(rounds):
+            request = GradingRequest.model_construct(assignment_name=ASSIGNMENT, repo_link=url, token="", force=True)
+            async with SessionLocal() as db:
+                await grading_service.grade_assignment(request, db)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(grade(url) for url in urls))
+    return time.perf_counter() - start
+
+
+async def main(args) -> None:
+    urls = [make_repo(os.path.join(WORKDIR, f"repo{i}"), args.files) for i in range(args.graders)]
+
+    async with app.router.lifespan_context(app):
+        await seed(args.rows)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for label, graders in (("idle", []), (f"{len(urls)} concurrent grades", urls)):
+                samples: list[float] = []
+                stop = asyncio.Event()
+                reader = asyncio.create_task(measure_reads(client, stop, samples))
+                if graders:
+                    elapsed = await run_graders(graders, args.rounds)
+                else:
+                    await asyncio.sleep(2)
+                    elapsed = 2
+                stop.set()
+                await reader
+                print(
+                    f"GET /grades ({label}): {len(samples)} requests in {elapsed:.2f}s, "
+                    f"p50 {statistics.median(samples):.1f} ms, p99 {percentile(samples, 99):.1f} ms",
+                    file=sys.stdout,
+                )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--graders", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--rows", type=int, default=2000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,238 @@
+"""
+End-to-end grading throughput on synthetic repositories.
+
+Generates local git repositories with a given number and size of Java files
+and a rubric with a given number of patterns and hit rate, then drives
+``grading_service.grade_assignment`` against a throwaway SQLite database:
+real clones, file reads, scans and inserts. Every round regrades every
+repository from scratch (``force``) with a cold findings cache unless
+``--warm-cache`` is given.
+
+Results are printed and, with ``--output``, saved as JSON; ``--compare`` prints
+the change against a JSON file saved on another commit.
+
+    python -m benchmarks.bench_grading [--repos 8] [--files 50] [--file-kb 8] [--patterns 20]
+        [--hit-rate 0.01] [--output results.json] [--compare baseline.json]
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+WORKDIR = tempfile.mkdtemp(prefix="bench-grading-")
+os.environ["DATABASE_URL"] = f"sqlite:///{WORKDIR}/bench.db"
+
+from app.core import metrics  # noqa: E402
+from app.db import models  # noqa: E402
+from app.db.session import SessionLocal  # noqa: E402
+from app.main import app  # noqa: E402
+from app.schemas.grading import GradingRequest  # noqa: E402
+from app.services import findings_cache, grading_service  # noqa: E402
+
+ASSIGNMENT = "Assignment1"
+WORDS = ["public", "private", "static", "void", "int", "String", "return", "new", "this", "if", "for"]
+
+# Summary keys compared by --compare, and whether higher is better
+COMPARED = {
+    "grades_per_second": True,
+    "mib_per_second": True,
+    "latency_ms.p50": False,
+    "latency_ms.p90": False,
+    "latency_ms.p99": False,
+    "peak_rss_mib": False,
+}
+
+
+def make_source(rng: random.Random, name: str, size: int, patterns: int, hit_rate: float) -> str:
+    lines = [f"public class {name} {{"]
+    length = len(lines[0])
+    while length < size:
+        if rng.random() < hit_rate:
+            line = f"    Forbidden{rng.randrange(patterns)}();"
+        else:
+            line = "    " + " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 10))) + ";"
+        lines.append(line)
+        length += len(line) + 1
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+def make_criteria(patterns: int) -> str:
+    return json.dumps([
+        {"pattern": f"Forbidden{i}\\(", "deduction": 1, "message": f"criterion {i}"}
+        for i in range(patterns)
+    ])
+
+
+def make_repo(path: str, rng: random.Random, args) -> str:
+    os.makedirs(os.path.join(path, ASSIGNMENT))
+    for i in range(args.files):
+        with open(os.path.join(path, ASSIGNMENT, f"Class{i}.java"), "w") as f:
+            f.write(make_source(rng, f"Class{i}", args.file_kb * 1024, args.patterns, args.hit_rate))
+    git = ["git", "-c", "user.email=bench@example.com", "-c", "user.name=bench"]
+    subprocess.run([*git, "init", "-q"], cwd=path, check=True)
+    subprocess.run([*git, "add", "."], cwd=path, check=True)
+    subprocess.run([*git, "commit", "-q", "-m", "init"], cwd=path, check=True)
+    return f"file://{path}"
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+
+def peak_rss_mib(who: int) -> float:
+    rss = resource.getrusage(who).ru_maxrss
+    # KiB on Linux, bytes on macOS
+    return rss / 1024 ** 2 if sys.platform == "darwin" else rss / 1024
+
+
+def current_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def seed(criteria: str) -> None:
+    async with SessionLocal() as db:
+        assignment = models.Assignment(name=ASSIGNMENT)
+        db.add(assignment)
+        await db.flush()
+        db.add(models.Criteria(assignment_id=assignment.id, text=criteria))
+        await db.commit()
+
+
+async def grade(url: str) -> tuple[float, dict[str, float], int]:
+    request = GradingRequest.model_construct(assignment_name=ASSIGNMENT, repo_link=url, token="", force=True)
+    start = time.perf_counter()
+    with metrics.collect() as timings:
+        async with SessionLocal() as db:
+            response = await grading_service.grade_assignment(request, db)
+    return time.perf_counter() - start, timings, 100 - response["grading_result"]["grade"]
+
+
+async def run(urls: list[str], args) -> dict:
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies: list[float] = []
+    stages: dict[str, float] = {}
+    deductions = 0
+
+    async def bounded(url: str) -> None:
+        nonlocal deductions
+        async with semaphore:
+            seconds, timings, deducted = await grade(url)
+        latencies.append(seconds)
+        deductions += deducted
+        for name, value in timings.items():
+            stages[name] = stages.get(name, 0.0) + value
+
+    elapsed = 0.0
+    for _ in range(args.rounds):
+        if not args.warm_cache:
+            findings_cache.clear()
+        start = time.perf_counter()
+        await asyncio.gather(*(bounded(url) for url in urls))
+        elapsed += time.perf_counter() - start
+
+    grades = len(latencies)
+    source_bytes = grades * args.files * args.file_kb * 1024
+    return {
+        "grades": grades,
+        "seconds": round(elapsed, 3),
+        "grades_per_second": round(grades / elapsed, 2),
+        "files_per_second": round(grades * args.files / elapsed, 1),
+        "mib_per_second": round(source_bytes / 1024 ** 2 / elapsed, 2),
+        "latency_ms": {
+            "mean": round(statistics.fmean(latencies) * 1000, 1),
+            "p50": round(percentile(latencies, 50) * 1000, 1),
+            "p90": round(percentile(latencies, 90) * 1000, 1),
+            "p99": round(percentile(latencies, 99) * 1000, 1),
+            "max": round(max(latencies) * 1000, 1),
+        },
+        "stages_ms": {name: round(total / grades * 1000, 1) for name, total in stages.items()},
+        "deductions_per_grade": round(deductions / grades, 2),
+    }
+
+
+def lookup(summary: dict, key: str):
+    for part in key.split("."):
+        summary = summary.get(part) if isinstance(summary, dict) else None
+    return summary
+
+
+def compare(old: dict, new: dict) -> None:
+    print(f"\ncompared with {old.get('commit') or old.get('timestamp')}:")
+    if old.get("params") != new["params"]:
+        print("  warning: parameters differ", file=sys.stderr)
+    for key, higher_is_better in COMPARED.items():
+        before, after = lookup(old, key), lookup(new, key)
+        if not before or after is None:
+            continue
+        change = (after - before) / before * 100
+        better = (change > 0) == higher_is_better
+        print(f"  {key:<20} {before:>10} -> {after:<10} {change:+6.1f}% {'better' if better else 'worse'}")
+
+
+async def main(args) -> None:
+    rng = random.Random(args.seed)
+    urls = [make_repo(os.path.join(WORKDIR, f"repo{i}"), rng, args) for i in range(args.repos)]
+
+    async with app.router.lifespan_context(app):
+        await seed(make_criteria(args.patterns))
+        summary = await run(urls, args)
+
+    result = {
+        "benchmark": "grading",
+        "commit": current_commit(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "params": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        **summary,
+        "peak_rss_mib": round(peak_rss_mib(resource.RUSAGE_SELF), 1),
+        "peak_child_rss_mib": round(peak_rss_mib(resource.RUSAGE_CHILDREN), 1),
+    }
+
+    print(
+        f"{result['grades']} grades in {result['seconds']:.2f}s: {result['grades_per_second']} grades/s, "
+        f"{result['files_per_second']} files/s, {result['mib_per_second']} MiB/s"
+    )
+    latency = result["latency_ms"]
+    print(f"latency p50 {latency['p50']} ms, p90 {latency['p90']} ms, p99 {latency['p99']} ms")
+    print("stages per grade: " + ", ".join(f"{name} {ms} ms" for name, ms in result["stages_ms"].items()))
+    print(f"peak RSS {result['peak_rss_mib']} MiB (child processes {result['peak_child_rss_mib']} MiB)")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), result)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repos", type=int, default=8)
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--file-kb", type=int, default=8)
+    parser.add_argument("--patterns", type=int, default=20)
+    parser.add_argument("--hit-rate", type=float, default=0.01, help="fraction of lines matching a pattern")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=1, help="grades running at once")
+    parser.add_argument("--warm-cache", action="store_true", help="keep the findings cache between rounds")
+    parser.add_argument("--seed", type=int, default=247)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,76 @@
+"""
+Compare the single-pass rubric scanner against the old per-line loop.
+
+    python -m benchmarks.bench_scanner [--files 20] [--lines 400]
+"""
+
+import argparse
+import random
+import re
+import time
+
+from app.services.scanner import CompiledRubric
+
+WORDS = ["public", "private", "static", "void", "int", "String", "return", "new", "this", "if", "for"]
+
+
+def legacy_scan(grading_criteria: list, content: str) -> int:
+    hits = 0
+    lines = content.splitlines()
+    for criterion in grading_criteria:
+        pattern = criterion.get("pattern")
+        deduction = criterion.get("deduction")
+        message = criterion.get("message")
+
+        if not all([pattern, deduction, message]):
+            continue
+
+        for line in lines:
+            if re.search(pattern, line):
+                hits += 1
+    return hits
+
+
+def make_source(rng: random.Random, lines: int) -> str:
+    return "\n".join(
+        "    " + " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 10))) + ";"
+        for _ in range(lines)
+    )
+
+
+def make_criteria(count: int) -> list:
+    return [
+        {"pattern": f"Forbidden{i}\\(|System\\.exit{i}", "deduction": 1, "message": f"criterion {i}"}
+        for i in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--lines", type=int, default=400)
+    parser.add_argument("--criteria", type=int, nargs="+", default=[1, 5, 20, 50, 100])
+    args = parser.parse_args()
+
+    rng = random.Random(247)
+    sources = [make_source(rng, args.lines) for _ in range(args.files)]
+
+    print(f"{'criteria':>8} {'legacy ms':>10} {'engine ms':>10} {'speedup':>8}")
+    for count in args.criteria:
+        criteria = make_criteria(count)
+
+        start = time.perf_counter()
+        legacy_hits = sum(legacy_scan(criteria, source) for source in sources)
+        legacy = time.perf_counter() - start
+
+        start = time.perf_counter()
+        rubric = CompiledRubric(criteria)
+        engine_hits = sum(len(rubric.scan(source)) for source in sources)
+        engine = time.perf_counter() - start
+
+        assert legacy_hits == engine_hits
+        print(f"{count:>8} {legacy * 1000:>10.1f} {engine * 1000:>10.1f} {legacy / engine:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,112 @@
+import asyncio
+import json
+from types import SimpleNamespace
+from unittest.mock import patch, AsyncMock
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 from app.main import app
 from app.db.models import Base
-from app.api.deps import get_db
+from app.api.deps import get_db, get_session_factory
+from app.schemas.grading import GradingRequest
+from app.services import git_ops, grade_listing, grading_service, sources
+
+TEST_CRITERIA = [{"pattern": "Test", "deduction": 10, "message": "Use of Test class"}]
 
 # Setup test database
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
 )
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Synchronous sessions are only used by tests to seed and inspect the database.
+TestingSyncSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# The app itself talks to the same file through aiosqlite. NullPool keeps
+# connections from outliving the event loop that opened them.
+async_engine = create_async_engine("sqlite+aiosqlite:///./test.db", poolclass=NullPool)
+TestingSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
 
 @pytest.fixture(name="session")
 def session_fixture():
     Base.metadata.create_all(bind=engine)
-    db = TestingSessionLocal()
+    db = TestingSyncSessionLocal()
     try:
         yield db
     finally:
         db.close()
         Base.metadata.drop_all(bind=engine)
+        # Result ids restart with the next test's database
+        grade_listing.clear()
 
 
 @pytest.fixture(name="client")
-def client_fixture(session: TestingSessionLocal):
-    def override_get_db():
-        yield session
+def client_fixture(session):
+    async def override_get_db():
+        async with TestingSessionLocal() as db:
+            yield db
 
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_session_factory] = lambda: TestingSessionLocal
     with TestClient(app) as client:
         yield client
-    app.dependency_overrides.clear()
\ No newline at end of file
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture(name="session_factory")
+def session_factory_fixture(session):
+    return TestingSessionLocal
+
+
+@pytest.fixture(name="assignment")
+def assignment_fixture(client):
+    """``assignment(name, criteria)`` creates an assignment and uploads JSON criteria; returns the upload response."""
+    def create(assignment_name: str = "Assignment1", criteria: list[dict] = TEST_CRITERIA):
+        client.post("/assignments", json={"assignment_name": assignment_name})
+        return client.post(
+            f"/assignments/{assignment_name}/criteria",
+            files={"criteria_file": ("criteria.json", json.dumps(criteria).encode("utf-8"), "application/json")},
+        )
+    return create
+
+
+@pytest.fixture(name="fake_checkout")
+def fake_checkout_fixture(client):
+    """Patch git and the file system so that grading a repository sees a canned checkout.
+
+    By default the remote reports no HEAD, the clone is at commit ``"a" * 40``
+    and holds ``somedir/Test.java`` containing ``public class Test {}``. Change
+    the mocks' return values to grade something else. Depends on ``client`` so
+    the app starts before ``os.path.isdir`` is patched.
+    """
+    with patch("app.services.git_ops.ls_remote_head", new_callable=AsyncMock, return_value=None) as ls_remote, \
+         patch(
+             "app.services.git_ops.sparse_clone", new_callable=AsyncMock,
+             return_value=git_ops.CloneStats(seconds=0.1, bytes_transferred=1024, commit_sha="a" * 40),
+         ) as clone, \
+         patch(
+             "app.services.sources.java_files",
+             return_value=[sources.SourceFile("/tmp/somedir/Test.java", "somedir/Test.java", 20)],
+         ) as java_files, \
+         patch("os.path.isdir", return_value=True), \
+         patch("app.services.sources.read_text", return_value="public class Test {}") as read_text:
+        yield SimpleNamespace(ls_remote=ls_remote, clone=clone, java_files=java_files, read_text=read_text)
+
+
+@pytest.fixture(name="grade_repo")
+def grade_repo_fixture(session_factory):
+    """``grade_repo(repo, force)`` grades ``Assignment1`` from a local git repository through the service."""
+    def grade(repo, force: bool = False) -> dict:
+        request = GradingRequest.model_construct(
+            assignment_name="Assignment1", repo_link=repo.as_uri(), token="", force=force,
+        )
+
+        async def run():
+            async with session_factory() as db:
+                return await grading_service.grade_assignment(request, db)
+
+        return asyncio.run(run())
+    return grade
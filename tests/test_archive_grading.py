@@ -0,0 +1,138 @@
+import io
+import tarfile
+import zipfile
+import pytest
+from fastapi.testclient import TestClient
+from app.core.config import settings
+from app.core import limits
+from app.services import archives, findings_cache, grading_service
+
+CRITERIA = [{"pattern": "System\\.out", "deduction": 5, "message": "Debug print"}]
+MAIN = "class Main {\n  void run() { System.out.println(); }\n}\n"
+
+
+def make_zip(files: dict) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, content in files.items():
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+
+def make_tar(files: dict) -> bytes:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        for name, content in files.items():
+            data = content.encode("utf-8")
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def assignment(assignment):
+    findings_cache.clear()
+    assignment("Assignment1", CRITERIA)
+    return "Assignment1"
+
+
+def grade(client: TestClient, filename: str, data: bytes, **form):
+    return client.post(
+        "/grade/archive",
+        data={"assignment_name": "Assignment1", **form},
+        files={"archive": (filename, data, "application/octet-stream")},
+    )
+
+
+@pytest.mark.parametrize("filename, make", [("submission.zip", make_zip), ("submission.tar.gz", make_tar)])
+def test_grade_archive(client: TestClient, session, assignment, filename, make):
+    data = make({
+        "repo-main/Assignment1/Main.java": MAIN,
+        "repo-main/Assignment1/util/Util.java": "class Util {}\n",
+        "repo-main/Other/Skipped.java": MAIN,
+        "repo-main/README.md": "System.out",
+    })
+
+    response = grade(client, filename, data, student_id="jdoe")
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["commit_sha"] is None
+    assert body["cached"] is False
+    assert body["grading_result"] == {
+        "grade": 95,
+        "feedback": "- 5 points: Debug print in Assignment1/Main.java on line 2",
+        "partial": False,
+    }
+    grades = client.get("/grades/jdoe").json()
+    assert [(g["grade"], g["feedback"]) for g in grades] == [(95, body["grading_result"]["feedback"])]
+
+
+def test_grade_archive_without_assignment_files(client: TestClient, assignment):
+    response = grade(client, "submission.zip", make_zip({"Other/Main.java": MAIN}))
+
+    assert response.status_code == 404
+
+
+def test_grade_archive_rejects_non_archives(client: TestClient, assignment):
+    response = grade(client, "submission.zip", b"not an archive at all")
+
+    assert response.status_code == 400
+
+
+def test_grade_archive_rejects_oversized_upload(client: TestClient, assignment, monkeypatch):
+    data = make_zip({"Assignment1/Main.java": MAIN})
+    monkeypatch.setattr(settings, "MAX_ARCHIVE_BYTES", len(data) - 1)
+
+    assert grade(client, "submission.zip", data).status_code == 413
+
+
+def test_oversized_body_is_rejected_before_the_form_is_parsed(client: TestClient, assignment, monkeypatch):
+    monkeypatch.setattr(settings, "MAX_ARCHIVE_BYTES", 1024)
+
+    async def never_called(*args, **kwargs):
+        raise AssertionError("endpoint reached")
+    monkeypatch.setattr(grading_service, "grade_archive", never_called)
+    data = b"x" * (limits.MULTIPART_OVERHEAD + 2048)
+
+    response = grade(client, "submission.zip", data)
+    assert response.status_code == 413
+    assert response.json() == {"detail": "Archive exceeds the 1024 byte limit."}
+
+    # Without Content-Length the body is counted as it arrives
+    body = (
+        b"--b\r\nContent-Disposition: form-data; name=\"assignment_name\"\r\n\r\nAssignment1\r\n"
+        b"--b\r\nContent-Disposition: form-data; name=\"archive\"; filename=\"s.zip\"\r\n\r\n"
+        + data + b"\r\n--b--\r\n"
+    )
+    chunks = (body[i:i + 4096] for i in range(0, len(body), 4096))
+    response = client.post("/grade/archive", content=chunks, headers={"content-type": "multipart/form-data; boundary=b"})
+    assert response.status_code == 413
+
+
+@pytest.mark.parametrize("make", [make_zip, make_tar])
+def test_grade_archive_rejects_too_many_entries(client: TestClient, assignment, monkeypatch, make):
+    monkeypatch.setattr(settings, "MAX_ARCHIVE_ENTRIES", 3)
+    files = {f"Assignment1/C{i}.java": "class C {}\n" for i in range(4)}
+
+    assert grade(client, "submission.bin", make(files)).status_code == 413
+
+
+@pytest.mark.parametrize("make", [make_zip, make_tar])
+def test_grade_archive_rejects_bombs(client: TestClient, session, assignment, monkeypatch, make):
+    monkeypatch.setattr(settings, "MAX_ARCHIVE_UNPACKED_BYTES", 1024 ** 2)
+    # Compresses to a few kilobytes
+    data = make({"Assignment1/Main.java": MAIN, "padding.bin": "\0" * (4 * 1024 ** 2)})
+    assert len(data) < 64 * 1024
+
+    assert grade(client, "submission.bin", data).status_code == 413
+
+
+def test_java_sources_skips_files_over_the_file_limit():
+    limits = archives.ArchiveLimits(max_entries=10, max_unpacked_bytes=1024, max_file_bytes=16, max_source_bytes=1024)
+    data = make_zip({"Assignment1/Big.java": "x" * 17, "Assignment1/Small.java": "class S {}"})
+
+    files = list(archives.java_sources(io.BytesIO(data), "a.zip", "Assignment1", limits))
+
+    assert files == [("Assignment1/Small.java", "class S {}")]
@@ -0,0 +1,145 @@
+import io
+import subprocess
+import tarfile
+import zipfile
+import pytest
+from fastapi.testclient import TestClient
+from app.core import limits
+from app.core.config import settings
+from app.services import archives, baseline, findings_cache, grading_service
+
+CRITERIA = [{"pattern": "System\\.out", "deduction": 5, "message": "Debug print"}]
+MAIN = "class Main {\n  public static void main(String[] a) { System.out.println(\"TODO\"); }\n}\n"
+HELPER = "class Helper {\n  void log() { System.out.println(); }\n}\n"
+
+
+def git(*args, cwd):
+    subprocess.run(
+        ["git", "-c", "user.email=ta@example.com", "-c", "user.name=TA", *args],
+        cwd=cwd, check=True, capture_output=True,
+    )
+
+
+def make_repo(path, files: dict):
+    for name, content in files.items():
+        (path / name).parent.mkdir(parents=True, exist_ok=True)
+        (path / name).write_text(content)
+    git("init", "-q", cwd=path)
+    git("add", ".", cwd=path)
+    git("commit", "-q", "-m", "init", cwd=path)
+    return path
+
+
+def template_zip(files: dict) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, content in files.items():
+            archive.writestr(f"template-main/{name}", content)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def assignment(assignment):
+    findings_cache.clear()
+    baseline.clear()
+    assignment("Assignment1", CRITERIA)
+    return "Assignment1"
+
+
+def upload_template(client: TestClient, diff_lines: bool):
+    archive = template_zip({"Assignment1/Main.java": MAIN, "Assignment1/Helper.java": HELPER, "README.md": "x"})
+    return client.post(
+        "/assignments/Assignment1/baseline",
+        files={"archive": ("template.zip", archive, "application/zip")},
+        data={"diff_lines": str(diff_lines).lower()},
+    )
+
+
+@pytest.fixture
+def student_repo(tmp_path):
+    helper = HELPER.replace("  void log()", "  void debug() { System.out.println(1); }\n  void log()")
+    return make_repo(tmp_path / "student", {"Assignment1/Main.java": MAIN, "Assignment1/Helper.java": helper})
+
+
+def test_identical_template_files_are_skipped(client: TestClient, assignment, grade_repo, student_repo):
+    assert grade_repo(student_repo)["grading_result"]["grade"] == 85
+
+    response = upload_template(client, diff_lines=False)
+    assert response.status_code == 200
+    assert response.json()["files"] == 2
+
+    result = grade_repo(student_repo)
+    assert result["cached"] is False
+    assert result["grading_result"]["grade"] == 90
+    assert "Main.java" not in result["grading_result"]["feedback"]
+
+
+def test_diff_lines_only_counts_new_lines(client: TestClient, assignment, grade_repo, student_repo):
+    upload_template(client, diff_lines=True)
+
+    result = grade_repo(student_repo)
+    assert result["grading_result"]["grade"] == 95
+    assert result["grading_result"]["feedback"] == "- 5 points: Debug print in Assignment1/Helper.java on line 2"
+
+    assert client.delete("/assignments/Assignment1/baseline").status_code == 200
+    assert grade_repo(student_repo)["grading_result"]["grade"] == 85
+    assert client.delete("/assignments/Assignment1/baseline").status_code == 404
+
+
+def test_new_lines_with_repeated_lines():
+    template = []
+    for i in range(5000):
+        template += [f"  int f{i}() {{", "    return 0;", "  }", ""]
+    content = template[:8] + ["  int added;"] + template[8:9000] + ["    return 1;"] + template[9000:] + ["  }"] * 2000
+    assert baseline.new_lines(template, "\n".join(content)) == {9, 9002} | set(range(20003, 22003))
+    assert baseline.new_lines(["a", "b"], "a\nx\nb") == {2}
+    assert baseline.new_lines(["a", "b"], "b\na") == {1}
+
+
+def test_oversized_template_is_rejected(client: TestClient, assignment, monkeypatch):
+    archive = template_zip({"Assignment1/Main.java": MAIN})
+    monkeypatch.setattr(settings, "MAX_ARCHIVE_BYTES", len(archive) - 1)
+    response = client.post("/assignments/Assignment1/baseline", files={"archive": ("template.zip", archive, "application/zip")})
+    assert response.status_code == 413
+
+    # Far over the limit: rejected from Content-Length before the form is parsed
+    async def never_called(*args, **kwargs):
+        raise AssertionError("endpoint reached")
+    monkeypatch.setattr(grading_service, "save_baseline", never_called)
+    monkeypatch.setattr(settings, "MAX_ARCHIVE_BYTES", 1024)
+    response = client.post(
+        "/assignments/Assignment1/baseline",
+        files={"archive": ("template.zip", b"x" * (limits.MULTIPART_OVERHEAD + 2048), "application/zip")},
+    )
+    assert response.status_code == 413
+    assert response.json() == {"detail": "Archive exceeds the 1024 byte limit."}
+
+
+def test_template_from_local_repository(client: TestClient, assignment, tmp_path, monkeypatch):
+    template = make_repo(tmp_path / "templates" / "a1", {"Assignment1/Main.java": MAIN})
+
+    disabled = client.post("/assignments/Assignment1/baseline", data={"repo_path": str(template)})
+    assert disabled.status_code == 400
+
+    monkeypatch.setattr(settings, "BASELINE_REPO_ROOT", str(tmp_path / "templates"))
+    response = client.post("/assignments/Assignment1/baseline", data={"repo_path": str(template)})
+    assert response.status_code == 200
+    assert response.json()["files"] == 1
+
+    outside = client.post("/assignments/Assignment1/baseline", data={"repo_path": str(tmp_path)})
+    assert outside.status_code == 400
+
+
+def test_archive_entries_outside_assignment_are_ignored():
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        for name in ("Assignment1/A.java", "../Assignment1/Evil.java", "x/y/Assignment1/Deep.java", "Assignment1/notes.txt"):
+            data = b"class A {}\r\n"
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    buffer.seek(0)
+
+    assert list(archives.java_sources(buffer, "t.tar.gz", "Assignment1")) == [("Assignment1/A.java", "class A {}\n")]
+    with pytest.raises(archives.ArchiveError):
+        list(archives.java_sources(io.BytesIO(b"not an archive"), "t.zip", "Assignment1"))
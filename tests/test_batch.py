@@ -0,0 +1,68 @@
+import json
+from fastapi.testclient import TestClient
+from app.core.config import settings
+from app.db import models
+from app.services import git_ops
+
+
+async def fake_clone(url, dest, subdir, timeout=None, token=None):
+    # The token goes in a header, never in the clone URL
+    assert url.startswith("https://github.com/") and token == "t"
+    if "missing" in url:
+        raise git_ops.GitError(("clone",), 128, "fatal: repository not found")
+    return git_ops.CloneStats(seconds=0.1, bytes_transferred=1024, commit_sha="d" * 40)
+
+
+def post_batch(client: TestClient, fake_checkout, body: dict, head_sha=None):
+    fake_checkout.ls_remote.return_value = head_sha
+    fake_checkout.clone.side_effect = fake_clone
+    fake_checkout.clone.reset_mock()
+
+    response = client.post("/grade/batch", json=body)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    return [json.loads(line) for line in response.text.splitlines()], fake_checkout.clone.call_count
+
+
+def test_batch_streams_one_line_per_submission(client: TestClient, session, monkeypatch, assignment, fake_checkout):
+    monkeypatch.setattr(settings, "BATCH_INSERT_CHUNK", 2)
+    assignment("Batch Assignment")
+    submissions = [
+        {"repo_link": f"https://github.com/test/student{i}", "token": "t", "student_id": f"student{i}"}
+        for i in range(5)
+    ]
+    submissions.append({"repo_link": "https://github.com/test/missing", "token": "t"})
+
+    lines, clones = post_batch(client, fake_checkout, {"assignment_name": "Batch Assignment", "submissions": submissions})
+
+    assert clones == 6
+    assert sorted(line["index"] for line in lines) == list(range(6))
+    by_index = {line["index"]: line for line in lines}
+    assert by_index[0]["status"] == "graded"
+    assert by_index[0]["grading_result"]["grade"] == 90
+    assert by_index[5]["status"] == "error"
+    assert by_index[5]["error"]["status_code"] == 400
+
+    session.expire_all()
+    students = {row.student_id for row in session.query(models.GradingResult).all()}
+    assert students == {f"student{i}" for i in range(5)}
+
+
+def test_batch_reuses_unchanged_results(client: TestClient, assignment, fake_checkout):
+    assignment("Batch Assignment")
+    body = {
+        "assignment_name": "Batch Assignment",
+        "submissions": [{"repo_link": "https://github.com/test/student", "token": "t"}],
+    }
+
+    first, clones = post_batch(client, fake_checkout, body, head_sha="d" * 40)
+    assert clones == 1
+    second, clones = post_batch(client, fake_checkout, body, head_sha="d" * 40)
+    assert clones == 0
+    assert second[0]["status"] == "cached"
+    assert second[0]["grading_result"] == first[0]["grading_result"]
+
+
+def test_batch_unknown_assignment_is_404(client: TestClient):
+    response = client.post("/grade/batch", json={"assignment_name": "Nope", "submissions": []})
+    assert response.status_code == 404
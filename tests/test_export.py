@@ -0,0 +1,92 @@
+import csv
+import io
+import pyarrow as pa
+import pyarrow.parquet as pq
+from fastapi.testclient import TestClient
+from app.db import models
+
+
+def seed(session):
+    first = models.Assignment(name="Export A")
+    second = models.Assignment(name="Export B")
+    session.add_all([first, second])
+    session.commit()
+    session.add_all([
+        models.GradingResult(assignment_id=first.id, student_id="alice", grade=70),
+        models.GradingResult(assignment_id=second.id, student_id="bob", grade=88),
+        models.GradingResult(assignment_id=first.id, student_id="alice", grade=90),
+        models.GradingResult(assignment_id=first.id, student_id="bob", grade=60.5),
+        models.GradingResult(assignment_id=second.id, student_id="carol", grade=75),
+    ])
+    session.commit()
+
+
+def read_csv(response) -> list[list[str]]:
+    return list(csv.reader(io.StringIO(response.text)))
+
+
+def test_long_csv_export(client: TestClient, session, monkeypatch):
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "EXPORT_CHUNK", 2)
+    seed(session)
+
+    response = client.get("/export/grades")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert "gradebook-long.csv" in response.headers["content-disposition"]
+    rows = read_csv(response)
+    assert rows[0] == ["id", "assignment_name", "student_id", "grade", "created_at"]
+    assert [row[:4] for row in rows[1:]] == [
+        ["1", "Export A", "alice", "70.0"],
+        ["2", "Export B", "bob", "88.0"],
+        ["3", "Export A", "alice", "90.0"],
+        ["4", "Export A", "bob", "60.5"],
+        ["5", "Export B", "carol", "75.0"],
+    ]
+
+    filtered = read_csv(client.get("/export/grades", params={"assignment": "Export B"}))
+    assert [row[2] for row in filtered[1:]] == ["bob", "carol"]
+
+
+def test_pivot_csv_keeps_latest_grade(client: TestClient, session, monkeypatch):
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "EXPORT_CHUNK", 2)
+    seed(session)
+
+    rows = read_csv(client.get("/export/grades", params={"layout": "pivot"}))
+    assert rows == [
+        ["student_id", "Export A", "Export B"],
+        ["alice", "90.0", ""],
+        ["bob", "60.5", "88.0"],
+        ["carol", "", "75.0"],
+    ]
+
+    only_b = read_csv(client.get("/export/grades", params={"layout": "pivot", "assignment": "Export B"}))
+    assert only_b == [["student_id", "Export B"], ["bob", "88.0"], ["carol", "75.0"]]
+
+
+def test_empty_export_has_header(client: TestClient, session):
+    assert read_csv(client.get("/export/grades")) == [["id", "assignment_name", "student_id", "grade", "created_at"]]
+
+
+def test_columnar_formats(client: TestClient, session, monkeypatch):
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "EXPORT_CHUNK", 2)
+    seed(session)
+
+    parquet = pq.read_table(pa.BufferReader(client.get("/export/grades", params={"format": "parquet"}).content))
+    assert parquet.column("grade").to_pylist() == [70, 88, 90, 60.5, 75]
+    assert parquet.schema.field("created_at").type == pa.timestamp("us", tz="UTC")
+
+    response = client.get("/export/grades", params={"format": "arrow", "layout": "pivot"})
+    assert response.headers["content-type"] == "application/vnd.apache.arrow.stream"
+    table = pa.ipc.open_stream(response.content).read_all()
+    assert table.to_pylist() == [
+        {"student_id": "alice", "Export A": 90.0, "Export B": None},
+        {"student_id": "bob", "Export A": 60.5, "Export B": 88.0},
+        {"student_id": "carol", "Export A": None, "Export B": 75.0},
+    ]
+
+
+def test_unknown_format_is_rejected(client: TestClient, session):
+    assert client.get("/export/grades", params={"format": "xlsx"}).status_code == 422
@@ -0,0 +1,64 @@
+from fastapi.testclient import TestClient
+from app.db import models
+from app.services import sources
+
+CRITERIA = [
+    {"pattern": "System\\.out", "deduction": 2, "message": "Debug print"},
+    {"pattern": "catch \\(Exception", "deduction": 5, "message": "Catches generic Exception"},
+]
+
+
+def grade(client: TestClient, fake_checkout, assignment_name: str, repo_link: str, content: str):
+    fake_checkout.java_files.return_value = [sources.SourceFile("/tmp/somedir/Main.java", "somedir/Main.java", 20)]
+    fake_checkout.read_text.return_value = content
+    return client.post("/grade", json={"assignment_name": assignment_name, "repo_link": repo_link, "token": "t"})
+
+
+def test_findings_are_stored_as_rows(client: TestClient, session, assignment, fake_checkout):
+    assignment("Findings", CRITERIA)
+    content = "System.out.println();\ntry {} catch (Exception e) {}\nSystem.out.print(1);"
+    response = grade(client, fake_checkout, "Findings", "https://github.com/test/one", content)
+
+    assert response.status_code == 200
+    feedback = response.json()["grading_result"]["feedback"].splitlines()
+    assert len(feedback) == 3
+    assert feedback[0].startswith("- 2 points: Debug print in ")
+    assert feedback[0].endswith("Main.java on line 1")
+
+    result = session.query(models.GradingResult).one()
+    assert result.feedback is None
+    findings = session.query(models.GradingFinding).order_by(models.GradingFinding.id).all()
+    assert [(f.criterion, f.line, f.deduction) for f in findings] == [
+        ("Debug print", 1, 2),
+        ("Debug print", 3, 2),
+        ("Catches generic Exception", 2, 5),
+    ]
+    assert {f.result_id for f in findings} == {result.id}
+
+    listed = client.get("/grades").json()
+    assert listed[0]["feedback"].splitlines() == feedback
+    assert client.get("/grades?stream=true").json() == listed
+    assert client.get("/grades?include_feedback=false").json()[0]["feedback"] is None
+
+
+def test_criterion_costs(client: TestClient, assignment, fake_checkout):
+    assignment("Costs", CRITERIA)
+    grade(client, fake_checkout, "Costs", "https://github.com/test/one", "System.out.println();\nSystem.out.println();")
+    grade(client, fake_checkout, "Costs", "https://github.com/test/two", "System.out.println();\ncatch (Exception e) {}")
+
+    costs = client.get("/assignments/Costs/deductions").json()
+    assert costs == [
+        {"criterion": "Debug print", "occurrences": 3, "submissions": 2, "points": 6.0},
+        {"criterion": "Catches generic Exception", "occurrences": 1, "submissions": 1, "points": 5.0},
+    ]
+    assert client.get("/assignments/Missing/deductions").status_code == 404
+
+
+def test_legacy_feedback_is_kept(client: TestClient, session):
+    assignment = models.Assignment(name="Legacy")
+    session.add(assignment)
+    session.commit()
+    session.add(models.GradingResult(assignment_id=assignment.id, student_id="s", grade=90, feedback="- 10 points: old"))
+    session.commit()
+
+    assert client.get("/grades").json()[0]["feedback"] == "- 10 points: old"
@@ -0,0 +1,39 @@
+import asyncio
+import json
+from unittest.mock import patch
+from app.services import findings_cache, rubric_cache
+from app.services.grading_service import _grade_with_gemini, render_feedback
+
+CRITERIA = json.dumps([{"pattern": "System\\.out", "deduction": 2, "message": "Debug print"}])
+STARTER = "public class Main {\n    void run() { System.out.println(); }\n}\n"
+
+
+def test_identical_files_are_scanned_once():
+    findings_cache.clear()
+    rubric = rubric_cache.get_rubric("Findings Assignment", CRITERIA)
+    students = [
+        [{"path": f"/tmp/{student}/Main.java", "content": STARTER}]
+        for student in ("alice", "bob", "carol")
+    ]
+
+    with patch.object(rubric, "scan", wraps=rubric.scan) as scan:
+        results = [asyncio.run(_grade_with_gemini(files, rubric)) for files in students]
+
+    assert scan.call_count == 1
+    assert [result["grade"] for result in results] == [98, 98, 98]
+    assert "/tmp/bob/Main.java on line 2" in render_feedback(results[1]["findings"])
+    assert findings_cache.stats()["hits"] == 2
+    assert findings_cache.stats()["hit_rate"] == 2 / 3
+
+
+def test_rubric_change_rescans():
+    findings_cache.clear()
+    first = rubric_cache.get_rubric("Findings Assignment", CRITERIA)
+    second = rubric_cache.get_rubric(
+        "Findings Assignment",
+        json.dumps([{"pattern": "class", "deduction": 1, "message": "Class"}]),
+    )
+
+    assert findings_cache.scan(first, STARTER) == (((0, 2),), False)
+    assert findings_cache.scan(second, STARTER) == (((0, 1),), False)
+    assert findings_cache.scan(first, STARTER) == (((0, 2),), True)
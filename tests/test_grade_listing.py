@@ -0,0 +1,133 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.db import models
+from app.services import grade_listing, grading_service
+
+
+def seed_results(session, count: int = 5):
+    first = models.Assignment(name="Listing A")
+    second = models.Assignment(name="Listing B")
+    session.add_all([first, second])
+    session.commit()
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    for i in range(count):
+        session.add(models.GradingResult(
+            assignment_id=(first if i % 2 == 0 else second).id,
+            student_id="alice" if i < 3 else "bob",
+            grade=100 - i,
+            feedback=f"feedback {i}",
+            created_at=start + timedelta(days=i),
+        ))
+    session.commit()
+
+
+def save_elsewhere(session, assignment_id: int, **fields):
+    """Commit a result the way ``_save_results`` in a worker process does."""
+    session.add(models.GradingResult(assignment_id=assignment_id, **fields))
+    session.query(models.Assignment).filter_by(id=assignment_id).update(
+        {models.Assignment.results_version: models.Assignment.results_version + 1}
+    )
+    session.commit()
+
+
+def test_keyset_pagination(client: TestClient, session):
+    seed_results(session)
+
+    first_page = client.get("/grades?limit=2")
+    assert [grade["grade"] for grade in first_page.json()] == [100, 99]
+    cursor = first_page.headers["X-Next-Cursor"]
+
+    second_page = client.get(f"/grades?limit=2&after_id={cursor}")
+    assert [grade["grade"] for grade in second_page.json()] == [98, 97]
+
+    last_page = client.get(f"/grades?limit=2&after_id={second_page.headers['X-Next-Cursor']}")
+    assert [grade["grade"] for grade in last_page.json()] == [96]
+    assert "X-Next-Cursor" not in last_page.headers
+
+
+def test_filters_by_assignment_and_date(client: TestClient, session):
+    seed_results(session)
+
+    by_assignment = client.get("/grades", params={"assignment": "Listing B"}).json()
+    assert [grade["grade"] for grade in by_assignment] == [99, 97]
+
+    by_date = client.get("/grades", params={"since": "2026-01-02T00:00:00Z", "until": "2026-01-04T00:00:00Z"}).json()
+    assert [grade["grade"] for grade in by_date] == [99, 98]
+
+    by_student = client.get("/grades/alice", params={"assignment": "Listing A"}).json()
+    assert [grade["grade"] for grade in by_student] == [100, 98]
+
+
+def test_stream_matches_listing(client: TestClient, session, monkeypatch):
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "GRADES_STREAM_CHUNK", 2)
+    seed_results(session)
+
+    streamed = client.get("/grades?stream=true")
+    assert streamed.headers["content-type"].startswith("application/json")
+    assert streamed.json() == client.get("/grades").json()
+
+    assert client.get("/grades/bob?stream=true").json() == client.get("/grades/bob").json()
+    assert client.get("/grades/nobody?stream=true").json() == []
+
+
+def test_etag_answers_unchanged_listing_with_304(client: TestClient, session):
+    seed_results(session)
+    first = client.get("/grades")
+    etag = first.headers["ETag"]
+
+    with patch.object(grading_service, "get_all_grades", wraps=grading_service.get_all_grades) as listing:
+        unchanged = client.get("/grades", headers={"If-None-Match": etag})
+        assert unchanged.status_code == 304
+        assert unchanged.headers["ETag"] == etag
+
+        cached = client.get("/grades")
+        assert cached.json() == first.json()
+        listing.assert_not_called()
+
+    # Written behind the API's back, as a worker process would
+    save_elsewhere(session, 1, student_id="carol", grade=50)
+    changed = client.get("/grades", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert len(changed.json()) == 6
+
+
+def test_etag_changes_when_a_lower_id_commits_last(client: TestClient, session):
+    seed_results(session)
+    # Two workers took ids 7 and 6 from the sequence; the one with id 7 commits first
+    save_elsewhere(session, 1, id=7, student_id="carol", grade=50)
+    etag = client.get("/grades", params={"assignment": "Listing A"}).headers["ETag"]
+    all_etag = client.get("/grades").headers["ETag"]
+
+    save_elsewhere(session, 1, id=6, student_id="dave", grade=40)
+    changed = client.get("/grades", params={"assignment": "Listing A"}, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert "dave" in {grade["student_id"] for grade in changed.json()}
+    assert client.get("/grades", headers={"If-None-Match": all_etag}).status_code == 200
+
+
+def test_assignment_etag_ignores_other_assignments(client: TestClient, session):
+    seed_results(session)
+    etag = client.get("/grades/alice", params={"assignment": "Listing A"}).headers["ETag"]
+    paged = client.get("/grades", params={"limit": 2})
+    assert client.get("/grades", params={"limit": 2}).headers["X-Next-Cursor"] == paged.headers["X-Next-Cursor"]
+
+    second = session.query(models.Assignment).filter_by(name="Listing B").one()
+    save_elsewhere(session, second.id, student_id="alice", grade=50)
+    unchanged = client.get("/grades/alice", params={"assignment": "Listing A"}, headers={"If-None-Match": etag})
+    assert unchanged.status_code == 304
+    assert client.get("/grades?stream=true", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_saving_results_invalidates_cached_listings(client: TestClient, session):
+    seed_results(session)
+    client.get("/grades")
+    client.get("/grades", params={"assignment": "Listing A"})
+    client.get("/grades", params={"assignment": "Listing B"})
+    assert grade_listing.stats()["size"] == 3
+
+    second = session.query(models.Assignment).filter_by(name="Listing B").one()
+    grade_listing.invalidate(second.id)
+    assert grade_listing.stats()["size"] == 1
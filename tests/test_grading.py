@@ -1,6 +1,6 @@
 from fastapi.testclient import TestClient
-from unittest.mock import patch, MagicMock
-import subprocess
+from unittest.mock import patch, AsyncMock
+from app.services import git_ops, sources
 import json
 
 def test_grade_assignment_success(client: TestClient):
@@ -27,15 +27,17 @@ def test_grade_assignment_success(client: TestClient):
         }
     )
 
-    with patch("subprocess.run") as mock_run, \
-         patch("os.walk") as mock_walk, \
+    with patch("app.services.git_ops.ls_remote_head", new_callable=AsyncMock) as mock_ls_remote, \
+         patch("app.services.git_ops.sparse_clone", new_callable=AsyncMock) as mock_clone, \
+         patch("app.services.sources.java_files") as mock_files, \
          patch("os.path.isdir") as mock_isdir, \
-         patch("builtins.open", new_callable=MagicMock) as mock_open:
+         patch("app.services.sources.read_text") as mock_read:
 
-        mock_run.return_value = MagicMock(check=True, capture_output=True, text=True)
-        mock_walk.return_value = [("/tmp/somedir", [], ["Test.java"])]
+        mock_ls_remote.return_value = None
+        mock_clone.return_value = git_ops.CloneStats(seconds=0.1, bytes_transferred=1024, commit_sha="a" * 40)
+        mock_files.return_value = [sources.SourceFile("/tmp/somedir/Test.java", "somedir/Test.java", 20)]
         mock_isdir.return_value = True
-        mock_open.return_value.__enter__.return_value.read.return_value = "public class Test {}"
+        mock_read.return_value = "public class Test {}"
 
         response = client.post(
             "/grade",
@@ -71,15 +73,17 @@ def test_grade_assignment_repo_clone_fails(client: TestClient):
         f"/assignments/{assignment_name}/criteria",
         files={
             "criteria_file": (
-                "criteria.txt",
-                "Test criteria".encode("utf-8"),
-                "text/plain"
+                "criteria.json",
+                json.dumps([{"pattern": "Test", "deduction": 10, "message": "Use of Test class"}]).encode("utf-8"),
+                "application/json"
             )
         }
     )
 
-    with patch("subprocess.run") as mock_run:
-        mock_run.side_effect = subprocess.CalledProcessError(1, "git clone", stderr="fatal: repository not found")
+    with patch("app.services.git_ops.ls_remote_head", new_callable=AsyncMock) as mock_ls_remote, \
+         patch("app.services.git_ops.sparse_clone", new_callable=AsyncMock) as mock_clone:
+        mock_ls_remote.side_effect = git_ops.GitError(("ls-remote",), 128, "fatal: repository not found")
+        mock_clone.side_effect = git_ops.GitError(("clone",), 128, "fatal: repository not found")
         response = client.post(
             "/grade",
             json={
@@ -89,6 +93,7 @@ def test_grade_assignment_repo_clone_fails(client: TestClient):
             }
         )
     assert response.status_code == 400
+    assert "repository not found" in response.json()["detail"]
 
 def test_get_all_grades(client: TestClient):
     # First, grade an assignment to create a grade entry
@@ -106,3 +111,64 @@ def test_get_student_grades(client: TestClient):
     assert response.status_code == 200
     assert len(response.json()) > 0
     assert response.json()[0]["student_id"] == "student_placeholder"
+
+
+def _grade_unchanged_repo(client: TestClient, assignment_name: str, head_sha: str, force: bool = False):
+    with patch("app.services.git_ops.ls_remote_head", new_callable=AsyncMock) as mock_ls_remote, \
+         patch("app.services.git_ops.sparse_clone", new_callable=AsyncMock) as mock_clone, \
+         patch("app.services.sources.java_files") as mock_files, \
+         patch("os.path.isdir") as mock_isdir, \
+         patch("app.services.sources.read_text") as mock_read:
+
+        mock_ls_remote.return_value = head_sha
+        mock_clone.return_value = git_ops.CloneStats(seconds=0.1, bytes_transferred=1024, commit_sha=head_sha)
+        mock_files.return_value = [sources.SourceFile("/tmp/somedir/Test.java", "somedir/Test.java", 20)]
+        mock_isdir.return_value = True
+        mock_read.return_value = "public class Test {}"
+
+        response = client.post(
+            "/grade",
+            json={
+                "assignment_name": assignment_name,
+                "repo_link": "https://github.com/test/repo",
+                "token": "test_token",
+                "force": force
+            }
+        )
+    assert response.status_code == 200
+    return response.json(), mock_clone.await_count
+
+def test_regrade_skipped_when_commit_and_rubric_unchanged(client: TestClient):
+    assignment_name = "Unchanged Assignment"
+    criteria = [{"pattern": "Test", "deduction": 10, "message": "Use of Test class"}]
+    client.post("/assignments", json={"assignment_name": assignment_name})
+    client.post(
+        f"/assignments/{assignment_name}/criteria",
+        files={"criteria_file": ("criteria.json", json.dumps(criteria).encode("utf-8"), "application/json")}
+    )
+
+    first, clones = _grade_unchanged_repo(client, assignment_name, "b" * 40)
+    assert clones == 1
+    assert first["cached"] is False
+
+    second, clones = _grade_unchanged_repo(client, assignment_name, "b" * 40)
+    assert clones == 0
+    assert second["cached"] is True
+    assert second["grading_result"] == first["grading_result"]
+
+    forced, clones = _grade_unchanged_repo(client, assignment_name, "b" * 40, force=True)
+    assert clones == 1
+    assert forced["cached"] is False
+
+    pushed, clones = _grade_unchanged_repo(client, assignment_name, "c" * 40)
+    assert clones == 1
+    assert pushed["commit_sha"] == "c" * 40
+
+    criteria[0]["deduction"] = 5
+    client.post(
+        f"/assignments/{assignment_name}/criteria",
+        files={"criteria_file": ("criteria.json", json.dumps(criteria).encode("utf-8"), "application/json")}
+    )
+    regraded, clones = _grade_unchanged_repo(client, assignment_name, "c" * 40)
+    assert clones == 1
+    assert regraded["grading_result"]["grade"] == 95
@@ -0,0 +1,90 @@
+import json
+import subprocess
+import pytest
+from unittest.mock import patch
+from app.db import models
+from app.services import findings_cache
+
+CRITERIA = [
+    {"pattern": "System\\.out", "deduction": 2.5, "message": "Debug print"},
+    {"pattern": "catch \\(Exception", "deduction": 5, "message": "Catches generic Exception"},
+]
+
+
+def git(*args, cwd):
+    subprocess.run(
+        ["git", "-c", "user.email=ta@example.com", "-c", "user.name=TA", *args],
+        cwd=cwd, check=True, capture_output=True,
+    )
+
+
+@pytest.fixture
+def student_repo(tmp_path):
+    repo = tmp_path / "student"
+    (repo / "Assignment1" / "util").mkdir(parents=True)
+    (repo / "Assignment1" / "Main.java").write_text("class Main {\n  void a() { System.out.println(); }\n}\n")
+    (repo / "Assignment1" / "Shape.java").write_text("class Shape {\n  try {} catch (Exception e) {}\n}\n")
+    (repo / "Assignment1" / "util" / "Log.java").write_text("class Log {\n  System.out.print(1);\n}\n")
+    (repo / "Assignment1" / "Clean.java").write_text("class Clean {}\n")
+    git("init", "-q", cwd=repo)
+    git("config", "uploadpack.allowFilter", "true", cwd=repo)
+    git("add", ".", cwd=repo)
+    git("commit", "-q", "-m", "first", cwd=repo)
+    return repo
+
+
+@pytest.fixture
+def assignment(session):
+    findings_cache.clear()
+    assignment = models.Assignment(name="Assignment1")
+    session.add(assignment)
+    session.commit()
+    session.add(models.Criteria(assignment_id=assignment.id, text=json.dumps(CRITERIA)))
+    session.commit()
+    return assignment
+
+
+def grade(grade_repo, repo, force=False):
+    with patch("app.services.grading_service.findings_cache.scan", wraps=findings_cache.scan) as scan:
+        response = grade_repo(repo, force)
+    return response, [content for _, content in (call.args for call in scan.call_args_list)]
+
+
+def test_regrade_rescans_only_changed_files(student_repo, assignment, grade_repo, session):
+    first, scanned = grade(grade_repo, student_repo)
+    assert len(scanned) == 4
+    assert first["grading_result"]["grade"] == 90
+
+    (student_repo / "Assignment1" / "Main.java").write_text("class Main {\n  void a() {}\n}\n")
+    (student_repo / "Assignment1" / "util" / "Log.java").unlink()
+    (student_repo / "Assignment1" / "New.java").write_text("class New {\n\n  System.out.println(2);\n}\n")
+    git("add", "-A", cwd=student_repo)
+    git("commit", "-q", "-m", "fix", cwd=student_repo)
+
+    incremental, scanned = grade(grade_repo, student_repo)
+    assert sorted(scanned) == sorted([
+        "class Main {\n  void a() {}\n}\n",
+        "class New {\n\n  System.out.println(2);\n}\n",
+    ])
+    assert incremental["cached"] is False
+
+    full, scanned = grade(grade_repo, student_repo, force=True)
+    assert len(scanned) == 4
+    assert incremental["commit_sha"] == full["commit_sha"]
+    assert incremental["grading_result"]["grade"] == full["grading_result"]["grade"] == 92.5
+    assert sorted(incremental["grading_result"]["feedback"].splitlines()) == sorted(full["grading_result"]["feedback"].splitlines())
+
+    results = session.query(models.GradingResult).order_by(models.GradingResult.id).all()
+    files = {finding.file for finding in results[1].findings}
+    assert files == {"Assignment1/Shape.java", "Assignment1/New.java"}
+
+
+def test_regrade_falls_back_to_full_scan_without_previous_commit(student_repo, assignment, grade_repo, session):
+    grade(grade_repo, student_repo)
+    result = session.query(models.GradingResult).one()
+    result.commit_sha = "0" * 40
+    session.commit()
+
+    response, scanned = grade(grade_repo, student_repo)
+    assert len(scanned) == 4
+    assert response["grading_result"]["grade"] == 90
@@ -0,0 +1,142 @@
+import json
+import pytest
+from fastapi.testclient import TestClient
+from app.services import java_index
+from app.services.java_index import StructureQuery, build_index, get_index
+from app.services.scanner import CompiledRubric
+
+SOURCE = """package shapes;
+
+import java.util.*;
+
+/* class Commented extends Thread { } */
+@SuppressWarnings("unchecked")
+public abstract class Shape extends Base<String> implements Comparable<Shape>, java.io.Serializable {
+    public static final String NAME = "class Fake {", OTHER = "x";
+    protected int width, height[];
+    Map<String, List<Integer>> cache = new HashMap<String, List<Integer>>(), spare;
+
+    public Shape(int width) {
+        this.width = width;
+        Runnable r = new Runnable() { public void run() {} };
+    }
+
+    @Override
+    public abstract double area();
+
+    private static <T> List<T> copy(List<T> items) throws Exception {
+        String text = \"\"\"
+            void notAMethod() {}
+            \"\"\";
+        return items;
+    }
+
+    interface Visitor extends Cloneable {
+        void visit(Shape shape);
+    }
+
+    enum Kind implements Visitor {
+        ROUND("r") { void extra() {} }, SQUARE("s");
+        private final String code;
+        Kind(String code) { this.code = code; }
+        public void visit(Shape shape) {}
+    }
+}
+
+record Point(int x, int y) implements Comparable<Point> {
+    public Point {
+    }
+}
+"""
+
+
+def names(index, kind):
+    return [(symbol.name, symbol.owner, symbol.line) for symbol in index.by_kind.get(kind, [])]
+
+
+def test_index_extracts_types_and_members():
+    index = build_index(SOURCE)
+
+    assert names(index, "class") == [("Shape", None, 7)]
+    shape = index.by_kind["class"][0]
+    assert shape.extends == ("Base",)
+    assert shape.implements == ("Comparable", "Serializable")
+    assert shape.modifiers == {"public", "abstract"}
+    assert names(index, "interface") == [("Visitor", "Shape", 27)]
+    assert index.by_kind["interface"][0].extends == ("Cloneable",)
+    assert names(index, "enum") == [("Kind", "Shape", 31)]
+    assert names(index, "record") == [("Point", None, 39)]
+
+    assert names(index, "field") == [
+        ("NAME", "Shape", 8), ("OTHER", "Shape", 8), ("width", "Shape", 9), ("height", "Shape", 9),
+        ("cache", "Shape", 10), ("spare", "Shape", 10), ("code", "Kind", 33),
+    ]
+    fields = {symbol.name: symbol for symbol in index.by_kind["field"]}
+    assert fields["NAME"].modifiers == {"public", "static", "final"}
+    assert fields["cache"].type == "Map<String,List<Integer>>"
+    assert fields["width"].type == "int"
+    assert fields["height"].type == "int[]"
+
+    assert names(index, "method") == [
+        ("area", "Shape", 18), ("copy", "Shape", 20), ("visit", "Visitor", 28), ("visit", "Kind", 35),
+    ]
+    methods = {symbol.name: symbol for symbol in index.by_kind["method"]}
+    assert methods["copy"].type == "List<T>"
+    assert methods["area"].modifiers == {"public", "abstract"}
+    assert names(index, "constructor") == [("Shape", "Shape", 12), ("Kind", "Kind", 34)]
+
+
+def test_queries_filter_by_name_owner_edges_and_modifiers():
+    index = build_index(SOURCE)
+
+    def lines(**spec):
+        return StructureQuery.parse(spec).lines(index)
+
+    assert lines(kind="field", not_modifiers=["private"]) == [8, 9, 10]
+    assert lines(kind="field", modifiers=["static", "final"], name="[A-Z]+") == [8]
+    assert lines(kind="class", extends="Base") == [7]
+    assert lines(kind="class", extends="Thread") == []
+    assert lines(kind="record", implements="Comparable") == [39]
+    assert lines(kind="method", name="visit", **{"class": "Kind"}) == [35]
+    assert lines(kind="method", type="List<.*>") == [20]
+    assert lines(kind="method", name="notAMethod") == []
+
+
+@pytest.mark.parametrize("spec, error", [
+    ("class", "object"),
+    ({"kind": "package"}, "kind"),
+    ({"kind": "class", "name": "(unclosed"}, "name"),
+    ({"kind": "field", "modifiers": ["privat"]}, "modifiers"),
+    ({"kind": "field", "names": "x"}, "unknown"),
+])
+def test_invalid_structure_specs_are_rejected(spec, error):
+    with pytest.raises(ValueError, match=error):
+        StructureQuery.parse(spec)
+
+
+def test_rubric_mixes_patterns_and_structure():
+    rubric = CompiledRubric([
+        {"pattern": "return", "deduction": 1, "message": "return"},
+        {"structure": {"kind": "field", "not_modifiers": ["private"]}, "deduction": 2, "message": "Non-private field"},
+        {"structure": {"kind": "interface"}, "deduction": 3, "message": "Interface"},
+    ])
+
+    assert rubric.scan(SOURCE) == [(0, 24), (1, 8), (1, 9), (1, 10), (2, 27)]
+
+
+def test_index_is_cached_by_content():
+    java_index.clear()
+    first = get_index(SOURCE)
+    assert get_index(SOURCE) is first
+    assert get_index(SOURCE + "\n") is not first
+    assert java_index.stats()["hits"] == 1
+
+
+def test_save_criteria_rejects_invalid_structure(client: TestClient):
+    criteria = [{"structure": {"kind": "method", "name": "(bad"}, "deduction": 1, "message": "x"}]
+    response = client.post(
+        "/assignments/Structure/criteria",
+        files={"criteria_file": ("criteria.json", json.dumps(criteria).encode("utf-8"), "application/json")},
+    )
+    assert response.status_code == 400
+    assert "structure" in response.json()["detail"]
@@ -0,0 +1,139 @@
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch, AsyncMock
+import pytest
+from fastapi.testclient import TestClient
+from app.core.config import settings
+from app.db import models
+from app.schemas.grading import GradingRequest
+from app.services import job_store
+from app.worker import Worker
+
+GRADE_REQUEST = {
+    "assignment_name": "Job Assignment",
+    "repo_link": "https://github.com/test/repo",
+    "token": "test_token"
+}
+
+
+@pytest.fixture
+def database_jobs(monkeypatch):
+    monkeypatch.setattr(settings, "JOB_BACKEND", "database")
+    monkeypatch.setattr(settings, "JOB_HEARTBEAT_SECONDS", 0.01)
+
+
+def enqueue(session_factory, count: int = 1) -> list[str]:
+    async def run():
+        async with session_factory() as db:
+            return [(await job_store.enqueue(db, GradingRequest(**GRADE_REQUEST))).id for _ in range(count)]
+    return asyncio.run(run())
+
+
+def claim(session_factory, worker_id: str):
+    async def run():
+        async with session_factory() as db:
+            return await job_store.claim(db, worker_id)
+    return asyncio.run(run())
+
+
+def expire_leases(session):
+    session.query(models.GradingJob).update(
+        {models.GradingJob.lease_expires_at: datetime.now(timezone.utc) - timedelta(seconds=1)}
+    )
+    session.commit()
+
+
+def test_worker_grades_queued_job(client: TestClient, session, session_factory, database_jobs, assignment, fake_checkout):
+    assignment("Job Assignment")
+    response = client.post("/grade?job=true", json=GRADE_REQUEST)
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+    assert client.get(f"/jobs/{job_id}").json()["status"] == "queued"
+
+    assert client.portal.call(Worker(session_factory, "w1").run_once) is True
+    assert client.portal.call(Worker(session_factory, "w1").run_once) is False
+
+    job = client.get(f"/jobs/{job_id}").json()
+    assert job["status"] == "succeeded"
+    assert job["result"]["grading_result"]["grade"] == 90
+    assert '"status": "succeeded"' in client.get(f"/jobs/{job_id}/events").text
+    row = session.get(models.GradingJob, job_id)
+    assert row.attempts == 1 and row.lease_owner is None
+    assert json.loads(row.request)["token"] == ""
+
+
+def test_failed_job_is_not_retried(client: TestClient, session, session_factory, database_jobs):
+    response = client.post("/grade?job=true", json={**GRADE_REQUEST, "assignment_name": "Missing"})
+
+    assert client.portal.call(Worker(session_factory, "w1").run_once) is True
+
+    job = client.get(f"/jobs/{response.json()['job_id']}").json()
+    assert job["status"] == "failed"
+    assert job["error"]["status_code"] == 404
+
+
+def test_unexpected_errors_are_retried(client: TestClient, session, session_factory, database_jobs):
+    job_id = enqueue(session_factory)[0]
+
+    with patch("app.services.grading_service.grade_assignment", new_callable=AsyncMock, side_effect=RuntimeError("boom")):
+        for _ in range(settings.JOB_MAX_ATTEMPTS):
+            assert client.portal.call(Worker(session_factory, "w1").run_once) is True
+        assert client.portal.call(Worker(session_factory, "w1").run_once) is False
+
+    job = client.get(f"/jobs/{job_id}").json()
+    assert job["status"] == "failed"
+    assert job["error"]["detail"] == "boom"
+
+
+def test_claims_are_exclusive(session, session_factory):
+    first, second = enqueue(session_factory, 2)
+
+    assert claim(session_factory, "w1").id == first
+    assert claim(session_factory, "w2").id == second
+    assert claim(session_factory, "w3") is None
+
+
+def test_expired_lease_is_claimed_again(session, session_factory):
+    enqueue(session_factory)
+    lost = claim(session_factory, "crashed")
+
+    async def heartbeat_and_complete(job, worker_id):
+        async with session_factory() as db:
+            return await job_store.heartbeat(db, job, worker_id), await job_store.complete(db, job, worker_id, {})
+
+    assert claim(session_factory, "w2") is None
+    expire_leases(session)
+    retried = claim(session_factory, "w2")
+
+    assert retried.id == lost.id and retried.attempts == 2
+    # The crashed worker's lease is gone
+    assert asyncio.run(heartbeat_and_complete(lost, "crashed")) == (False, False)
+    assert asyncio.run(heartbeat_and_complete(retried, "w2")) == (True, True)
+
+
+def test_expired_lease_on_last_attempt_fails(session, session_factory, monkeypatch):
+    monkeypatch.setattr(settings, "JOB_MAX_ATTEMPTS", 1)
+    job_id = enqueue(session_factory)[0]
+    claim(session_factory, "crashed")
+    expire_leases(session)
+
+    async def fail_expired():
+        async with session_factory() as db:
+            return await job_store.fail_expired(db)
+
+    assert asyncio.run(fail_expired()) == 1
+    assert claim(session_factory, "w2") is None
+    session.expire_all()
+    assert session.get(models.GradingJob, job_id).status == "failed"
+
+
+def test_full_database_queue_returns_429(client: TestClient, session_factory, database_jobs, monkeypatch):
+    monkeypatch.setattr(settings, "GRADING_QUEUE_MAX_DEPTH", 1)
+
+    assert client.post("/grade?job=true", json=GRADE_REQUEST).status_code == 202
+    assert client.post("/grade?job=true", json=GRADE_REQUEST).status_code == 429
+
+
+def test_unknown_database_job_is_404(client: TestClient, database_jobs):
+    assert client.get("/jobs/does-not-exist").status_code == 404
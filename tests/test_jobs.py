@@ -0,0 +1,57 @@
+import time
+from fastapi.testclient import TestClient
+from app.services import job_queue
+
+GRADE_REQUEST = {
+    "assignment_name": "Job Assignment",
+    "repo_link": "https://github.com/test/repo",
+    "token": "test_token"
+}
+
+
+def wait_for_job(client: TestClient, job_id: str) -> dict:
+    for _ in range(200):
+        job = client.get(f"/jobs/{job_id}").json()
+        if job["status"] in ("succeeded", "failed"):
+            return job
+        time.sleep(0.01)
+    raise AssertionError("job did not finish")
+
+
+def test_job_mode_returns_id_and_result(client: TestClient, assignment, fake_checkout):
+    assignment("Job Assignment")
+
+    response = client.post("/grade?job=true", json=GRADE_REQUEST)
+    assert response.status_code == 202
+    job = wait_for_job(client, response.json()["job_id"])
+
+    assert job["status"] == "succeeded"
+    assert job["result"]["grading_result"]["grade"] == 90
+
+    events = client.get(f"/jobs/{job['job_id']}/events")
+    assert events.headers["content-type"].startswith("text/event-stream")
+    assert '"status": "succeeded"' in events.text
+
+
+def test_failed_job_reports_error(client: TestClient):
+    response = client.post("/grade?job=true", json={**GRADE_REQUEST, "assignment_name": "Missing"})
+    job = wait_for_job(client, response.json()["job_id"])
+
+    assert job["status"] == "failed"
+    assert job["error"]["status_code"] == 404
+
+
+def test_full_queue_returns_429(client: TestClient, monkeypatch):
+    stalled = job_queue.GradingJobQueue(workers=0, max_depth=1)
+    client.portal.call(stalled.start)
+    monkeypatch.setattr(job_queue, "grading_jobs", stalled)
+
+    assert client.post("/grade?job=true", json=GRADE_REQUEST).status_code == 202
+    response = client.post("/grade?job=true", json=GRADE_REQUEST)
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "10"
+
+
+def test_unknown_job_is_404(client: TestClient):
+    assert client.get("/jobs/does-not-exist").status_code == 404
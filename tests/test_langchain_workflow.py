@@ -0,0 +1,102 @@
+import asyncio
+import json
+import pytest
+from app.services.python import langchain_workflow
+from app.services.python.langchain_workflow import FakeBackend, LangChainWorkflow, chunk_sources
+
+RUBRIC = [{"message": "Do not print to the console", "deduction": 5}]
+FILES = [
+    {"path": "A1/Main.java", "content": "class Main {\n  void run() { System.out.println(); }\n}\n"},
+    {"path": "A1/Shape.java", "content": "interface Shape {\n  double area();\n}\n"},
+]
+
+
+def flag_prints(prompt: str) -> str:
+    findings = []
+    path = None
+    for line in prompt.split("\n"):
+        if line.startswith("// File: "):
+            path = line.removeprefix("// File: ")
+        elif path and "System.out" in line:
+            findings.append({"file": path, "line": int(line.split(":")[0]), "criterion": "Do not print", "deduction": 5})
+    return json.dumps({"findings": findings})
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    langchain_workflow.clear()
+
+
+def test_chunks_fit_the_budget_and_keep_line_numbers():
+    big = {"path": "Big.java", "content": "\n".join(f"int field{i};" for i in range(100))}
+    chunks = chunk_sources([*FILES, big], budget=60, count_tokens=langchain_workflow.approximate_tokens)
+
+    assert chunks[0].startswith("// File: A1/Main.java\n1: class Main {")
+    assert "// File: A1/Shape.java" in chunks[0]
+    assert all(langchain_workflow.approximate_tokens(chunk) <= 60 for chunk in chunks)
+    big_parts = [chunk for chunk in chunks if chunk.startswith("// File: Big.java")]
+    assert len(big_parts) > 1
+    assert "100: int field99;" in big_parts[-1]
+
+
+def test_grades_with_fake_backend_and_caches_responses():
+    backend = FakeBackend(flag_prints)
+    workflow = LangChainWorkflow({"backend": backend})
+
+    result = asyncio.run(workflow.run({"rubric": RUBRIC, "source_files": FILES}))
+    assert result["status"] == "success"
+    assert result["grade"] == 95
+    assert result["findings"] == [{"file": "A1/Main.java", "line": 2, "criterion": "Do not print", "deduction": 5.0}]
+    assert result["stats"]["cache_hits"] == 0
+    assert result["stats"]["tokens_sent"] > 0
+
+    again = asyncio.run(LangChainWorkflow({"backend": backend}).run({"rubric": RUBRIC, "source_files": FILES}))
+    assert again["findings"] == result["findings"]
+    assert again["stats"] == {**result["stats"], "cache_hits": 1, "cache_hit_rate": 1.0, "requests": 0, "tokens_sent": 0}
+    assert len(backend.batches) == 1
+
+    # A different rubric is a different prompt
+    asyncio.run(workflow.run({"rubric": RUBRIC + [{"message": "x", "deduction": 1}], "source_files": FILES}))
+    assert len(backend.batches) == 2
+
+
+def test_batches_and_limits_concurrency():
+    in_flight = peak = 0
+
+    class SlowBackend(FakeBackend):
+        async def generate(self, prompts):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return await super().generate(prompts)
+
+    backend = SlowBackend()
+    workflow = LangChainWorkflow({"backend": backend, "batch_size": 2, "max_concurrency": 2, "max_chunk_tokens": 400})
+    files = [{"path": f"F{i}.java", "content": "x" * 1000} for i in range(7)]
+    result = asyncio.run(workflow.run({"rubric": "Grade it", "source_files": files}))
+
+    assert result["stats"]["chunks"] == 7
+    assert [len(batch) for batch in backend.batches] == [2, 2, 2, 1]
+    assert result["stats"]["requests"] == 4
+    assert peak == 2
+
+
+def test_malformed_response_is_an_error_and_not_cached():
+    backend = FakeBackend(lambda prompt: "I could not find any problems.")
+    workflow = LangChainWorkflow({"backend": backend})
+
+    result = asyncio.run(workflow.run({"rubric": RUBRIC, "source_files": FILES}))
+    assert result["status"] == "error"
+    assert langchain_workflow.stats()["size"] == 0
+
+
+def test_invalid_input_and_config():
+    workflow = LangChainWorkflow({"backend": "fake"})
+    assert not workflow.validate_input({"rubric": RUBRIC})
+    assert not workflow.validate_input({"rubric": RUBRIC, "source_files": [{"path": "A.java"}]})
+    assert asyncio.run(workflow.run({"rubric": RUBRIC}))["status"] == "error"
+
+    with pytest.raises(ValueError):
+        LangChainWorkflow({})
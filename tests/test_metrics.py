@@ -0,0 +1,87 @@
+import asyncio
+import json
+import logging
+from fastapi.testclient import TestClient
+from app.api import deps
+from app.core import metrics
+from app.services import findings_cache, sources
+
+
+def server_timing(response) -> dict[str, float]:
+    entries = (entry.split(";dur=") for entry in response.headers["Server-Timing"].split(", "))
+    return {name: float(duration) for name, duration in entries}
+
+
+def test_grade_reports_stage_timings(client: TestClient, assignment, fake_checkout):
+    metrics.clear()
+    findings_cache.clear()
+    assignment()
+    fake_checkout.java_files.return_value = [
+        sources.SourceFile("/tmp/somedir/Test.java", "somedir/Test.java", 20),
+        sources.SourceFile("/tmp/somedir/Other.java", "somedir/Other.java", 20),
+    ]
+
+    response = client.post(
+        "/grade", json={"assignment_name": "Assignment1", "repo_link": "https://github.com/test/repo", "token": "t"},
+    )
+
+    assert response.status_code == 200
+    timings = server_timing(response)
+    assert {"load", "ls_remote", "lookup", "clone", "read", "scan", "db_commit", "total"} <= timings.keys()
+    assert timings["total"] >= timings["scan"] >= timings["read"]
+
+    body = client.get("/metrics").text
+    assert 'grading_stage_duration_seconds_count{stage="clone"} 1' in body
+    assert "git_clone_duration_seconds_count 1" in body
+    assert "grading_scanned_files_sum 2.0" in body
+    assert "grading_scanned_bytes_sum 40.0" in body
+    # The second file has the same content and comes from the findings cache
+    assert "grading_criteria_evaluated_sum 1.0" in body
+    assert 'http_request_duration_seconds_count{method="POST",route="/grade",status="200"} 1' in body
+
+
+def test_save_criteria_reports_stage_timings(client: TestClient, assignment):
+    response = assignment()
+
+    assert {"parse", "check_patterns", "db_commit", "compile"} <= server_timing(response).keys()
+
+
+def test_request_log_line_is_json(client: TestClient, caplog):
+    with caplog.at_level(logging.INFO, logger="app.core.metrics"):
+        client.get("/grades/nobody")
+
+    line = json.loads(caplog.records[-1].getMessage())
+    assert line["route"] == "/grades/{student_name}"
+    assert line["status"] == 200
+    assert "duration_ms" in line and "stages_ms" in line
+
+
+def test_histogram_render():
+    histogram = metrics.Histogram("test_seconds", "Test.", (0.1, 1), ("stage",))
+    metrics._registry.remove(histogram)
+    histogram.observe(0.05, stage="a")
+    histogram.observe(0.1, stage="a")
+    histogram.observe(5, stage="a")
+
+    assert histogram.render() == [
+        "# HELP test_seconds Test.",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{stage="a",le="0.1"} 2',
+        'test_seconds_bucket{stage="a",le="1.0"} 2',
+        'test_seconds_bucket{stage="a",le="+Inf"} 3',
+        'test_seconds_sum{stage="a"} 5.15',
+        'test_seconds_count{stage="a"} 3',
+    ]
+
+
+def test_get_db_measures_checkout_wait(session_factory, monkeypatch):
+    monkeypatch.setattr(deps, "SessionLocal", session_factory)
+    metrics.clear()
+
+    async def use_db():
+        async for db in deps.get_db():
+            pass
+
+    asyncio.run(use_db())
+
+    assert "db_pool_checkout_wait_seconds_count 1" in metrics.render()
@@ -0,0 +1,47 @@
+from sqlalchemy import create_engine, inspect, text
+from app.db import migrations
+from sqlalchemy.orm import Session
+from app.db.models import Base, GradingResult
+
+
+def test_upgrade_adds_missing_columns_and_indexes(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/old.db")
+    with engine.begin() as conn:
+        # grading_results as created by the first release
+        conn.execute(text("CREATE TABLE assignments (id INTEGER PRIMARY KEY, name VARCHAR UNIQUE)"))
+        conn.execute(text("INSERT INTO assignments (id, name) VALUES (1, 'Assignment1')"))
+        conn.execute(text(
+            "CREATE TABLE grading_results (id INTEGER PRIMARY KEY, assignment_id INTEGER, "
+            "student_id VARCHAR, grade FLOAT, feedback TEXT)"
+        ))
+        conn.execute(text("INSERT INTO grading_results (assignment_id, student_id, grade) VALUES (1, 'alice', 90)"))
+
+    with engine.begin() as conn:
+        Base.metadata.create_all(conn)
+        assert migrations.upgrade(conn) == [
+            "assignments.results_version", "grading_results.repo_url", "grading_results.commit_sha", "grading_results.criteria_hash",
+            "grading_results.created_at", "grading_results.partial",
+        ]
+
+    inspector = inspect(engine)
+    assert {"repo_url", "commit_sha", "criteria_hash", "created_at", "partial"} <= {
+        column["name"] for column in inspector.get_columns("grading_results")
+    }
+    assert {"ix_grading_results_submission", "ix_grading_results_assignment_id_id", "ix_grading_results_created_at"} <= {
+        index["name"] for index in inspector.get_indexes("grading_results")
+    }
+    with engine.begin() as conn:
+        assert conn.execute(text("SELECT results_version FROM assignments")).all() == [(0,)]
+        row = conn.execute(text("SELECT partial, created_at FROM grading_results")).one()
+        assert row.partial == 0 and row.created_at is not None
+        conn.execute(text("INSERT INTO grading_results (assignment_id, student_id, grade) VALUES (1, 'bob', 80)"))
+        assert migrations.upgrade(conn) == []
+
+    # Results saved after the upgrade still get a timestamp, although SQLite has no default for the column
+    with Session(engine) as session:
+        session.add(GradingResult(assignment_id=1, student_id="carol", grade=70))
+        session.commit()
+    with engine.connect() as conn:
+        created_at = conn.execute(text("SELECT created_at FROM grading_results WHERE student_id = 'carol'")).scalar()
+        assert created_at is not None
+    engine.dispose()
@@ -0,0 +1,132 @@
+import asyncio
+import json
+import threading
+import time
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+from app.db import models
+from app.schemas.grading import GradingRequest
+from app.services import findings_cache, grading_service, sources
+from app.services.scanner import CompiledRubric, ScanTimeout, _time_budget, backtracking_risk
+
+EVIL = "(a+)+$"
+CRITERIA = [
+    {"pattern": EVIL, "deduction": 50, "message": "Runaway pattern"},
+    {"pattern": "System\\.out", "deduction": 5, "message": "Debug print"},
+]
+CONTENT = "class Main {\n  System.out.println();\n  String s = \"" + "a" * 40 + "!\";\n}\n"
+
+
+@pytest.mark.parametrize("pattern", [
+    EVIL, "(\\w+\\s?)*;", "(a*)*b", "(?:x|a{1,3})+$", "(a|aa)+$", "(\\w|\\d)+$", "(x|y|xy)+", "(?:a|a?b)*c",
+])
+def test_ambiguous_repeats_are_risky(pattern):
+    assert backtracking_risk(pattern)
+
+
+@pytest.mark.parametrize("pattern", [
+    "a+b+", "(ab)+", "\\w+", "(a|b)*", "(?:a{2})+", "(a++)+", "catch \\(Exception",
+    "(public|private)+", "(a|ab)+", "(\\d|[a-f])+", "[A-Za-z0-9_]+",
+])
+def test_linear_patterns_are_not_risky(pattern):
+    assert not backtracking_risk(pattern)
+
+
+def upload(client: TestClient, criteria, **params):
+    return client.post(
+        "/assignments/Regex/criteria",
+        params=params,
+        files={"criteria_file": ("criteria.json", json.dumps(criteria).encode("utf-8"), "application/json")},
+    )
+
+
+def test_save_criteria_rejects_risky_and_invalid_patterns(client: TestClient):
+    rejected = upload(client, CRITERIA)
+    assert rejected.status_code == 400
+    assert EVIL in rejected.json()["detail"]
+
+    invalid = upload(client, [{"pattern": "(unclosed", "deduction": 1, "message": "x"}])
+    assert invalid.status_code == 400
+    assert "Invalid patterns" in invalid.json()["detail"]
+
+    allowed = upload(client, CRITERIA, allow_unsafe_patterns="true")
+    assert allowed.status_code == 200
+    assert allowed.json()["flagged_patterns"] == [EVIL]
+
+
+def test_scan_stops_runaway_criterion_and_keeps_other_hits():
+    rubric = CompiledRubric(CRITERIA)
+    start = time.process_time()
+    with pytest.raises(ScanTimeout) as exc_info:
+        rubric.scan(CONTENT, budget=0.2)
+    assert time.process_time() - start < 2
+    assert exc_info.value.hits == [(1, 2)]
+    assert exc_info.value.timed_out == [0]
+
+    assert rubric.scan("System.out", budget=0.2) == [(1, 1)]
+
+
+def test_budget_ignores_cpu_used_by_other_threads():
+    stop = threading.Event()
+
+    def spin():
+        while not stop.is_set():
+            pass
+
+    busy = threading.Thread(target=spin)
+    busy.start()
+    try:
+        # The process burns CPU on the other thread while this one sleeps
+        with _time_budget(0.02):
+            time.sleep(0.3)
+        assert CompiledRubric(CRITERIA).scan("System.out\n" * 1000, budget=0.02) == [(1, n) for n in range(1, 1001)]
+    finally:
+        stop.set()
+        busy.join()
+
+
+def test_budget_applies_off_the_main_thread():
+    outcome = {}
+
+    def scan():
+        try:
+            CompiledRubric(CRITERIA).scan("System.out\n" + ("a" * 20 + "!\n") * 10, budget=0.1)
+        except ScanTimeout as e:
+            outcome["timeout"] = e
+        outcome["cpu"] = time.thread_time()
+
+    worker = threading.Thread(target=scan)
+    worker.start()
+    worker.join()
+    assert outcome["timeout"].timed_out == [0]
+    assert outcome["timeout"].hits == [(1, 1)]
+    assert outcome["cpu"] < 0.6
+
+
+def test_grade_with_runaway_pattern_is_partial(client: TestClient, session, session_factory, fake_checkout):
+    findings_cache.clear()
+    upload(client, CRITERIA, allow_unsafe_patterns="true")
+    request = GradingRequest.model_construct(assignment_name="Regex", repo_link="https://github.com/test/repo", token="t", force=False)
+
+    async def grade():
+        async with session_factory() as db:
+            return await grading_service.grade_assignment(request, db)
+
+    fake_checkout.ls_remote.return_value = "a" * 40
+    fake_checkout.java_files.return_value = [sources.SourceFile("/tmp/somedir/Main.java", "Regex/Main.java", len(CONTENT))]
+    fake_checkout.read_text.return_value = CONTENT
+    with patch("app.core.config.settings.REGEX_TIME_BUDGET", 0.2):
+        first = asyncio.run(grade())
+        second = asyncio.run(grade())
+
+    assert first["grading_result"]["partial"] is True
+    assert first["grading_result"]["grade"] == 95
+    assert first["grading_result"]["feedback"].splitlines() == [
+        "- 5 points: Debug print in Regex/Main.java on line 2",
+        "- Not fully checked: Runaway pattern in Regex/Main.java (time budget exceeded)",
+    ]
+    # Partial results are never served from the regrade cache.
+    assert second["cached"] is False
+    assert session.query(models.GradingResult).filter_by(partial=True).count() == 2
+    assert client.get("/assignments/Regex/deductions").json()[0]["criterion"] == "Debug print"
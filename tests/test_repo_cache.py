@@ -0,0 +1,88 @@
+import asyncio
+import subprocess
+from pathlib import Path
+import pytest
+from app.services.git_ops import GitError
+from app.services.repo_cache import RepoMirrorCache
+
+
+def git(*args, cwd):
+    return subprocess.run(
+        ["git", "-c", "user.email=ta@example.com", "-c", "user.name=TA", *args],
+        cwd=cwd, check=True, capture_output=True, text=True,
+    ).stdout
+
+
+def make_repo(path, content="public class Main {}\n"):
+    (path / "Assignment1").mkdir(parents=True)
+    (path / "Other").mkdir()
+    (path / "Assignment1" / "Main.java").write_text(content)
+    (path / "Other" / "Big.java").write_text("class Big {}\n" * 100)
+    git("init", "-q", cwd=path)
+    git("config", "uploadpack.allowFilter", "true", cwd=path)
+    git("add", ".", cwd=path)
+    git("commit", "-q", "-m", "first", cwd=path)
+    return path
+
+
+async def read_checkout(cache, url):
+    async with cache.checkout(url, "Assignment1") as checkout:
+        root = Path(checkout.path)
+        files = sorted(p.name for p in (root / "Assignment1").iterdir())
+        content = (root / "Assignment1" / "Main.java").read_text()
+        return checkout, files, content, (root / "Other").exists()
+
+
+def test_second_grade_fetches_incrementally(tmp_path):
+    repo = make_repo(tmp_path / "student")
+    cache = RepoMirrorCache(str(tmp_path / "cache"), max_bytes=10 ** 9)
+
+    first, files, content, other = asyncio.run(read_checkout(cache, repo.as_uri()))
+    assert not first.fetched
+    assert files == ["Main.java"]
+    assert not other
+
+    (repo / "Assignment1" / "Main.java").write_text("public class Main { int fixed; }\n")
+    git("commit", "-q", "-am", "fix", cwd=repo)
+
+    second, _, content, _ = asyncio.run(read_checkout(cache, repo.as_uri()))
+    assert second.fetched
+    assert second.commit_sha == git("rev-parse", "HEAD", cwd=repo).strip()
+    assert "fixed" in content
+    assert not Path(second.path).exists()
+
+
+def test_concurrent_checkouts_of_same_repo(tmp_path):
+    repo = make_repo(tmp_path / "student")
+    cache = RepoMirrorCache(str(tmp_path / "cache"), max_bytes=10 ** 9)
+
+    async def grade_many():
+        return await asyncio.gather(*(read_checkout(cache, repo.as_uri()) for _ in range(4)))
+
+    results = asyncio.run(grade_many())
+    assert {checkout.commit_sha for checkout, *_ in results} == {git("rev-parse", "HEAD", cwd=repo).strip()}
+    assert [checkout.fetched for checkout, *_ in results].count(False) == 1
+    assert len(list((tmp_path / "cache").glob("*.git"))) == 1
+
+
+def test_evicts_least_recently_used_mirror(tmp_path):
+    first = make_repo(tmp_path / "first")
+    second = make_repo(tmp_path / "second")
+    cache = RepoMirrorCache(str(tmp_path / "cache"), max_bytes=10 ** 9)
+
+    asyncio.run(read_checkout(cache, first.as_uri()))
+    asyncio.run(read_checkout(cache, second.as_uri()))
+    assert len(list((tmp_path / "cache").glob("*.git"))) == 2
+
+    cache.max_bytes = cache.size() - 1
+    evicted = cache.evict()
+
+    assert evicted == [cache._key(first.as_uri())]
+    assert len(list((tmp_path / "cache").glob("*.git"))) == 1
+
+
+def test_missing_repo_raises(tmp_path):
+    cache = RepoMirrorCache(str(tmp_path / "cache"), max_bytes=10 ** 9)
+    with pytest.raises(GitError):
+        asyncio.run(read_checkout(cache, (tmp_path / "missing").as_uri()))
+    assert list((tmp_path / "cache").glob("*.git")) == []
@@ -0,0 +1,77 @@
+import asyncio
+import json
+from fastapi.testclient import TestClient
+from app.db import models
+from app.services import rubric_cache
+from app.core.cache import LRUCache
+
+
+def upload_criteria(client: TestClient, assignment_name: str, criteria: list):
+    return client.post(
+        f"/assignments/{assignment_name}/criteria",
+        files={
+            "criteria_file": (
+                "criteria.json",
+                json.dumps(criteria).encode("utf-8"),
+                "application/json"
+            )
+        }
+    )
+
+
+def test_rubric_is_compiled_once():
+    rubric_cache.clear()
+    text = json.dumps([{"pattern": "Test", "deduction": 10, "message": "Use of Test class"}])
+
+    first = rubric_cache.get_rubric("Cached Assignment", text)
+    second = rubric_cache.get_rubric("Cached Assignment", text)
+
+    assert first is second
+    assert first.digest == rubric_cache.criteria_hash(text)
+    assert rubric_cache.stats()["hits"] == 1
+
+
+def test_save_criteria_replaces_cached_rubric(client: TestClient):
+    rubric_cache.clear()
+    assignment_name = "Cache Assignment"
+    upload_criteria(client, assignment_name, [{"pattern": "Old", "deduction": 5, "message": "old"}])
+    old_text = json.dumps([{"pattern": "Old", "deduction": 5, "message": "old"}])
+    old = rubric_cache.get_rubric(assignment_name, old_text)
+
+    upload_criteria(client, assignment_name, [{"pattern": "New", "deduction": 5, "message": "new"}])
+
+    new_text = json.dumps([{"pattern": "New", "deduction": 5, "message": "new"}])
+    assert rubric_cache.get_rubric(assignment_name, old_text) is not old
+    assert rubric_cache.get_rubric(assignment_name, new_text).criteria[0].message == "new"
+
+
+def test_warm_up_compiles_stored_rubrics(session, session_factory):
+    rubric_cache.clear()
+    assignment = models.Assignment(name="Warm Assignment")
+    session.add(assignment)
+    session.commit()
+    session.add(models.Criteria(assignment_id=assignment.id, text='[{"pattern": "x", "deduction": 1, "message": "x"}]'))
+    other = models.Assignment(name="Plain Text Assignment")
+    session.add(other)
+    session.commit()
+    session.add(models.Criteria(assignment_id=other.id, text="Not a JSON rubric"))
+    session.commit()
+
+    async def warm_up():
+        async with session_factory() as db:
+            return await rubric_cache.warm_up(db)
+
+    assert asyncio.run(warm_up()) == 1
+    assert len(rubric_cache._rubrics) == 1
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+
+    assert "a" in cache
+    assert "b" not in cache
+    assert "c" in cache
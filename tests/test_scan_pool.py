@@ -0,0 +1,65 @@
+import asyncio
+import pickle
+import pytest
+from app.core.config import settings
+from app.services import findings_cache, scan_pool
+from app.services.grading_service import _grade_with_gemini
+from app.services.scanner import CompiledRubric
+
+CRITERIA = [
+    {"pattern": "System\\.out", "deduction": 2, "message": "Debug print"},
+    {"pattern": "^\\s*$", "deduction": 0.5, "message": "Blank line"},
+    {"pattern": "(?i)todo", "deduction": 1, "message": "Leftover TODO"},
+]
+
+
+def make_files(count: int) -> list[dict]:
+    return [
+        {"path": f"A1/File{i}.java", "content": f"class F{i} {{\n\n  // TODO {i}\n" + "  System.out.println();\n" * (i % 4) + "}\n"}
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(settings, "SCAN_PROCESS_WORKERS", 2)
+    findings_cache.clear()
+    yield
+    scan_pool.shutdown()
+    findings_cache.clear()
+
+
+def test_rubric_is_sent_only_when_worker_lacks_it():
+    rubric = CompiledRubric(CRITERIA, digest="pool-test")
+    scan_pool._worker_rubrics.clear()
+
+    with pytest.raises(scan_pool.RubricMissing):
+        scan_pool._scan(rubric.digest, "System.out")
+    assert scan_pool._scan(rubric.digest, "System.out", rubric) == ((0, 1),)
+    assert scan_pool._scan(rubric.digest, "x\nSystem.out") == ((0, 2),)
+
+
+def test_rubric_pickles_as_criteria():
+    rubric = CompiledRubric(CRITERIA, digest="pool-test")
+    copy = pickle.loads(pickle.dumps(rubric))
+    content = make_files(3)[2]["content"]
+    assert copy.digest == rubric.digest
+    assert copy.scan(content) == rubric.scan(content)
+
+
+def test_pool_results_match_in_process_scan(pool, monkeypatch):
+    rubric = CompiledRubric(CRITERIA, digest="pool-test")
+    files = make_files(25)
+    files.insert(5, {"path": "A1/Reused.java", "hits": [(0, 3)]})
+
+    pooled = asyncio.run(_grade_with_gemini(files, rubric))
+    assert scan_pool._executor is not None
+    # Worker results are cached in the parent, so a regrade does not touch the pool.
+    assert findings_cache.stats()["size"] == 25
+
+    monkeypatch.setattr(settings, "SCAN_PROCESS_WORKERS", 0)
+    findings_cache.clear()
+    inline = asyncio.run(_grade_with_gemini(files, rubric))
+
+    assert pooled == inline
+    assert pooled["files"] == 26
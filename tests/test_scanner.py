@@ -0,0 +1,78 @@
+import re
+import pytest
+from app.services.scanner import CompiledRubric
+
+
+def legacy_scan(criteria: list, content: str) -> list:
+    hits = []
+    lines = content.splitlines()
+    for criterion in criteria:
+        pattern = criterion.get("pattern")
+        deduction = criterion.get("deduction")
+        message = criterion.get("message")
+
+        if not all([pattern, deduction, message]):
+            continue
+
+        for i, line in enumerate(lines, 1):
+            if re.search(pattern, line):
+                hits.append((message, i))
+    return hits
+
+
+def engine_scan(criteria: list, content: str) -> list:
+    rubric = CompiledRubric(criteria)
+    return [(rubric.criteria[index].message, line) for index, line in rubric.scan(content)]
+
+
+SOURCE = (
+    "package strategy;\r\n"
+    "\n"
+    "public class Test implements Strategy {\n"
+    "    private static Test instance;\n"
+    "    // TODO remove debug\n"
+    "    public void run() { System.out.println(\"x\"); }\n"
+    "\x0c\n"
+    "    int aa = 1; int bb = 2;   \n"
+    "}\n"
+    "Test"
+)
+
+PATTERNS = [
+    "Test",
+    "^\\s*//",
+    "System\\.out",
+    "\\s$",
+    "$",
+    "^$",
+    "^}$",
+    "(?i)todo",
+    "\\Apackage",
+    "Test\\Z",
+    "(\\w)\\1",
+    "(?<=static )Test",
+    "public(?! class)",
+    "(?P<name>int) ",
+    "[^;]*;\\s*[^;]*;",
+    "(?>\\s+)$",
+    "\\bStrategy\\b",
+    "(?s:.*)x\"",
+]
+
+
+@pytest.mark.parametrize("pattern", PATTERNS)
+def test_single_pattern_matches_legacy(pattern):
+    criteria = [{"pattern": pattern, "deduction": 1, "message": pattern}]
+    assert engine_scan(criteria, SOURCE) == legacy_scan(criteria, SOURCE)
+
+
+def test_combined_rubric_matches_legacy():
+    criteria = [{"pattern": p, "deduction": i + 1, "message": p} for i, p in enumerate(PATTERNS)]
+    criteria.append({"pattern": "", "deduction": 5, "message": "skipped"})
+    criteria.append({"pattern": "Test", "deduction": 0, "message": "skipped"})
+    assert engine_scan(criteria, SOURCE) == legacy_scan(criteria, SOURCE)
+
+
+def test_empty_content():
+    criteria = [{"pattern": "^$", "deduction": 1, "message": "empty"}]
+    assert engine_scan(criteria, "") == []
@@ -0,0 +1,90 @@
+import asyncio
+import json
+import os
+import tracemalloc
+import pytest
+from fastapi import HTTPException
+from app.core.config import settings
+from app.services import findings_cache, sources
+from app.services.grading_service import _grade_with_gemini, _source_files
+from app.services.scanner import CompiledRubric
+
+
+@pytest.fixture
+def checkout(tmp_path):
+    root = tmp_path / "checkout"
+    for path in ("A1/Main.java", "A1/b/B.java", "A1/b/c/C.java", "A1/a/A.java", "A1/notes.txt", "A2/Other.java"):
+        (root / path).parent.mkdir(parents=True, exist_ok=True)
+        (root / path).write_text(f"class {os.path.basename(path)} {{}}\n")
+    return root
+
+
+def test_java_files_follow_walk_order(checkout):
+    expected = [
+        os.path.relpath(os.path.join(dirpath, name), checkout)
+        for dirpath, _, names in os.walk(checkout / "A1")
+        for name in names
+        if name.endswith(".java")
+    ]
+    assert [source.relative_path for source in sources.java_files(str(checkout), "A1")] == expected
+    assert len(expected) == 4
+
+
+def test_symlinks_are_not_followed(checkout, tmp_path):
+    secret = tmp_path / "secret.txt"
+    secret.write_text("password")
+    os.symlink(secret, checkout / "A1" / "Leak.java")
+    os.symlink(checkout / "A2", checkout / "A1" / "linked")
+
+    paths = {source.relative_path for source in sources.java_files(str(checkout), "A1")}
+    assert "A1/Leak.java" not in paths
+    assert not any(path.startswith("A1/linked") for path in paths)
+
+
+def test_memory_mapped_read_matches_text_mode(tmp_path, monkeypatch):
+    path = tmp_path / "Mixed.java"
+    path.write_bytes(b"class A {\r\n  // caf\xc3\xa9 \xff\xfe\r  int x;\n}\r\n")
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        expected = f.read()
+
+    monkeypatch.setattr(settings, "SOURCE_MMAP_THRESHOLD", 1)
+    assert sources.read_text(str(path), path.stat().st_size) == expected
+
+
+def test_byte_caps(checkout, monkeypatch):
+    monkeypatch.setattr(settings, "MAX_SOURCE_FILE_BYTES", 16)
+    reader = sources.SourceReader("A1")
+    results = {source.relative_path: reader.read(source) for source in sources.java_files(str(checkout), "A1")}
+    assert results["A1/b/c/C.java"] == "class C.java {}\n"
+    assert results["A1/Main.java"] is None
+
+    monkeypatch.setattr(settings, "MAX_SOURCE_REPO_BYTES", 40)
+    reader = sources.SourceReader("A1")
+    with pytest.raises(HTTPException) as exc_info:
+        for source in sources.java_files(str(checkout), "A1"):
+            reader.read(source)
+    assert exc_info.value.status_code == 413
+
+
+def peak_scan_memory(root, files: int, file_size: int) -> int:
+    for i in range(files):
+        path = root / "A1" / f"pkg{i % 4}" / f"File{i}.java"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(f"// {i}\n" + ("int x = 1;\n" * (file_size // 11)))
+    rubric = CompiledRubric(json.loads('[{"pattern": "System\\\\.out", "deduction": 1, "message": "Debug print"}]'), digest="r")
+
+    findings_cache.clear()
+    tracemalloc.start()
+    try:
+        scan = asyncio.run(_grade_with_gemini(_source_files(str(root), "A1", None, {}, None), rubric))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert scan["files"] == files
+    return peak
+
+
+def test_peak_memory_does_not_grow_with_repo_size(tmp_path):
+    small = peak_scan_memory(tmp_path / "small", 4, 128 * 1024)
+    large = peak_scan_memory(tmp_path / "large", 40, 128 * 1024)
+    assert large < small * 1.5
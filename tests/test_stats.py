@@ -0,0 +1,77 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.db import models
+from app.services import grade_stats
+import json
+
+
+@pytest.fixture(autouse=True)
+def clear_stats():
+    grade_stats.clear()
+    yield
+    grade_stats.clear()
+
+
+def seed(session, grades):
+    assignment = models.Assignment(name="Stats")
+    session.add(assignment)
+    session.commit()
+    for i, grade in enumerate(grades):
+        result = models.GradingResult(assignment_id=assignment.id, student_id=f"s{i}", grade=grade)
+        session.add(result)
+        session.flush()
+        if grade < 100:
+            session.add(models.GradingFinding(
+                result_id=result.id, criterion_index=0, criterion="Debug print", file="A.java", line=1, deduction=100 - grade,
+            ))
+    session.commit()
+    return assignment
+
+
+def test_assignment_stats(client: TestClient, session):
+    seed(session, [100, 90, 85, 70, 55, 40])
+
+    stats = client.get("/assignments/Stats/stats").json()
+    assert stats["count"] == 6
+    assert stats["mean"] == pytest.approx(73.333, abs=1e-3)
+    assert stats["median"] == 77.5
+    assert stats["min"] == 40
+    assert stats["max"] == 100
+    assert stats["percentiles"]["p25"] == 58.75
+    assert stats["percentiles"]["p90"] == 95
+    counts = {bucket["lower"]: bucket["count"] for bucket in stats["histogram"]}
+    assert counts == {0: 0, 10: 0, 20: 0, 30: 0, 40: 1, 50: 1, 60: 0, 70: 1, 80: 1, 90: 2}
+    assert stats["deductions"] == [{"criterion": "Debug print", "occurrences": 5, "submissions": 5, "points": 160.0}]
+
+
+def test_empty_assignment_stats(client: TestClient):
+    client.post("/assignments", json={"assignment_name": "Empty"})
+
+    stats = client.get("/assignments/Empty/stats").json()
+    assert stats["count"] == 0
+    assert stats["mean"] is None
+    assert sum(bucket["count"] for bucket in stats["histogram"]) == 0
+    assert client.get("/assignments/Missing/stats").status_code == 404
+
+
+def test_stats_are_cached_until_a_grade_is_saved(client: TestClient, session, fake_checkout):
+    seed(session, [80])
+    client.post(
+        "/assignments/Stats/criteria",
+        files={"criteria_file": ("criteria.json", json.dumps(
+            [{"pattern": "System\\.out", "deduction": 5, "message": "Debug print"}]
+        ).encode("utf-8"), "application/json")},
+    )
+    assert client.get("/assignments/Stats/stats").json()["count"] == 1
+
+    # Rows committed by another process (a grading worker) are picked up through the latest result id.
+    session.add(models.GradingResult(assignment_id=1, student_id="late", grade=10))
+    session.commit()
+    assert client.get("/assignments/Stats/stats").json()["count"] == 2
+
+    fake_checkout.read_text.return_value = "System.out.println();"
+    client.post("/grade", json={"assignment_name": "Stats", "repo_link": "https://github.com/test/repo", "token": "t"})
+
+    stats = client.get("/assignments/Stats/stats").json()
+    assert stats["count"] == 3
+    assert stats["max"] == 95